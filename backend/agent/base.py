@@ -1,24 +1,50 @@
 """
 Base class for all agents in the multimodal analysis system.
 """
+import threading
 from abc import ABC, abstractmethod
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from backend.utils.helpers import ToolState, clip_history
+from typing import Any, Dict, Optional, Tuple
+from backend.config import CHAT_MODEL, OLLAMA_HOST
+from backend.events import is_streaming, emit_event
+from backend.llm.gateway import model_gateway
+from backend.agent.output import output_parser
+from backend.utils.cache import ResultCache
+from backend.metrics import record_tokens
+from backend.tools.registry import tool_catalog
+from backend.utils.helpers import ToolState, render_history
 import json
 
+# Compiled prompt | llm | parser chains, built once per agent class and shared
+# by every request thread (langchain runnables are safe to invoke concurrently)
+_chain_cache: Dict[type, Any] = {}
+_chain_lock = threading.Lock()
+
 class AgentBase(ABC):
     """
     Abstract base class for all agent implementations.
     All concrete agents should inherit from this class.
     """
-    def __init__(self, state: ToolState):
+    model_name = CHAT_MODEL
+    # Tools shown in the prompt (None for all registered tools)
+    tool_names: Optional[Tuple[str, ...]] = None
+    # Whether the agent answers with a tool call; its output is then
+    # constrained to the call schema of its tools
+    calls_tools = False
+    # Whether the agent may answer with several independent tool calls
+    multi_call = False
+    # Schema of a direct reply, for agents that do not call tools
+    reply_schema: Dict[str, Any] = {
+        "type": "object",
+        "properties": {"scenario": {"type": "string"}, "use_tool": {"type": "boolean"}},
+        "required": ["scenario"]
+    }
+
+    def __init__(self, state: Optional[ToolState] = None):
         """
         Initialize the agent with a state.
         
         Args:
-            state: The current tool state
+            state: The current tool state (may be omitted when only warming up the chain)
         """
         self.state = state
 
@@ -33,38 +59,116 @@ class AgentBase(ABC):
         """
         pass
 
-    def execute(self) -> ToolState:
+    def get_output_schema(self) -> Dict[str, Any]:
         """
-        Execute the agent's task and update the state.
+        Return the JSON schema the agent's output must match.
         
         Returns:
-            The updated tool state
+            The tool call (or call plan) schema for agents that call tools, otherwise the reply schema
         """
-        # Clip the history to the last 8000 characters
-        self.state["history"] = clip_history(self.state["history"])
+        if self.multi_call:
+            return tool_catalog.plan_schema(self.tool_names)
+        if self.calls_tools:
+            return tool_catalog.call_schema(self.tool_names)
+        return self.reply_schema
+
+    def get_output_format(self) -> Any:
+        """
+        Return the output format passed to the model.
         
-        # Define the prompt template
-        template = self.get_prompt_template()
-        prompt = PromptTemplate.from_template(template)        
+        Returns:
+            The tool call JSON schema for agents that call tools, otherwise "json"
+        """
+        return self.get_output_schema() if self.calls_tools else "json"
+
+    def get_chain(self):
+        """
+        Return the LLM chain for this agent, building it on first use.
         
-        # Initialize the LLM
-        llm = ChatOllama(model="gemma2:27b", format="json", temperature=0)
-        llm_chain = prompt | llm | StrOutputParser()
+        The chain is cached per agent class, so the prompt template and the
+        ChatOllama client are created once per process instead of per request.
+        The tool catalog must be complete by then, since the output schema is
+        fixed when the chain is built.
+        
+        Returns:
+            The runnable prompt | llm chain
+        """
+        chain = _chain_cache.get(type(self))
+        if chain is None:
+            with _chain_lock:
+                chain = _chain_cache.get(type(self))
+                if chain is None:
+                    # langchain is imported here rather than at startup, as it is slow to import
+                    from langchain_ollama import ChatOllama
+                    from langchain_core.prompts import PromptTemplate
+                    prompt = PromptTemplate.from_template(self.get_prompt_template())
+                    llm = ChatOllama(model=self.model_name, format=self.get_output_format(), temperature=0, base_url=OLLAMA_HOST)
+                    chain = prompt | llm
+                    _chain_cache[type(self)] = chain
+        return chain
+
+    def get_prompt_inputs(self) -> Dict[str, Any]:
+        """
+        Collect the template variables for this agent's prompt from the state.
         
-        # Generate response
-        generation = llm_chain.invoke({
-            "history": self.state["history"], 
+        Returns:
+            Mapping of template variable names to values
+        """
+        history = render_history(self.state)
+        if self.state.get("context"):
+            # Compact conversation context from the session store
+            history = f"{self.state['context']}\n\nCurrent request:\n{history}"
+        return {
+            "history": history, 
             "use_tool": self.state["use_tool"],
-            "tools_list": self.state["tools_list"]
-        })
+            "tools_list": tool_catalog.describe(self.tool_names)
+        }
+
+    def generate(self, inputs: Dict[str, Any]) -> str:
+        """
+        Run the agent's chain, passing tokens through when the request is streamed.
+        
+        Args:
+            inputs: The prompt template variables
+            
+        Returns:
+            The raw model output
+        """
+        if not is_streaming():
+            message = self.get_chain().invoke(inputs)
+        else:
+            message = None
+            for chunk in self.get_chain().stream(inputs):
+                message = chunk if message is None else message + chunk
+                emit_event("token", source=type(self).__name__, text=chunk.content)
+        
+        usage = getattr(message, "usage_metadata", None) or {}
+        record_tokens(self.model_name, usage.get("input_tokens"), usage.get("output_tokens"))
+        return message.content if message is not None else ""
+
+    def execute(self) -> ToolState:
+        """
+        Execute the agent's task and update the state.
+        
+        Returns:
+            The updated tool state
+        """
+        # Generate response through the shared model gateway
+        inputs = self.get_prompt_inputs()
+        call_key = ResultCache.make_key(self.model_name, type(self).__name__, inputs)
+        generation = model_gateway.call(self.model_name, call_key, lambda: self.generate(inputs), source=type(self).__name__)
         
-        # Parse the response
-        data = json.loads(generation)
+        # Parse the response, repairing it if needed
+        data, repaired = output_parser.parse(generation, self.get_output_schema(), self.model_name, type(self).__name__)
+        if repaired:
+            generation = json.dumps(data)
         self.state["use_tool"] = data.get("use_tool", False)        
         self.state["tool_exec"] = generation
+        if data.get("scenario"):
+            # A direct reply; a later tool result takes precedence
+            self.state["final_answer"] = data["scenario"]
 
-        # Update history
-        self.state["history"] += "\n" + generation
-        self.state["history"] = clip_history(self.state["history"])
+        # Record the output in the event log
+        self.state["events"].append("agent_output", type(self).__name__, generation)
 
-        return self.state
\ No newline at end of file
+        return self.state
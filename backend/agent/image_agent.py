@@ -9,6 +9,9 @@ class ImageAnalysisAgent(AgentBase):
     """
     Agent specialized in analyzing image content.
     """
+    tool_names = ("analyze_image",)
+    calls_tools = True
+
     def get_prompt_template(self) -> str:
         """
         Define the prompt template for the Image Analysis Agent.
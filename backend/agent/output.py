@@ -0,0 +1,326 @@
+# backend/agent/output.py
+"""
+Tolerant parsing of the JSON that agents produce.
+"""
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import OUTPUT_REPAIR_MODE, OUTPUT_REPAIR_FRAGMENT_CHARS
+from backend.llm.gateway import model_gateway
+from backend.metrics import AGENT_OUTPUT_PARSES
+from backend.utils.cache import ResultCache
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+TRAILING_COMMA_PATTERN = re.compile(r",\s*$")
+# Closing quotes accepted for each opening quote
+QUOTES = {'"': '"', "'": "'", "“": "”\"", "”": "”\""}
+LITERALS = {"True": "true", "False": "false", "None": "null"}
+# Characters that may follow a backslash in a JSON string
+JSON_ESCAPES = '"\\/bfnrtu'
+# Characters that may follow the closing quote of a string
+AFTER_STRING = ",:}]"
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool
+}
+
+REPAIR_PROMPT = """The JSON below does not match the required schema: {problem}
+
+Schema: {schema}
+
+JSON: {fragment}
+
+Reply with the corrected JSON only."""
+
+class AgentOutputError(ValueError):
+    """
+    Raised when an agent's output cannot be turned into JSON matching its schema.
+    """
+
+def repair_json(text: str) -> str:
+    """
+    Fix the JSON defects models commonly produce.
+    
+    Handles code fences and prose around the value, single and typographic
+    quotes, unescaped quotes and Python escapes (such as \\') in strings, raw
+    newlines in strings, Python literals, unquoted keys, trailing commas,
+    mismatched closing brackets and output cut off before its closing
+    quotes and brackets.
+    
+    A quote ends a string only when it is followed by one of , : } ] or the
+    end of the output, so an unescaped quote inside a string that is itself
+    followed by one of these (e.g. "say "hi", then go") still ends it early.
+    
+    Args:
+        text: The model output
+    
+    Returns:
+        The repaired JSON text (not guaranteed to parse)
+    """
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text.strip()
+
+    out: List[str] = []
+    stack: List[str] = []
+    quote: Optional[str] = None
+    escaped = False
+    i = min(starts)
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if escaped:
+                escaped = False
+                if char in JSON_ESCAPES:
+                    out.append("\\" + char)
+                elif char == "'":
+                    out.append(char)
+                else:
+                    # Not a JSON escape, so keep the backslash as a character
+                    out.append("\\\\" + char)
+            elif char == "\\":
+                escaped = True
+            elif char in QUOTES[quote] and text[i + 1:].lstrip()[:1] in ("", *AFTER_STRING):
+                quote = None
+                out.append('"')
+            elif char == '"':
+                out.append('\\"')
+            else:
+                out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}.get(char, char))
+        elif char in QUOTES:
+            quote = char
+            out.append('"')
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            while out and (out[-1] == "," or out[-1].isspace()):
+                out.pop()
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                # Anything after the top-level value is prose
+                break
+        elif char.isalpha() or char == "_":
+            word = WORD_PATTERN.match(text, i).group()
+            following = text[i + len(word):].lstrip()[:1]
+            if following == ":":
+                out.append(json.dumps(word))
+            else:
+                out.append(LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if quote is not None:
+        out.append('"')
+    repaired = TRAILING_COMMA_PATTERN.sub("", "".join(out).rstrip())
+    if repaired.endswith(":"):
+        repaired += " null"
+    return repaired + "".join(reversed(stack))
+
+def validate_json(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Check a value against the subset of JSON schema used for agent outputs.
+    
+    Supports type, const, properties, required, items, prefixItems,
+    minItems, maxItems and anyOf.
+    
+    Args:
+        value: The parsed value
+        schema: The JSON schema
+        path: Location of the value, for error messages
+    
+    Returns:
+        The problems found, empty if the value matches
+    """
+    if "anyOf" in schema:
+        results = [validate_json(value, option, path) for option in schema["anyOf"]]
+        if any(not errors for errors in results):
+            return []
+        # Report against the closest alternative: fewest problems, found deepest
+        return min(results, key=lambda errors: (len(errors), -errors[0].split()[0].count(".") - errors[0].split()[0].count("[")))
+
+    expected = schema.get("type")
+    if expected == "integer":
+        valid = isinstance(value, int) and not isinstance(value, bool) or isinstance(value, float) and value.is_integer()
+    elif expected == "number":
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = expected is None or isinstance(value, JSON_TYPES[expected])
+    if not valid:
+        return [f"{path} must be of type {expected}, got {json.dumps(value)}"]
+    if "const" in schema and value != schema["const"]:
+        return [f"{path} must be {json.dumps(schema['const'])}, got {json.dumps(value)}"]
+
+    errors = []
+    if isinstance(value, dict):
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path} is missing {name}")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(validate_json(value[name], subschema, f"{path}.{name}"))
+    elif isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path} needs at least {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path} takes at most {schema['maxItems']} items")
+        prefix = schema.get("prefixItems", [])
+        for index, item in enumerate(value):
+            subschema = prefix[index] if index < len(prefix) else schema.get("items")
+            if subschema is not None:
+                errors.extend(validate_json(item, subschema, f"{path}[{index}]"))
+    return errors
+
+def _parse(text: str) -> Tuple[Any, bool]:
+    """
+    Parse JSON text, repairing it if needed.
+    
+    Args:
+        text: The JSON text
+    
+    Returns:
+        Tuple of (value, whether it had to be repaired)
+    
+    Raises:
+        ValueError: If the text is not JSON even after repair
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        return json.loads(repair_json(text)), True
+
+class OutputParser:
+    """
+    Turns agent outputs into JSON values that match the agent's schema.
+    
+    Outputs are parsed as they are, then after a deterministic repair. If
+    that still fails, or the value does not match the schema, the model is
+    asked once to correct just the output, without the original prompt.
+    Outcomes are counted so the repair rate can be monitored.
+    """
+    OUTCOMES = ("valid", "repaired", "reprompted", "failed")
+
+    def __init__(self, mode: str = OUTPUT_REPAIR_MODE, fragment_chars: int = OUTPUT_REPAIR_FRAGMENT_CHARS):
+        """
+        Initialize the parser.
+        
+        Args:
+            mode: "reprompt" to repair and then ask the model, "repair" to only
+                repair, "off" to accept valid JSON only
+            fragment_chars: Maximum length of the output sent back to the model
+        """
+        self.mode = mode
+        self.fragment_chars = fragment_chars
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+        self._lock = threading.Lock()
+
+    def _record(self, outcome: str, source: str) -> None:
+        """
+        Count a parse outcome.
+        
+        Args:
+            outcome: One of OUTCOMES
+            source: The agent that produced the output
+        """
+        with self._lock:
+            self.counts[outcome] += 1
+        AGENT_OUTPUT_PARSES.inc(agent=source, outcome=outcome)
+
+    def _check(self, text: str, schema: Dict[str, Any]) -> Tuple[Any, bool, str]:
+        """
+        Parse and validate an output.
+        
+        Args:
+            text: The output text
+            schema: The expected JSON schema
+        
+        Returns:
+            Tuple of (value, whether it was repaired, problem description or "" if valid)
+        """
+        try:
+            value, repaired = _parse(text)
+        except ValueError as e:
+            return None, True, f"invalid JSON ({e})"
+        return value, repaired, "; ".join(validate_json(value, schema)[:5])
+
+    def parse(self, text: str, schema: Dict[str, Any], model: str, source: str = "") -> Tuple[Any, bool]:
+        """
+        Get the JSON value of an agent output.
+        
+        Args:
+            text: The output text
+            schema: The expected JSON schema
+            model: The model that produced the output, used for the correction
+            source: The agent that produced the output
+        
+        Returns:
+            Tuple of (value, whether it differs from the output as given)
+        
+        Raises:
+            AgentOutputError: If no value matching the schema could be obtained
+        """
+        if self.mode == "off":
+            try:
+                value = json.loads(text)
+            except ValueError as e:
+                self._record("failed", source)
+                raise AgentOutputError(f"Invalid output from {source or model}: invalid JSON ({e})")
+            self._record("valid", source)
+            return value, False
+
+        value, repaired, problem = self._check(text, schema)
+        if not problem:
+            self._record("repaired" if repaired else "valid", source)
+            return value, repaired
+
+        if self.mode == "reprompt":
+            fragment = repair_json(text) if value is None else json.dumps(value)
+            prompt = REPAIR_PROMPT.format(
+                problem=problem,
+                schema=json.dumps(schema, separators=(",", ":")),
+                fragment=fragment[:self.fragment_chars]
+            )
+            try:
+                corrected = model_gateway.call(
+                    model, ResultCache.make_key(model, "repair", prompt),
+                    lambda: model_gateway.generate(model, prompt, source="output_repair", format=schema),
+                    source="output_repair"
+                )
+            except Exception as e:
+                problem = f"{problem}; correction failed ({e})"
+            else:
+                value, _, retry_problem = self._check(corrected, schema)
+                if not retry_problem:
+                    self._record("reprompted", source)
+                    return value, True
+                problem = retry_problem
+
+        self._record("failed", source)
+        raise AgentOutputError(f"Invalid output from {source or model}: {problem}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the outcome counters.
+        
+        Returns:
+            Dictionary with the count of each outcome and repair_rate, the
+            share of outputs that needed a repair or correction
+        """
+        with self._lock:
+            total = sum(self.counts.values())
+            fixed = self.counts["repaired"] + self.counts["reprompted"]
+            return {**self.counts, "repair_rate": fixed / total if total else 0.0}
+
+# Parser shared by all agents
+output_parser = OutputParser()
@@ -9,6 +9,9 @@ class PDFAnalysisAgent(AgentBase):
     """
     Agent specialized in extracting and analyzing content from PDF documents.
     """
+    tool_names = ("analyze_pdf_page", "analyze_pdf_pages", "extract_pdf_text", "search_pdf_pages")
+    calls_tools = True
+
     def get_prompt_template(self) -> str:
         """
         Define the prompt template for the PDF Analysis Agent.
@@ -22,9 +25,16 @@ class PDFAnalysisAgent(AgentBase):
             
             You are a PDF Analysis Agent specialized in extracting data from PDF documents.
             If the user's request involves analyzing a PDF:
-            1. Use the analyze_pdf_page tool to extract data
-            2. Format your response as JSON:
+            1. Use the analyze_pdf_page tool to extract data from a single page
+            2. Use the analyze_pdf_pages tool for questions about several pages or the whole document
+            3. Use the extract_pdf_text tool when the user only wants the text of pages
+            4. If the history holds search_pdf_pages results, analyze the best matching pages (use their page_number);
+               if it is unclear which page the question is about, call search_pdf_pages with the question first
+            5. Format your response as JSON, for example:
             {{"function": "analyze_pdf_page", "args": ["<pdf_path>", <page_number>, "<instruction>"]}}
+            or:
+            {{"function": "analyze_pdf_pages", "args": ["<pdf_path>", <first_page>, <last_page>, "<instruction>"]}}
+            (use -1 as last_page for the end of the document)
             
             Only respond if the request involves PDF analysis.
             """
\ No newline at end of file
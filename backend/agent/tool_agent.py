@@ -2,17 +2,17 @@
 """
 Implementation of the ToolAgent for selecting and executing tools.
 """
-import json
-from langchain_core.prompts import PromptTemplate
-from langchain_ollama import ChatOllama
-from langchain_core.output_parsers import StrOutputParser
+from typing import Any, Dict
 from backend.agent.base import AgentBase
-from backend.utils.helpers import ToolState, clip_history
+from backend.utils.helpers import ToolState
 
 class ToolAgent(AgentBase):
     """
     Agent for selecting and executing tools based on the user's request.
     """
+    calls_tools = True
+    multi_call = True
+
     def get_prompt_template(self) -> str:
         """
         Define the prompt template for the Tool Agent.
@@ -28,7 +28,22 @@ class ToolAgent(AgentBase):
             Based on the history and available image/PDF, choose the appropriate tool and arguments.
             Output in the format:
             {{"function": "<function>", "args": [<arg1>,<arg2>, ...]}}
+            If the request needs several independent analyses (e.g. comparing the image with a PDF page),
+            output all of them at once, they will run in parallel:
+            {{"calls": [{{"function": "<function>", "args": [...]}}, {{"function": "<function>", "args": [...]}}]}}
+        """
+
+    def get_prompt_inputs(self) -> Dict[str, Any]:
+        """
+        Add the image and PDF path information to the base prompt inputs.
+        
+        Returns:
+            Mapping of template variable names to values
         """
+        inputs = super().get_prompt_inputs()
+        inputs["image_path"] = self.state["image_path"] or "No image provided"
+        inputs["pdf_path"] = self.state["pdf_path"] or "No PDF provided"
+        return inputs
 
     def execute(self) -> ToolState:
         """
@@ -37,25 +52,6 @@ class ToolAgent(AgentBase):
         Returns:
             The updated tool state
         """
-        self.state["history"] = clip_history(self.state["history"])
-        template = self.get_prompt_template()
-        prompt = PromptTemplate.from_template(template)        
-        
-        llm = ChatOllama(model="gemma2:27b", format="json", temperature=0)
-        llm_chain = prompt | llm | StrOutputParser()
-        
-        generation = llm_chain.invoke({
-            "history": self.state["history"], 
-            "use_tool": self.state["use_tool"],
-            "tools_list": self.state["tools_list"],
-            "image_path": self.state["image_path"] or "No image provided",
-            "pdf_path": self.state["pdf_path"] or "No PDF provided"
-        })
-        
-        data = json.loads(generation)
+        super().execute()
         self.state["use_tool"] = True
-        self.state["tool_exec"] = generation
-        self.state["history"] += "\n" + generation
-        self.state["history"] = clip_history(self.state["history"])
-        
-        return self.state
\ No newline at end of file
+        return self.state
@@ -0,0 +1,232 @@
+# backend/batch.py
+"""
+Batch processing of many questions and files in one run.
+"""
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, TypedDict
+from backend.config import BATCH_WORKERS, CHAT_MODEL, VISION_MODEL, PDF_TEXT_MODE, PDF_MAX_PAGES_PER_CALL
+from backend.main import process_question, RequestCancelled
+from backend.utils.helpers import file_sha256
+
+class BatchItem(TypedDict, total=False):
+    """
+    Type definition for one question of a batch and the files it is about.
+    """
+    id: str
+    question: str
+    image: Optional[str]
+    pdf: Optional[str]
+
+def load_items(lines: Iterable[str], default_question: str = "") -> List[BatchItem]:
+    """
+    Read batch items from JSON lines.
+    
+    Each line is an object with "question" and optional "id", "image" and
+    "pdf" (file paths); blank lines are skipped.
+    
+    Args:
+        lines: The JSON lines
+        default_question: Question for items that do not give one
+    
+    Returns:
+        The batch items
+    
+    Raises:
+        ValueError: If a line is not a JSON object or has no question
+    """
+    items = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+        if not isinstance(item, dict):
+            raise ValueError(f"Line {line_number}: expected a JSON object")
+        item.setdefault("question", default_question)
+        if not item["question"]:
+            raise ValueError(f"Line {line_number}: missing question")
+        items.append(item)
+    return items
+
+def _prepare_file(path: str, kind: str) -> str:
+    """
+    Do the per-file work of a batch once: preprocess an image, or extract the
+    text of a PDF and render the pages that need the vision model.
+    
+    Nothing is written beside the file; derived data goes to the caches.
+    
+    Args:
+        path: Path to the file
+        kind: "image" or "pdf"
+    
+    Returns:
+        The model that questions about the file go to first
+    """
+    # Tool modules are imported on first use rather than with the batch API
+    from backend.tools.image_preprocess import image_preprocessor
+    from backend.tools.pdf_render import get_pdf_page_count
+    from backend.tools.pdf_text import get_pages_text
+    from backend.tools.page_cache import page_render_cache
+    
+    if kind == "image":
+        try:
+            image_preprocessor.prepare(path)
+        except Exception:
+            # The tool reports unreadable images with the item
+            pass
+        return VISION_MODEL
+
+    if PDF_TEXT_MODE != "auto":
+        return VISION_MODEL
+    try:
+        page_count = min(get_pdf_page_count(path), PDF_MAX_PAGES_PER_CALL)
+        pages = get_pages_text(path, 0, page_count - 1) if page_count else []
+    except Exception:
+        # No usable text layer, so every page goes to the vision model
+        return VISION_MODEL
+    vision_pages = [page_number for page_number, page in enumerate(pages) if page["needs_vision"]]
+    for page_number in vision_pages:
+        try:
+            page_render_cache.get_or_render(path, page_number)
+        except Exception:
+            break
+    return VISION_MODEL if vision_pages else CHAT_MODEL
+
+def _result(index: int, item: BatchItem, status: str, response: str, **extra: Any) -> Dict[str, Any]:
+    """
+    Build the result record of a batch item.
+    
+    Args:
+        index: Position of the item in the batch
+        item: The batch item
+        status: "ok" or "error"
+        response: The answer or error message
+        extra: Further fields, e.g. route and timing
+    
+    Returns:
+        The JSON-serializable result
+    """
+    return {
+        "index": index,
+        "id": item.get("id", str(index)),
+        "question": item["question"],
+        "image": item.get("image"),
+        "pdf": item.get("pdf"),
+        "status": status,
+        "response": response,
+        **extra
+    }
+
+def run_batch(items: List[BatchItem], workers: int = BATCH_WORKERS,
+              cancel_event: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Answer many questions about many files, yielding results as they finish.
+    
+    Files are deduplicated by content and prepared once up front (image
+    preprocessing, PDF text extraction and rendering of the pages that need
+    the vision model). Items
+    are then run grouped by the model they need first, so the chat and
+    vision models are not swapped in and out of GPU memory between items.
+    Results arrive in completion order; their "index" gives the item's
+    position in the batch. Closing the generator early (e.g. when a client
+    disconnects) cancels the running items before their threads are joined.
+    
+    Args:
+        items: The batch items
+        workers: Number of items (and files being prepared) processed concurrently
+        cancel_event: Optional event; once set, no further items are started
+            and running items are cancelled
+    
+    Yields:
+        Result dictionaries (see _result)
+    """
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    
+    # Map every file to one path per content, so per-path memos are shared
+    canonical: Dict[str, str] = {}
+    kinds: Dict[str, str] = {}
+    missing: Dict[str, str] = {}
+    by_digest: Dict[str, str] = {}
+    for item in items:
+        for kind in ("image", "pdf"):
+            path = item.get(kind)
+            if not path or path in canonical or path in missing:
+                continue
+            try:
+                canonical[path] = by_digest.setdefault(file_sha256(path), path)
+                kinds[canonical[path]] = kind
+            except OSError as e:
+                missing[path] = f"Error reading {kind} file {path}: {e.strerror or e}"
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        files = sorted(set(canonical.values()))
+        affinity = dict(zip(files, pool.map(lambda path: _prepare_file(path, kinds[path]), files)))
+
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for index, item in enumerate(items):
+            errors = [missing[item[kind]] for kind in ("image", "pdf") if item.get(kind) in missing]
+            if errors:
+                yield _result(index, item, "error", errors[0])
+                continue
+            models = [affinity[canonical[item[kind]]] for kind in ("image", "pdf") if item.get(kind)]
+            model = VISION_MODEL if VISION_MODEL in models else CHAT_MODEL
+            groups.setdefault(model, []).append(index)
+
+        def run(index: int) -> Dict[str, Any]:
+            item = items[index]
+            start = time.perf_counter()
+            result = process_question(
+                item["question"],
+                canonical.get(item.get("image")), canonical.get(item.get("pdf")),
+                cancel_event=cancel_event
+            )
+            answer = result["final_answer"] or ""
+            return _result(
+                index, item, "error" if answer.startswith("Error") else "ok", answer,
+                route=result["route"], cached=bool(result.get("cached")),
+                seconds=round(time.perf_counter() - start, 3)
+            )
+
+        for indexes in groups.values():
+            if cancel_event.is_set():
+                return
+            futures = [pool.submit(run, index) for index in indexes]
+            try:
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except RequestCancelled:
+                        pass
+            except BaseException:
+                # The consumer stopped reading: cancel the running items now,
+                # as leaving the pool waits for them
+                cancel_event.set()
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+
+def write_jsonl(results: Iterable[Dict[str, Any]], stream: IO[str]) -> int:
+    """
+    Write results as JSON lines, flushing after each one.
+    
+    Args:
+        results: The results to write
+        stream: Text stream to write to
+    
+    Returns:
+        The number of results written
+    """
+    count = 0
+    for result in results:
+        stream.write(json.dumps(result) + "\n")
+        stream.flush()
+        count += 1
+    return count
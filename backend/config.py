@@ -0,0 +1,152 @@
+# backend/config.py
+"""
+Runtime settings for the multimodal analysis system.
+
+Each setting can be overridden with an environment variable of the same name.
+"""
+import os
+
+# Resolution used when rasterizing PDF pages for the vision model
+PDF_RENDER_DPI = int(os.environ.get("PDF_RENDER_DPI", "200"))
+
+# Project-level scratch directory (created by run.py)
+TEMP_DIR = os.environ.get(
+    "TEMP_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp")
+)
+
+# Content-addressed store of uploaded files: location, disk quota, retention
+# after last use and how often expired files are swept
+UPLOAD_DIR = os.environ.get(
+    "UPLOAD_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+)
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", "2048"))
+UPLOAD_TTL = float(os.environ.get("UPLOAD_TTL", "86400"))
+UPLOAD_SWEEP_INTERVAL = float(os.environ.get("UPLOAD_SWEEP_INTERVAL", "600"))
+
+# On-disk cache of rendered PDF pages, shared by all worker processes
+PAGE_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(TEMP_DIR, "page_cache"))
+PAGE_CACHE_MAX_MB = int(os.environ.get("PAGE_CACHE_MAX_MB", "1024"))
+
+# Models served by Ollama
+CHAT_MODEL = os.environ.get("CHAT_MODEL", "gemma2:27b")
+VISION_MODEL = os.environ.get("VISION_MODEL", "llava:34b")
+
+# Images are downscaled to fit the vision model's input resolution and
+# re-encoded before upload; prepared images are cached in memory by content hash
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "1344"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "90"))
+IMAGE_CACHE_MAX_MB = int(os.environ.get("IMAGE_CACHE_MAX_MB", "128"))
+
+# Cache of vision model results keyed by image hash, model and instruction
+VISION_CACHE_BACKEND = os.environ.get("VISION_CACHE_BACKEND", "memory")  # memory, sqlite or none
+VISION_CACHE_TTL = float(os.environ.get("VISION_CACHE_TTL", "86400"))
+VISION_CACHE_MAX_ENTRIES = int(os.environ.get("VISION_CACHE_MAX_ENTRIES", "2048"))
+VISION_CACHE_PATH = os.environ.get("VISION_CACHE_PATH", os.path.join(TEMP_DIR, "vision_cache.sqlite3"))
+
+# Multi-page PDF analysis: render worker processes and maximum pages per tool call
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PAGES_PER_CALL = int(os.environ.get("PDF_MAX_PAGES_PER_CALL", "20"))
+
+# Tool calls of a multi-call plan run concurrently, at most TOOL_WORKERS at a time
+# per request; each such call may run for TOOL_TIMEOUT seconds from its start unless
+# TOOL_TIMEOUTS sets its own limit, e.g. "analyze_pdf_pages=1800". A single call
+# runs on the request thread without a timeout
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "4"))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "600"))
+TOOL_TIMEOUTS = os.environ.get("TOOL_TIMEOUTS", "analyze_pdf_pages=1800")
+
+# Text-layer fast path for PDF pages: "auto" answers from the extracted text with
+# the chat model unless a page looks scanned (less than PDF_TEXT_MIN_CHARS of text)
+# or holds a figure (an embedded image of at least PDF_FIGURE_MIN_PIXELS), "off"
+# always uses the vision model; extracted page text is cached by content hash
+PDF_TEXT_MODE = os.environ.get("PDF_TEXT_MODE", "auto")
+PDF_TEXT_MIN_CHARS = int(os.environ.get("PDF_TEXT_MIN_CHARS", "200"))
+PDF_FIGURE_MIN_PIXELS = int(os.environ.get("PDF_FIGURE_MIN_PIXELS", "40000"))
+PDF_TEXT_PROMPT_CHARS = int(os.environ.get("PDF_TEXT_PROMPT_CHARS", "12000"))
+PDF_TEXT_CACHE_BACKEND = os.environ.get("PDF_TEXT_CACHE_BACKEND", VISION_CACHE_BACKEND)
+PDF_TEXT_CACHE_MAX_ENTRIES = int(os.environ.get("PDF_TEXT_CACHE_MAX_ENTRIES", "8192"))
+PDF_TEXT_CACHE_PATH = os.environ.get("PDF_TEXT_CACHE_PATH", os.path.join(TEMP_DIR, "pdf_text_cache.sqlite3"))
+
+# Per-document page index (text, BM25 terms, thumbnails) built when a PDF is
+# uploaded: background build threads, pages returned by a search and thumbnail width
+DOC_INDEX_WORKERS = int(os.environ.get("DOC_INDEX_WORKERS", "1"))
+DOC_INDEX_TOP_K = int(os.environ.get("DOC_INDEX_TOP_K", "3"))
+DOC_INDEX_THUMBNAIL_WIDTH = int(os.environ.get("DOC_INDEX_THUMBNAIL_WIDTH", "160"))
+# Indexes of PDFs that are not uploads (e.g. local batch inputs), by content hash
+DOC_INDEX_DIR = os.environ.get("DOC_INDEX_DIR", os.path.join(TEMP_DIR, "doc_index"))
+
+# Asynchronous job API: worker threads, queued jobs beyond those, result retention and long-poll limit
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_DEPTH = int(os.environ.get("JOB_QUEUE_DEPTH", "16"))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "600"))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", "30"))
+
+# Production server (run.py serve): gunicorn worker processes, worker class
+# ("gthread" or "gevent"), threads per gthread worker, seconds a silent worker
+# lives before it is restarted, seconds workers get to finish requests on reload
+# or shutdown, and requests after which a worker is replaced (0 for never).
+# Jobs, sessions and model concurrency limits are per process, so one worker
+# with many threads is the default
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "1"))
+SERVER_WORKER_CLASS = os.environ.get("SERVER_WORKER_CLASS", "gthread")
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "16"))
+SERVER_TIMEOUT = int(os.environ.get("SERVER_TIMEOUT", "120"))
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "60"))
+SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", "0"))
+
+# Batch API: items processed concurrently and the item limit of one /batch request
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+
+# Fast pre-router: "off" always asks the chat agent, "agent" skips it for
+# unambiguous file questions, "tool" also calls the tool directly when its
+# arguments can be derived from the question
+FAST_ROUTER_MODE = os.environ.get("FAST_ROUTER_MODE", "tool")
+
+# Ollama server (None uses the client default / OLLAMA_HOST) and per-model concurrency,
+# e.g. "gemma2:27b=2,llava:34b=1"; models not listed use MODEL_DEFAULT_CONCURRENCY
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST") or None
+MODEL_CONCURRENCY = os.environ.get("MODEL_CONCURRENCY", f"{CHAT_MODEL}=2,{VISION_MODEL}=1")
+MODEL_DEFAULT_CONCURRENCY = int(os.environ.get("MODEL_DEFAULT_CONCURRENCY", "2"))
+MODEL_WAIT_TIMEOUT = float(os.environ.get("MODEL_WAIT_TIMEOUT", "300"))
+
+# Model-grouped scheduling: "grouped" runs calls of one model at a time, so the
+# Ollama server serves a burst of calls before another model is loaded, "off" runs
+# models independently. A call for another model waits until the loaded model is
+# idle, at most MODEL_SWITCH_MAX_WAIT seconds or MODEL_BURST_CALLS further calls of
+# the loaded model, before that model is drained and the waiting model swapped in;
+# a model just swapped in first runs the calls queued for it
+MODEL_SCHEDULER = os.environ.get("MODEL_SCHEDULER", "grouped")
+MODEL_SWITCH_MAX_WAIT = float(os.environ.get("MODEL_SWITCH_MAX_WAIT", "2"))
+MODEL_BURST_CALLS = int(os.environ.get("MODEL_BURST_CALLS", "8"))
+
+# Server-side conversation sessions: token budget of the context given to agents,
+# number of recent turns kept verbatim, idle expiry and maximum sessions per process
+SESSION_CONTEXT_TOKENS = int(os.environ.get("SESSION_CONTEXT_TOKENS", "800"))
+SESSION_RECENT_TURNS = int(os.environ.get("SESSION_RECENT_TURNS", "4"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "3600"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "1000"))
+
+# End-to-end cache of process_question results keyed by normalized question, file
+# hashes, session context and a fingerprint of the models, prompts and tools;
+# bump RESPONSE_CACHE_VERSION to invalidate entries after other behaviour changes
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")  # memory, sqlite or none
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", os.path.join(TEMP_DIR, "response_cache.sqlite3"))
+RESPONSE_CACHE_VERSION = os.environ.get("RESPONSE_CACHE_VERSION", "1")
+
+# Agent output parsing: "reprompt" repairs common JSON defects and sends output that
+# is still invalid, or does not match the agent's schema, back to the model once for
+# correction (without the original prompt, truncated to OUTPUT_REPAIR_FRAGMENT_CHARS),
+# "repair" only repairs, "off" requires valid JSON as generated
+OUTPUT_REPAIR_MODE = os.environ.get("OUTPUT_REPAIR_MODE", "reprompt")
+OUTPUT_REPAIR_FRAGMENT_CHARS = int(os.environ.get("OUTPUT_REPAIR_FRAGMENT_CHARS", "2000"))
+
+# Request state: event log capacity, history size given to prompts and
+# maximum length of a single tool result within that history
+STATE_MAX_EVENTS = int(os.environ.get("STATE_MAX_EVENTS", "32"))
+HISTORY_MAX_CHARS = int(os.environ.get("HISTORY_MAX_CHARS", "8000"))
+TOOL_RESULT_PROMPT_CHARS = int(os.environ.get("TOOL_RESULT_PROMPT_CHARS", "2000"))
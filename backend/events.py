@@ -0,0 +1,45 @@
+# backend/events.py
+"""
+Progress events emitted while a request is processed, used for streaming.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+# Callback receiving (event, data) for the request running in this context
+_event_sink: ContextVar[Optional[Callable[[str, Dict[str, Any]], None]]] = ContextVar("event_sink", default=None)
+
+@contextmanager
+def event_sink(callback: Callable[[str, Dict[str, Any]], None]):
+    """
+    Route events emitted in the current context to a callback.
+    
+    Args:
+        callback: Function called with the event name and its data
+    """
+    token = _event_sink.set(callback)
+    try:
+        yield
+    finally:
+        _event_sink.reset(token)
+
+def is_streaming() -> bool:
+    """
+    Check whether anyone is listening for events in the current context.
+    
+    Returns:
+        True if an event sink is installed, False otherwise
+    """
+    return _event_sink.get() is not None
+
+def emit_event(event: str, **data: Any) -> None:
+    """
+    Emit an event to the current context's sink, if any.
+    
+    Args:
+        event: The event name, e.g. "node_start" or "token"
+        data: The event payload
+    """
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event, data)
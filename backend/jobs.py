@@ -0,0 +1,202 @@
+# backend/jobs.py
+"""
+Background job execution for long-running requests.
+"""
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from backend.config import JOB_WORKERS, JOB_QUEUE_DEPTH, JOB_RESULT_TTL
+from backend.main import RequestCancelled
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the job queue is full.
+    """
+    pass
+
+class Job:
+    """
+    A unit of work submitted to the JobManager and its outcome.
+    """
+    def __init__(self):
+        """
+        Initialize a queued job with a fresh ID.
+        """
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.future = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get a JSON-serializable summary of the job.
+        
+        Returns:
+            Dictionary with the job ID, status, timings and error
+        """
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool with a bounded queue.
+    
+    Jobs live in the memory of the process that accepted them, so clients must
+    poll the same process (or the app must run with a single worker process).
+    """
+    def __init__(self, max_workers: int = JOB_WORKERS, queue_depth: int = JOB_QUEUE_DEPTH,
+                 result_ttl: float = JOB_RESULT_TTL):
+        """
+        Initialize the manager.
+        
+        Args:
+            max_workers: Number of jobs that run concurrently
+            queue_depth: Number of jobs that may wait for a free worker
+            result_ttl: Seconds a finished job is kept for polling
+        """
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+        """
+        Queue a function call as a job.
+        
+        The function receives the job's cancel event as the cancel_event
+        keyword argument and should stop early when it is set.
+        
+        Args:
+            func: The function to run
+            args: Positional arguments for the function
+            kwargs: Keyword arguments for the function
+            
+        Returns:
+            The queued job
+            
+        Raises:
+            QueueFullError: If all workers are busy and the queue is full
+        """
+        job = Job()
+        with self._lock:
+            self._prune()
+            if self._active >= self.max_workers + self.queue_depth:
+                raise QueueFullError("Job queue is full")
+            self._active += 1
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Look up a job.
+        
+        Args:
+            job_id: The job ID
+            
+        Returns:
+            The job, or None if it is unknown or has expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job.
+        
+        A queued job is cancelled immediately; a running job is asked to stop
+        and is marked cancelled once it returns.
+        
+        Args:
+            job_id: The job ID
+            
+        Returns:
+            The job, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is None or job.done_event.is_set():
+            return job
+        job.cancel_event.set()
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        else:
+            with self._lock:
+                if not job.done_event.is_set():
+                    job.status = "cancelling"
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        """
+        Execute a job on a worker thread and record its outcome.
+        
+        Args:
+            job: The job being run
+            func: The function to run
+            args: Positional arguments for the function
+            kwargs: Keyword arguments for the function
+        """
+        # Checked under the lock so a "cancelling" status set by cancel() is not overwritten
+        with self._lock:
+            cancelled = job.cancel_event.is_set() or job.done_event.is_set()
+            if not cancelled:
+                job.status = "running"
+                job.started_at = time.time()
+        if cancelled:
+            self._finish(job, "cancelled")
+            return
+        try:
+            job.result = func(*args, cancel_event=job.cancel_event, **kwargs)
+            self._finish(job, "cancelled" if job.cancel_event.is_set() else "succeeded")
+        except RequestCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, "failed")
+
+    def _finish(self, job: Job, status: str) -> None:
+        """
+        Mark a job as finished and release its queue slot.
+        
+        Args:
+            job: The finished job
+            status: The final status
+        """
+        with self._lock:
+            if job.done_event.is_set():
+                return
+            job.status = status
+            job.finished_at = time.time()
+            self._active -= 1
+            job.done_event.set()
+
+    def _prune(self) -> None:
+        """
+        Drop finished jobs older than the result TTL. Caller must hold the lock.
+        """
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+# Shared job manager used by the web application
+job_manager = JobManager()
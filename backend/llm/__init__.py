@@ -0,0 +1,5 @@
+# backend/llm/__init__.py
+"""
+Shared access layer for the models served by Ollama.
+"""
+from backend.llm.gateway import ModelGateway, ModelBusyError, model_gateway
@@ -0,0 +1,346 @@
+# backend/llm/gateway.py
+"""
+Model gateway with per-model concurrency limits, model-grouped scheduling and request coalescing.
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from backend.config import (
+    OLLAMA_HOST, MODEL_CONCURRENCY, MODEL_DEFAULT_CONCURRENCY, MODEL_WAIT_TIMEOUT,
+    MODEL_SCHEDULER, MODEL_SWITCH_MAX_WAIT, MODEL_BURST_CALLS
+)
+from backend.events import is_streaming, emit_event
+from backend.metrics import timed, record_tokens, MODEL_CALL_SECONDS, MODEL_WAIT_SECONDS, MODEL_SWITCHES
+
+class ModelBusyError(TimeoutError):
+    """
+    Raised when a model call waits longer than the gateway timeout for a free slot or its model's turn.
+    """
+    pass
+
+class _InflightCall:
+    """
+    A model call in progress that identical concurrent calls can wait for.
+    """
+    def __init__(self):
+        """
+        Initialize an unfinished call.
+        """
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    """
+    Parse a "model=limit,model=limit" concurrency specification.
+    
+    Args:
+        spec: The specification string
+        
+    Returns:
+        Dictionary mapping model names to concurrency limits
+    """
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, limit = item.rsplit("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+class ModelScheduler:
+    """
+    Admits model calls within per-model concurrency limits, one model at a time.
+    
+    Loading a large model into GPU memory costs more than most calls, so in
+    grouped mode only the active (loaded) model runs. Calls for other models
+    queue until the active model is idle, or until the oldest of them has
+    waited max_wait seconds or burst_calls more calls of the active model
+    have started; the active model then takes no new calls, drains, and the
+    model with the longest-waiting call is swapped in. Waiting is counted
+    from the swap-in of the active model at the earliest, and a freshly
+    swapped-in model first runs the calls that were queued for it (up to
+    its limit or burst_calls, whichever is larger), so each switch pays for
+    a burst rather than a single call. In ungrouped mode models run
+    independently.
+    """
+    def __init__(self, limits: Dict[str, int], default_limit: int, grouped: bool = MODEL_SCHEDULER == "grouped",
+                 max_wait: float = MODEL_SWITCH_MAX_WAIT, burst_calls: int = MODEL_BURST_CALLS):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            limits: Concurrency limit per model name
+            default_limit: Limit for models without an explicit entry
+            grouped: Whether to run one model at a time
+            max_wait: Seconds a call for another model waits before the active model is drained
+            burst_calls: Calls of the active model started while others wait before it is drained
+        """
+        self.limits = limits
+        self.default_limit = default_limit
+        self.grouped = grouped
+        self.max_wait = max_wait
+        self.burst_calls = burst_calls
+        self.active: Optional[str] = None
+        self.switches = 0
+        self._active_since = 0.0
+        # Calls of the active model started since it was swapped in, and how
+        # many of them run before it can be made to drain
+        self._started = 0
+        self._guaranteed = 0
+        self._burst = 0
+        self._running: Dict[str, int] = {}
+        # Arrival times of the waiting calls of each model, oldest first
+        self._waiting: Dict[str, List[float]] = {}
+        self._condition = threading.Condition()
+
+    def _switch_due(self, now: float) -> bool:
+        """
+        Check whether the active model has to make way for a waiting model.
+        
+        Args:
+            now: The current monotonic time
+            
+        Returns:
+            True if another model has waited too long or the active model's burst is used up
+        """
+        waits = [queue[0] for model, queue in self._waiting.items() if queue and model != self.active]
+        if not waits or self._started < self._guaranteed:
+            return False
+        # Calls queued while the previous model drained only start waiting on this one at its swap-in
+        waited = now - max(min(waits), self._active_since)
+        return waited >= self.max_wait or self._burst >= self.burst_calls
+
+    def _can_start(self, model: str, now: float) -> bool:
+        """
+        Check whether a call may start now, swapping in its model if it is the model's turn.
+        
+        Must be called with the condition held.
+        
+        Args:
+            model: The model of the call
+            now: The current monotonic time
+            
+        Returns:
+            True if the call may start
+        """
+        if self._running.get(model, 0) >= self.limits.get(model, self.default_limit):
+            return False
+        if not self.grouped:
+            return True
+        if self.active == model:
+            return not self._switch_due(now)
+        if self.active is not None:
+            if self._running.get(self.active, 0) or (self._waiting.get(self.active) and not self._switch_due(now)):
+                return False
+        # The model whose call waited longest goes next
+        queues = [(queue[0], name) for name, queue in self._waiting.items() if queue and name != self.active]
+        if min(queues)[1] != model:
+            return False
+        limit = self.limits.get(model, self.default_limit)
+        self.active = model
+        self.switches += 1
+        self._active_since = now
+        self._started = 0
+        self._guaranteed = min(len(self._waiting[model]), max(limit, self.burst_calls))
+        self._burst = 0
+        MODEL_SWITCHES.inc(model=model)
+        return True
+
+    def acquire(self, model: str, timeout: float) -> bool:
+        """
+        Wait until a call of a model may start.
+        
+        Args:
+            model: The model of the call
+            timeout: Maximum seconds to wait
+            
+        Returns:
+            True if the call may start, False if the wait timed out
+        """
+        with self._condition:
+            arrived = now = time.monotonic()
+            queue = self._waiting.setdefault(model, [])
+            queue.append(arrived)
+            try:
+                while not self._can_start(model, now):
+                    remaining = arrived + timeout - now
+                    if remaining <= 0:
+                        return False
+                    # Waiting calls become due as time passes, so re-check at least every max_wait
+                    self._condition.wait(min(remaining, self.max_wait) if self.grouped else remaining)
+                    now = time.monotonic()
+                if self.grouped:
+                    self._started += 1
+                    if any(waits for name, waits in self._waiting.items() if waits and name != model):
+                        self._burst += 1
+                self._running[model] = self._running.get(model, 0) + 1
+                return True
+            finally:
+                queue.remove(arrived)
+                self._condition.notify_all()
+
+    def release(self, model: str) -> None:
+        """
+        Mark a call of a model as finished.
+        
+        Args:
+            model: The model of the call
+        """
+        with self._condition:
+            self._running[model] -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the scheduler state.
+        
+        Returns:
+            Dictionary with the active model, the number of model switches and
+            the running and waiting calls per model
+        """
+        with self._condition:
+            return {
+                "active": self.active,
+                "switches": self.switches,
+                "running": {model: count for model, count in self._running.items() if count},
+                "waiting": {model: len(queue) for model, queue in self._waiting.items() if queue}
+            }
+
+class ModelGateway:
+    """
+    Single entry point for calls to the Ollama server.
+    
+    Each model has its own concurrency limit, and calls are scheduled so
+    one model serves a burst before another is loaded (see ModelScheduler),
+    with calls waiting for their turn up to a timeout. Identical calls that
+    arrive while one is in flight share its result instead of reaching the
+    server again. The shared ollama client keeps its HTTP connections open
+    between requests.
+    """
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = MODEL_DEFAULT_CONCURRENCY,
+                 wait_timeout: float = MODEL_WAIT_TIMEOUT, host: Optional[str] = OLLAMA_HOST):
+        """
+        Initialize the gateway.
+        
+        Args:
+            limits: Concurrency limit per model name
+            default_limit: Limit for models without an explicit entry
+            wait_timeout: Seconds a call may wait for a free slot and its model's turn
+            host: Ollama server URL (None for the client default)
+        """
+        self.limits = limits if limits is not None else parse_concurrency(MODEL_CONCURRENCY)
+        self.default_limit = default_limit
+        self.wait_timeout = wait_timeout
+        self.host = host
+        self._client = None
+        self.scheduler = ModelScheduler(self.limits, default_limit)
+        self._inflight: Dict[str, _InflightCall] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        """
+        The ollama client, created on first use since importing ollama is slow.
+        
+        Returns:
+            The shared ollama.Client
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import ollama
+                    self._client = ollama.Client(host=self.host)
+        return self._client
+
+    def reset_client(self) -> None:
+        """
+        Drop the ollama client, so a forked worker does not share the parent's connections.
+        """
+        self._client = None
+
+    def call(self, model: str, key: str, func: Callable[[], Any], source: str = "") -> Any:
+        """
+        Run a model call within the model's concurrency limit, coalescing identical calls.
+        
+        Args:
+            model: The model the call uses
+            key: Identity of the call; concurrent calls with the same key share one result
+            func: Function performing the upstream call
+            source: Label for token events re-emitted to coalesced streaming callers
+            
+        Returns:
+            The result of func
+            
+        Raises:
+            ModelBusyError: If no slot became free within the wait timeout (for
+                coalesced calls, if the shared call's leader timed out)
+        """
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InflightCall()
+        
+        if not leader:
+            # The leader bounds its own wait for a slot and always finishes, so
+            # a follower only fails if the leader's call does
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            # The leader streamed its tokens to its own client; send ours in one piece
+            if is_streaming() and isinstance(inflight.result, str):
+                emit_event("token", source=source, text=inflight.result)
+            return inflight.result
+        
+        try:
+            with timed(MODEL_WAIT_SECONDS, model=model):
+                acquired = self.scheduler.acquire(model, self.wait_timeout)
+            if not acquired:
+                raise ModelBusyError(f"Timed out waiting for a free {model} slot")
+            try:
+                with timed(MODEL_CALL_SECONDS, model=model):
+                    inflight.result = func()
+            finally:
+                self.scheduler.release(model)
+            return inflight.result
+        except BaseException as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.done.set()
+
+    def generate(self, model: str, prompt: str, images: Optional[List[Any]] = None, source: str = "",
+                 format: Any = None) -> str:
+        """
+        Run a plain completion, passing tokens through when the request is streamed.
+        
+        This is the upstream call itself; wrap it in call() to apply the
+        concurrency limit and coalescing.
+        
+        Args:
+            model: The model name
+            prompt: The prompt text
+            images: Optional images (paths or bytes) for vision models
+            source: Label for the token events
+            format: Optional output format, "json" or a JSON schema
+            
+        Returns:
+            The model's response text
+        """
+        if not is_streaming():
+            response = self.client.generate(model=model, prompt=prompt, images=images, format=format, stream=False)
+            record_tokens(model, response.get('prompt_eval_count'), response.get('eval_count'))
+            return response['response']
+        
+        chunks = []
+        for chunk in self.client.generate(model=model, prompt=prompt, images=images, format=format, stream=True):
+            chunks.append(chunk['response'])
+            emit_event("token", source=source, text=chunk['response'])
+            if chunk.get('done'):
+                record_tokens(model, chunk.get('prompt_eval_count'), chunk.get('eval_count'))
+        return "".join(chunks)
+
+# Shared gateway used by the agents and tools
+model_gateway = ModelGateway()
@@ -2,13 +2,150 @@
 Main backend processing module for the multimodal analysis system.
 """
 import json
-from typing import Dict, Optional, Any
+import time
+import sys
+import queue
+import threading
+from typing import Dict, Iterator, Optional, Any
 
-from backend.utils.helpers import ToolState, clip_history
-from backend.tools import get_tools_list
-from backend.workflow import setup_workflow
+from backend.config import (
+    CHAT_MODEL, VISION_MODEL, FAST_ROUTER_MODE, PDF_TEXT_MODE, RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_PATH, RESPONSE_CACHE_VERSION
+)
+from backend.utils.cache import ResultCache, create_cache
+from backend.utils.helpers import ToolState, EventLog, file_sha256
+from backend.sessions import session_store, Turn
+from backend.uploads import upload_store
+from backend.workflow import get_workflow
+from backend.llm.gateway import model_gateway
+from backend.events import event_sink
+from backend.metrics import timed, metrics_registry, cache_collector, REQUEST_SECONDS
+from backend.tools.registry import tool_catalog
+from backend.router import fast_router
+from backend.agent.chat_agent import ChatAgent
+from backend.agent.tool_agent import ToolAgent
+from backend.agent.image_agent import ImageAnalysisAgent
+from backend.agent.pdf_agent import PDFAnalysisAgent
 
-def process_question(question: str, image_path: Optional[str] = None, pdf_path: Optional[str] = None) -> Dict[str, Any]:
+# Whole results of process_question, see response_cache_key()
+response_cache = create_cache(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_PATH)
+metrics_registry.add_collector(cache_collector("response_cache", response_cache))
+
+_AGENT_CLASSES = (ChatAgent, ToolAgent, ImageAnalysisAgent, PDFAnalysisAgent)
+_fingerprint: Optional[str] = None
+
+class RequestCancelled(Exception):
+    """
+    Raised when a request is cancelled while its workflow is running.
+    """
+    pass
+
+def warm_up() -> None:
+    """
+    Build the compiled workflow and every agent's LLM chain ahead of the first request.
+    
+    Calling this at startup moves the one-off graph compilation and client
+    construction out of the request path. It is safe to call more than once.
+    """
+    get_workflow()
+    for agent_class in _AGENT_CLASSES:
+        agent_class().get_chain()
+
+def reset_after_fork() -> None:
+    """
+    Give a worker process forked from a preloaded parent its own connections and pools.
+    
+    The compiled workflow, agent chains and tool catalog are inherited as they
+    are. Tool modules the parent never loaded have nothing to reset.
+    """
+    model_gateway.reset_client()
+    pdf_tools = sys.modules.get("backend.tools.pdf_tools")
+    if pdf_tools is not None:
+        pdf_tools.reset_render_pool()
+    doc_index = sys.modules.get("backend.tools.doc_index")
+    if doc_index is not None:
+        doc_index.document_index_store.reset_pool()
+
+def response_fingerprint() -> str:
+    """
+    Fingerprint the settings that shape a response: models, agent prompts, tools and routing.
+    
+    Returns:
+        The fingerprint, computed once per process
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        # Tool modules load on first use, like the tool catalog below
+        from backend.tools.image_preprocess import image_preprocessor
+        _fingerprint = ResultCache.make_key(
+            RESPONSE_CACHE_VERSION, CHAT_MODEL, VISION_MODEL, FAST_ROUTER_MODE, PDF_TEXT_MODE,
+            image_preprocessor.fingerprint, tool_catalog.describe(),
+            [agent_class().get_prompt_template() for agent_class in _AGENT_CLASSES]
+        )
+    return _fingerprint
+
+def response_cache_key(state: ToolState) -> Optional[str]:
+    """
+    Build the response cache key of a request.
+    
+    Questions are compared case- and whitespace-insensitively and files by
+    content, so the same question about a re-uploaded file is a hit. The
+    session context is part of the key unless the fast router answers the
+    request with tool calls alone.
+    
+    Args:
+        state: The initial tool state
+        
+    Returns:
+        The cache key, or None if a file cannot be read
+    """
+    try:
+        files = [file_sha256(path) if path else None for path in (state["image_path"], state["pdf_path"])]
+    except OSError:
+        return None
+    context = "" if fast_router.answers_directly(state) else state["context"]
+    return ResultCache.make_key(" ".join(state["question"].lower().split()), files, context, response_fingerprint())
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+    """
+    Check whether a result may be cached; failed requests and tool errors are not.
+    
+    Args:
+        result: The final tool state
+        
+    Returns:
+        True if the result can be reused
+    """
+    if not result["final_answer"] or result["final_answer"].startswith("Error"):
+        return False
+    return not any(
+        event["kind"] == "error" or (event["kind"] == "tool_result" and event["content"].startswith("Error"))
+        for event in result["events"]
+    )
+
+def record_turn(session_id: str, question: str, result: Dict[str, Any]) -> None:
+    """
+    Store a finished exchange in the session store.
+    
+    Args:
+        session_id: The session ID
+        question: The user's question
+        result: The final tool state
+    """
+    events = result["events"]
+    session_store.add_turn(session_id, Turn(
+        question=question,
+        agent_outputs=[event["content"] for event in events.of_kind("agent_output")],
+        tool_results=[event["content"] for event in events.of_kind("tool_result")],
+        response=result["final_answer"],
+        image_path=result.get("image_path"),
+        pdf_path=result.get("pdf_path"),
+        created_at=time.time()
+    ))
+
+def process_question(question: str, image_path: Optional[str] = None, pdf_path: Optional[str] = None,
+                     cancel_event: Optional[threading.Event] = None, session_id: Optional[str] = None,
+                     use_cache: bool = True) -> Dict[str, Any]:
     """
     Process a user question with optional image or PDF file.
     
@@ -16,36 +153,145 @@ def process_question(question: str, image_path: Optional[str] = None, pdf_path:
         question: The user's question or instruction
         image_path: Optional path to an uploaded image file
         pdf_path: Optional path to an uploaded PDF file
+        cancel_event: Optional event that stops the workflow at the next graph node when set
+        session_id: Optional conversation session; earlier turns are given to the agents as
+            context, and files uploaded earlier in the session are reused when none are passed
+        use_cache: Whether to answer from the response cache; False forces a fresh
+            answer, which then replaces the cached one
         
     Returns:
-        The updated tool state after processing
+        The updated tool state after processing; "cached" is set when it
+        comes from the response cache
+        
+    Raises:
+        RequestCancelled: If cancel_event was set before the workflow finished
     """
+    context = ""
+    if session_id:
+        image_path, pdf_path = session_store.resolve_files(session_id, image_path, pdf_path)
+        context = session_store.build_context(session_id)
+    
+    # Keep the files in use from expiring while the request runs
+    upload_store.touch(image_path)
+    upload_store.touch(pdf_path)
+    
     # Initialize the state
     state = ToolState(
-        history=question,
+        question=question,
+        events=EventLog(),
+        final_answer="",
         use_tool=False,
         tool_exec="",
-        tools_list=get_tools_list(),
         image_path=image_path,
-        pdf_path=pdf_path
+        pdf_path=pdf_path,
+        route="",
+        context=context
     )
     
+    cache_key = response_cache_key(state) if response_cache is not None else None
+    if use_cache and cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            result = json.loads(cached)
+            events = EventLog()
+            for event in result["events"]:
+                events.append(event["kind"], event["source"], event["content"])
+            result = {
+                "question": question,
+                "events": events,
+                "final_answer": result["final_answer"],
+                "use_tool": False,
+                "tool_exec": "",
+                "image_path": image_path,
+                "pdf_path": pdf_path,
+                "route": result["route"],
+                "context": context,
+                "cached": True
+            }
+            if session_id:
+                record_turn(session_id, question, result)
+            return result
+    
     try:
-        # Setup and run the workflow
-        workflow = setup_workflow()
-        result = workflow.invoke(state)
+        # Run the shared, precompiled workflow
+        workflow = get_workflow()
+        result = state
+        with timed(REQUEST_SECONDS):
+            for result in workflow.stream(state, stream_mode="values"):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RequestCancelled("Request was cancelled")
         
-        # Ensure the history is properly clipped
-        result["history"] = clip_history(result["history"])
+        if session_id:
+            record_turn(session_id, question, result)
+        
+        if cache_key is not None and _cacheable(result):
+            response_cache.set(cache_key, json.dumps({
+                "events": list(result["events"]),
+                "final_answer": result["final_answer"],
+                "route": result["route"]
+            }))
         
         return result
+    except RequestCancelled:
+        raise
     except Exception as e:
         # Handle any errors gracefully
+        message = f"Error processing query: {str(e)}"
+        events = EventLog()
+        events.append("error", "process_question", message)
         return {
-            "history": f"Error processing query: {str(e)}",
+            "question": question,
+            "events": events,
+            "final_answer": message,
             "use_tool": False,
             "tool_exec": "",
-            "tools_list": get_tools_list(),
             "image_path": image_path,
-            "pdf_path": pdf_path
-        }
\ No newline at end of file
+            "pdf_path": pdf_path,
+            "route": "",
+            "context": context
+        }
+
+def stream_question(question: str, image_path: Optional[str] = None, pdf_path: Optional[str] = None,
+                    session_id: Optional[str] = None, use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Process a user question and yield progress events as they happen.
+    
+    The workflow runs on a background thread. Events are dictionaries with an
+    "event" key: "node_start"/"node_end" for graph node transitions, "token"
+    for model output, and finally "result" (with the final state) or
+    "cancelled". Closing the iterator early cancels the request.
+    
+    Args:
+        question: The user's question or instruction
+        image_path: Optional path to an uploaded image file
+        pdf_path: Optional path to an uploaded PDF file
+        session_id: Optional conversation session (see process_question)
+        use_cache: Whether to answer from the response cache (see process_question)
+        
+    Yields:
+        Event dictionaries
+    """
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+    cancel_event = threading.Event()
+    
+    def run() -> None:
+        with event_sink(lambda event, data: events.put({"event": event, **data})):
+            try:
+                result = process_question(question, image_path, pdf_path, cancel_event=cancel_event,
+                                          session_id=session_id, use_cache=use_cache)
+                events.put({"event": "result", "result": result})
+            except RequestCancelled:
+                events.put({"event": "cancelled"})
+            finally:
+                events.put(None)
+    
+    threading.Thread(target=run, name="stream-question", daemon=True).start()
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+    finally:
+        # Stop the workflow if the consumer went away before the end
+        cancel_event.set()
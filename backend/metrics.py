@@ -0,0 +1,315 @@
+# backend/metrics.py
+"""
+Latency and usage metrics in the Prometheus text exposition format.
+
+Metrics are kept per process. Timed stages are also recorded in a
+per-request breakdown when one is being collected (see collect_timings).
+"""
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Timing breakdown of the request running in this context, if one is collected
+_request_timings: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("request_timings", default=None)
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """
+    Format a label set for the exposition format.
+    
+    Args:
+        labelnames: The label names
+        values: The label values, in the same order
+        extra: An additional preformatted label, e.g. 'le="0.5"'
+        
+    Returns:
+        The label block including braces, or an empty string
+    """
+    parts = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        """
+        Initialize the counter.
+        
+        Args:
+            name: The metric name
+            help_text: The metric description
+            labelnames: Names of the labels values are split by
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """
+        Increase the counter.
+        
+        Args:
+            amount: The amount to add
+            labels: Label values
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        """
+        Render the counter.
+        
+        Returns:
+            Exposition format lines
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """
+    A distribution of observed values in cumulative buckets, optionally split by labels.
+    """
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+        
+        Args:
+            name: The metric name
+            help_text: The metric description
+            labelnames: Names of the labels observations are split by
+            buckets: Upper bounds of the buckets
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """
+        Record an observation.
+        
+        Args:
+            value: The observed value
+            labels: Label values
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts, sum, count]
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        """
+        Render the histogram.
+        
+        Returns:
+            Exposition format lines
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, observations) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    bucket_labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                bucket_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {observations}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {observations}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together for the /metrics endpoint.
+    """
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """
+        Create and register a counter.
+        
+        Returns:
+            The new counter
+        """
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Create and register a histogram.
+        
+        Returns:
+            The new histogram
+        """
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """
+        Register a function producing extra exposition lines at render time.
+        
+        Args:
+            collector: Function returning exposition format lines
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        
+        Returns:
+            The exposition text
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+REQUEST_SECONDS = metrics_registry.histogram(
+    "request_duration_seconds", "End-to-end processing time of a question")
+WORKFLOW_SETUP_SECONDS = metrics_registry.histogram(
+    "workflow_setup_duration_seconds", "Time spent building and compiling the workflow graph")
+GRAPH_NODE_SECONDS = metrics_registry.histogram(
+    "graph_node_duration_seconds", "Time spent in each workflow graph node", ("node",))
+TOOL_CALL_SECONDS = metrics_registry.histogram(
+    "tool_call_duration_seconds", "Time spent executing each tool", ("tool",))
+MODEL_CALL_SECONDS = metrics_registry.histogram(
+    "model_call_duration_seconds", "Time spent in upstream model calls", ("model",))
+MODEL_WAIT_SECONDS = metrics_registry.histogram(
+    "model_wait_duration_seconds", "Time model calls waited for a free concurrency slot and their model's turn", ("model",))
+MODEL_SWITCHES = metrics_registry.counter(
+    "model_switches_total", "Times the model scheduler swapped in a model", ("model",))
+MODEL_TOKENS = metrics_registry.counter(
+    "model_tokens_total", "Tokens processed by model calls", ("model", "type"))
+PDF_RENDER_SECONDS = metrics_registry.histogram(
+    "pdf_render_duration_seconds", "Time spent rasterizing PDF pages")
+PDF_TEXT_SECONDS = metrics_registry.histogram(
+    "pdf_text_duration_seconds", "Time spent extracting PDF text layers and image listings")
+IMAGE_PREPROCESS_SECONDS = metrics_registry.histogram(
+    "image_preprocess_duration_seconds", "Time spent decoding, downscaling and re-encoding images")
+RESPONSE_EXTRACT_SECONDS = metrics_registry.histogram(
+    "response_extract_duration_seconds", "Time spent extracting the final response from a result")
+AGENT_OUTPUT_PARSES = metrics_registry.counter(
+    "agent_output_parses_total", "Agent outputs by parse outcome (valid, repaired, reprompted, failed)", ("agent", "outcome"))
+FAST_ROUTER_ROUTES = metrics_registry.counter(
+    "fast_router_routes_total", "Requests by the entry route chosen by the fast pre-router", ("route",))
+
+def cache_collector(name: str, cache: Any) -> Callable[[], List[str]]:
+    """
+    Build a collector exporting a ResultCache's hit and miss counters.
+    
+    Args:
+        name: Metric name prefix, e.g. "vision_cache"
+        cache: The ResultCache (or None if caching is disabled)
+        
+    Returns:
+        A collector function for MetricsRegistry.add_collector
+    """
+    def collect() -> List[str]:
+        if cache is None:
+            return []
+        stats = cache.stats()
+        lines = []
+        for field in ("hits", "misses"):
+            lines.append(f"# TYPE {name}_{field}_total counter")
+            lines.append(f"{name}_{field}_total {stats[field]}")
+        return lines
+    return collect
+
+@contextmanager
+def timed(histogram: Histogram, **labels: Any):
+    """
+    Time a block, recording it in a histogram and in the current request's breakdown.
+    
+    Args:
+        histogram: The histogram to record the duration in
+        labels: Label values for the observation
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(histogram, time.perf_counter() - start, **labels)
+
+def record_duration(histogram: Histogram, seconds: float, **labels: Any) -> None:
+    """
+    Record a duration measured elsewhere, e.g. in a worker process, like timed() does.
+    
+    Args:
+        histogram: The histogram to record the duration in
+        seconds: The duration
+        labels: Label values for the observation
+    """
+    histogram.observe(seconds, **labels)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append({"stage": histogram.name.replace("_duration_seconds", ""), **labels,
+                        "seconds": round(seconds, 6)})
+
+def record_tokens(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """
+    Record token usage of a model call.
+    
+    Args:
+        model: The model name
+        prompt_tokens: Number of prompt tokens, if reported
+        completion_tokens: Number of generated tokens, if reported
+    """
+    if prompt_tokens:
+        MODEL_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+    if completion_tokens:
+        MODEL_TOKENS.inc(completion_tokens, model=model, type="completion")
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append({"stage": "model_tokens", "model": model,
+                        "prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0})
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the timing breakdown of everything run in the current context.
+    
+    Yields:
+        The list the timed stages are appended to
+    """
+    timings: List[Dict[str, Any]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
@@ -0,0 +1,195 @@
+# backend/router.py
+"""
+Rule-based pre-router that skips the chat agent when the intent is unambiguous.
+"""
+import re
+import json
+import threading
+from typing import Dict, List, Optional
+from backend.config import FAST_ROUTER_MODE
+from backend.metrics import FAST_ROUTER_ROUTES
+from backend.utils.helpers import ToolState
+
+# Only nouns that name the uploaded file count as referring to it: sessions keep
+# earlier uploads, so pronouns and generic verbs ("it", "this", "analyze") are as
+# likely to be about something else and are left to the chat agent
+IMAGE_NOUNS = ("image", "images", "picture", "pictures", "photo", "photos", "chart", "charts",
+               "diagram", "diagrams", "figure", "figures", "screenshot", "screenshots")
+PDF_NOUNS = ("pdf", "pdfs", "document", "documents", "page", "pages")
+WHOLE_DOCUMENT_WORDS = ("summarize", "summary", "whole", "entire", "all pages", "overview")
+
+PAGE_RANGE_PATTERN = re.compile(r"\bpages?\s+(\d+)\s*(?:-|to|through)\s*(\d+)\b")
+PAGE_PATTERN = re.compile(r"\bpage\s+(\d+)\b")
+
+def _mentions(text: str, words: tuple) -> bool:
+    """
+    Check whether any of the given words or phrases occurs in the text.
+    
+    Args:
+        text: Lowercased text to search
+        words: Words or phrases to look for
+        
+    Returns:
+        True if one of them occurs as a whole word, False otherwise
+    """
+    return any(re.search(rf"\b{re.escape(word)}\b", text) for word in words)
+
+class FastRouter:
+    """
+    Decides where a request enters the graph and counts each decision.
+    
+    Routes are "chat_agent" (ask the LLM router), "image_agent", "pdf_agent"
+    or "tool" (with deterministic tool arguments).
+    """
+    def __init__(self, mode: str = FAST_ROUTER_MODE):
+        """
+        Initialize the router.
+        
+        Args:
+            mode: "off", "agent" or "tool" (see FAST_ROUTER_MODE)
+        """
+        self.mode = mode
+        self.counts: Dict[str, int] = {"chat_agent": 0, "image_agent": 0, "pdf_agent": 0, "tool": 0}
+        self._lock = threading.Lock()
+
+    def route(self, state: ToolState) -> str:
+        """
+        Choose the entry node for a request, setting tool_exec for direct tool calls.
+        
+        Args:
+            state: The initial tool state
+            
+        Returns:
+            The name of the node the request should start at
+        """
+        route = self._decide(state)
+        with self._lock:
+            self.counts[route] += 1
+        FAST_ROUTER_ROUTES.inc(route=route)
+        return route
+
+    def answers_directly(self, state: ToolState) -> bool:
+        """
+        Check whether a request will be answered by direct tool calls alone.
+        
+        No agent sees the session context in that case. The state is not
+        changed and the decision is not counted.
+        
+        Args:
+            state: The initial tool state
+            
+        Returns:
+            True if the request goes straight to tools that produce the answer
+        """
+        scratch = dict(state)
+        if self._decide(scratch) != "tool":
+            return False
+        # A page search hands over to the PDF agent afterwards
+        return "search_pdf_pages" not in scratch["tool_exec"]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get how often each route was taken.
+        
+        Returns:
+            Dictionary mapping route names to counts
+        """
+        with self._lock:
+            return dict(self.counts)
+
+    def _decide(self, state: ToolState) -> str:
+        """
+        Apply the routing rules.
+        
+        Args:
+            state: The initial tool state
+            
+        Returns:
+            The name of the entry node
+        """
+        if self.mode == "off":
+            return "chat_agent"
+        
+        question = state["question"]
+        text = question.lower()
+        image_path = state.get("image_path")
+        pdf_path = state.get("pdf_path")
+        
+        # A single uploaded file that the question names is unambiguous
+        if image_path and not pdf_path and _mentions(text, IMAGE_NOUNS):
+            if self.mode == "tool":
+                return self._direct_call(state, [("analyze_image", [image_path, question])])
+            return "image_agent"
+        
+        if pdf_path and not image_path and _mentions(text, PDF_NOUNS):
+            if self.mode != "tool":
+                return "pdf_agent"
+            args = self._pdf_args(text, pdf_path, question)
+            if args is not None:
+                return self._direct_call(state, [args])
+            # No page given: look the question up in the document index, then
+            # let the PDF agent analyze the pages found
+            return self._direct_call(state, [("search_pdf_pages", [pdf_path, question])])
+        
+        # Both files, each clearly referred to, e.g. "compare this chart with page 5 of the PDF":
+        # analyze them concurrently
+        if image_path and pdf_path and self.mode == "tool" and _mentions(text, IMAGE_NOUNS) and _mentions(text, PDF_NOUNS):
+            args = self._pdf_args(text, pdf_path, question)
+            if args is not None:
+                return self._direct_call(state, [("analyze_image", [image_path, question]), args])
+        
+        return "chat_agent"
+
+    @staticmethod
+    def _pdf_args(text: str, pdf_path: str, question: str) -> Optional[tuple]:
+        """
+        Derive PDF tool arguments from page references in the question.
+        
+        Page numbers in questions are 1-based; tool page numbers are 0-based.
+        
+        Args:
+            text: The lowercased question
+            pdf_path: Path to the uploaded PDF
+            question: The original question, used as the instruction
+            
+        Returns:
+            A (function, args) tuple, or None if the pages cannot be determined
+        """
+        match = PAGE_RANGE_PATTERN.search(text)
+        if match:
+            first_page, last_page = int(match.group(1)), int(match.group(2))
+            if 1 <= first_page <= last_page:
+                return "analyze_pdf_pages", [pdf_path, first_page - 1, last_page - 1, question]
+            return None
+        
+        match = PAGE_PATTERN.search(text)
+        if match:
+            page_number = int(match.group(1))
+            if page_number >= 1:
+                return "analyze_pdf_page", [pdf_path, page_number - 1, question]
+            return None
+        
+        if _mentions(text, WHOLE_DOCUMENT_WORDS):
+            return "analyze_pdf_pages", [pdf_path, 0, -1, question]
+        
+        return None
+
+    @staticmethod
+    def _direct_call(state: ToolState, calls: List[tuple]) -> str:
+        """
+        Prepare the state for direct tool calls.
+        
+        Args:
+            state: The tool state to update
+            calls: (function, args) tuples; several calls run concurrently
+            
+        Returns:
+            The "tool" route
+        """
+        plan = [{"function": function, "args": args} for function, args in calls]
+        state["tool_exec"] = json.dumps(plan[0] if len(plan) == 1 else {"calls": plan})
+        state["use_tool"] = True
+        return "tool"
+
+# Shared router used by the workflow
+fast_router = FastRouter()
@@ -0,0 +1,237 @@
+# backend/sessions.py
+"""
+Server-side conversation sessions with token-aware context windows.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, TypedDict
+from backend.config import SESSION_CONTEXT_TOKENS, SESSION_RECENT_TURNS, SESSION_TTL, SESSION_MAX
+
+class Turn(TypedDict):
+    """
+    Type definition for one question/answer exchange in a session.
+    """
+    question: str
+    agent_outputs: List[str]
+    tool_results: List[str]
+    response: str
+    image_path: Optional[str]
+    pdf_path: Optional[str]
+    created_at: float
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text (about four characters per token).
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        The estimated token count
+    """
+    return (len(text) + 3) // 4
+
+def shorten(text: str, max_chars: int) -> str:
+    """
+    Shorten a text to a maximum length, marking the cut.
+    
+    Args:
+        text: The text to shorten
+        max_chars: Maximum number of characters to keep
+        
+    Returns:
+        The shortened text
+    """
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+class Session:
+    """
+    The turns of one conversation and a rolling summary of the older ones.
+    """
+    def __init__(self, session_id: str):
+        """
+        Initialize an empty session.
+        
+        Args:
+            session_id: The session ID
+        """
+        self.id = session_id
+        self.turns: List[Turn] = []
+        self.summary: List[str] = []
+        self.image_path: Optional[str] = None
+        self.pdf_path: Optional[str] = None
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+class SessionStore:
+    """
+    In-memory store of conversation sessions keyed by session ID.
+    
+    Agents receive a compact context instead of the raw conversation: the
+    most recent turns in condensed form, within a token budget, preceded by a
+    one-line-per-turn summary of older turns. Sessions live in the memory of
+    the process that handled them and expire after a period of inactivity.
+    """
+    # Per-turn limits when rendering context
+    RECENT_RESPONSE_CHARS = 600
+    SUMMARY_QUESTION_CHARS = 120
+    SUMMARY_RESPONSE_CHARS = 160
+    MAX_SUMMARY_LINES = 50
+
+    def __init__(self, context_tokens: int = SESSION_CONTEXT_TOKENS, recent_turns: int = SESSION_RECENT_TURNS,
+                 ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX):
+        """
+        Initialize the store.
+        
+        Args:
+            context_tokens: Token budget of the context built for agents
+            recent_turns: Number of recent turns kept in full before summarizing
+            ttl: Seconds of inactivity after which a session expires
+            max_sessions: Maximum number of sessions kept
+        """
+        self.context_tokens = context_tokens
+        self.recent_turns = recent_turns
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """
+        Get a session, creating it if needed.
+        
+        Args:
+            session_id: The session ID
+            
+        Returns:
+            The session
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            session.updated_at = time.time()
+            return session
+
+    def clear(self, session_id: str) -> None:
+        """
+        Delete a session.
+        
+        Args:
+            session_id: The session ID
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def resolve_files(self, session_id: str, image_path: Optional[str], pdf_path: Optional[str]) -> tuple:
+        """
+        Remember newly uploaded files, or fall back to the session's earlier uploads.
+        
+        Args:
+            session_id: The session ID
+            image_path: Image uploaded with this request, if any
+            pdf_path: PDF uploaded with this request, if any
+            
+        Returns:
+            Tuple of (image_path, pdf_path) to use for this request
+        """
+        session = self.get(session_id)
+        with session.lock:
+            if image_path or pdf_path:
+                session.image_path = image_path
+                session.pdf_path = pdf_path
+                return image_path, pdf_path
+            image_path = session.image_path if session.image_path and os.path.exists(session.image_path) else None
+            pdf_path = session.pdf_path if session.pdf_path and os.path.exists(session.pdf_path) else None
+            return image_path, pdf_path
+
+    def add_turn(self, session_id: str, turn: Turn) -> None:
+        """
+        Record a finished turn, folding the oldest turns into the summary.
+        
+        Args:
+            session_id: The session ID
+            turn: The finished turn
+        """
+        session = self.get(session_id)
+        with session.lock:
+            session.turns.append(turn)
+            while len(session.turns) > self.recent_turns:
+                old = session.turns.pop(0)
+                session.summary.append(
+                    f"- User asked: {shorten(old['question'], self.SUMMARY_QUESTION_CHARS)} "
+                    f"-> Answer: {shorten(old['response'], self.SUMMARY_RESPONSE_CHARS)}"
+                )
+            del session.summary[:-self.MAX_SUMMARY_LINES]
+
+    def build_context(self, session_id: str) -> str:
+        """
+        Build the compact conversation context for the agents.
+        
+        Recent turns are added newest first until the token budget is used;
+        turns that do not fit are represented by their summary line. The
+        summary is trimmed from the oldest end to fit what remains.
+        
+        Args:
+            session_id: The session ID
+            
+        Returns:
+            The context text, or an empty string for a new conversation
+        """
+        session = self.get(session_id)
+        with session.lock:
+            turns = list(session.turns)
+            summary = list(session.summary)
+        
+        budget = self.context_tokens
+        recent: List[str] = []
+        for index in range(len(turns) - 1, -1, -1):
+            turn = turns[index]
+            block = (f"User: {shorten(turn['question'], 400)}\n"
+                     f"Assistant: {shorten(turn['response'], self.RECENT_RESPONSE_CHARS)}")
+            cost = estimate_tokens(block)
+            if cost > budget:
+                summary.extend(
+                    f"- User asked: {shorten(t['question'], self.SUMMARY_QUESTION_CHARS)} "
+                    f"-> Answer: {shorten(t['response'], self.SUMMARY_RESPONSE_CHARS)}"
+                    for t in turns[:index + 1]
+                )
+                break
+            recent.insert(0, block)
+            budget -= cost
+        
+        kept_summary: List[str] = []
+        for line in reversed(summary):
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            kept_summary.insert(0, line)
+            budget -= cost
+        
+        parts = []
+        if kept_summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(kept_summary))
+        if recent:
+            parts.append("Recent conversation:\n" + "\n\n".join(recent))
+        return "\n\n".join(parts)
+
+    def _expire(self) -> None:
+        """
+        Drop sessions idle for longer than the TTL. Caller must hold the lock.
+        """
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.updated_at >= cutoff:
+                break
+            del self._sessions[session_id]
+
+# Shared session store used by process_question
+session_store = SessionStore()
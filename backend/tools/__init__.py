@@ -2,4 +2,9 @@
 """
 Tool implementations for the multimodal analysis system.
 """
-from backend.tools.registry import tool, tool_registry, tool_info_registry, get_tools_list, execute_tool
+from backend.tools.registry import tool, tool_catalog, ToolArgumentError
+
+# Modules defining @tool functions, imported when the catalog is first used
+TOOL_MODULES = ("backend.tools.image_tools", "backend.tools.pdf_tools", "backend.tools.doc_index")
+for module_name in TOOL_MODULES:
+    tool_catalog.add_module(module_name)
@@ -0,0 +1,355 @@
+# backend/tools/doc_index.py
+"""
+Per-document page index for finding the pages relevant to a question.
+"""
+import os
+import re
+import json
+import math
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import DOC_INDEX_WORKERS, DOC_INDEX_TOP_K, DOC_INDEX_THUMBNAIL_WIDTH, DOC_INDEX_DIR
+from backend.tools.registry import tool
+from backend.tools.pdf_render import get_pdf_page_count, render_pdf_thumbnails
+from backend.tools.pdf_text import get_pages_text
+from backend.uploads import UploadStore, upload_store
+from backend.utils.helpers import file_sha256, file_lock
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "which",
+    "with", "page", "pages", "pdf", "document", "does", "do", "about", "how", "where"
+))
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercased index terms, dropping stopwords and single characters.
+    
+    Args:
+        text: The text to split
+    
+    Returns:
+        The terms, in order
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+class DocumentIndex:
+    """
+    Page text, BM25 term statistics and thumbnails of one PDF document.
+    
+    The index is stored as JSON in the document's sidecar directory, next to
+    its thumbnails, so it is built once per document content.
+    """
+    VERSION = 1
+    # BM25 parameters
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, sha256: str, pages: List[Dict[str, Any]]):
+        """
+        Initialize the index from its pages.
+        
+        Args:
+            sha256: Content hash of the indexed PDF
+            pages: Per page: text, terms (term frequencies), length (term count)
+                and needs_vision
+        """
+        self.sha256 = sha256
+        self.pages = pages
+        self.document_frequency: Counter = Counter()
+        for page in pages:
+            self.document_frequency.update(page["terms"].keys())
+        self.average_length = sum(page["length"] for page in pages) / len(pages) if pages else 0.0
+
+    @classmethod
+    def build(cls, pdf_path: str) -> "DocumentIndex":
+        """
+        Build the index of a PDF from its text layer.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            The new index
+        """
+        page_count = get_pdf_page_count(pdf_path)
+        texts = get_pages_text(pdf_path, 0, page_count - 1) if page_count else []
+        pages = []
+        for page in texts:
+            terms = tokenize(page["text"])
+            pages.append({
+                "text": page["text"],
+                "terms": dict(Counter(terms)),
+                "length": len(terms),
+                "needs_vision": page["needs_vision"]
+            })
+        return cls(file_sha256(pdf_path), pages)
+
+    @staticmethod
+    def build_thumbnails(pdf_path: str, index_dir: str) -> None:
+        """
+        Write a thumbnail of every page of a PDF into the index directory.
+        
+        The thumbnails are for display only, so they are rendered apart from
+        the index. A marker file records that all of them were written.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            index_dir: Directory of the document's index
+        """
+        thumbnail_dir = os.path.join(index_dir, "thumbnails")
+        marker = os.path.join(thumbnail_dir, ".complete")
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        with file_lock(os.path.join(index_dir, "thumbnails.lock"), blocking=False) as acquired:
+            # Another worker is rendering them, or they are done
+            if not acquired or os.path.exists(marker):
+                return
+            with tempfile.TemporaryDirectory(dir=index_dir) as temp_dir:
+                for page_number, path in enumerate(render_pdf_thumbnails(pdf_path, temp_dir, DOC_INDEX_THUMBNAIL_WIDTH)):
+                    os.replace(path, os.path.join(thumbnail_dir, f"p{page_number}.jpg"))
+            open(marker, "w").close()
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a JSON file, atomically.
+        
+        Args:
+            path: Path of the index file
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "sha256": self.sha256, "pages": self.pages}, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DocumentIndex"]:
+        """
+        Read an index from a JSON file.
+        
+        Args:
+            path: Path of the index file
+        
+        Returns:
+            The index, or None if the file is missing or from another index version
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        return cls(data["sha256"], data["pages"])
+
+    def search(self, query: str, top_k: int = DOC_INDEX_TOP_K) -> List[Tuple[int, float]]:
+        """
+        Rank pages by BM25 relevance to a query.
+        
+        Args:
+            query: The query text
+            top_k: Maximum number of pages returned
+        
+        Returns:
+            (page_number, score) tuples of matching pages, best first (0-based page numbers)
+        """
+        page_total = len(self.pages)
+        scores = []
+        for page_number, page in enumerate(self.pages):
+            score = 0.0
+            for term in set(tokenize(query)):
+                frequency = page["terms"].get(term, 0)
+                if not frequency:
+                    continue
+                df = self.document_frequency[term]
+                idf = math.log(1 + (page_total - df + 0.5) / (df + 0.5))
+                norm = 1 - self.B + self.B * page["length"] / (self.average_length or 1)
+                score += idf * frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+            if score > 0:
+                scores.append((page_number, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:top_k]
+
+    def snippet(self, page_number: int, query: str, max_chars: int = 200) -> str:
+        """
+        Get a short excerpt of a page around the first query term it contains.
+        
+        Args:
+            page_number: The page number (0-based index)
+            query: The query text
+            max_chars: Maximum excerpt length
+        
+        Returns:
+            The excerpt
+        """
+        text = " ".join(self.pages[page_number]["text"].split())
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in tokenize(query) if term in lowered]
+        start = max(0, min(positions) - max_chars // 4) if positions else 0
+        excerpt = text[start:start + max_chars]
+        return ("..." if start else "") + excerpt + ("..." if start + max_chars < len(text) else "")
+
+class DocumentIndexStore:
+    """
+    Builds, persists and caches document indexes.
+    
+    The index of an uploaded PDF lives in its sidecar directory (see
+    UploadStore), so it is removed together with the upload; indexes of
+    other PDFs are kept under DOC_INDEX_DIR, never beside the file. Builds
+    are serialized per document across worker processes; recently used
+    indexes stay in memory. Page thumbnails of uploads are rendered in the
+    background once the index is saved, so searches do not wait for them.
+    """
+    MEMORY_ENTRIES = 32
+
+    def __init__(self, workers: int = DOC_INDEX_WORKERS):
+        """
+        Initialize the store.
+        
+        Args:
+            workers: Threads building indexes in the background
+        """
+        self.workers = workers
+        self._indexes: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Documents whose thumbnails are being rendered by this process
+        self._thumbnailing: set = set()
+
+    @staticmethod
+    def index_dir(pdf_path: str) -> str:
+        """
+        Get the directory holding a PDF's index.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            The upload's sidecar index directory, or a directory under
+            DOC_INDEX_DIR named by content hash for PDFs outside the upload store
+        """
+        if upload_store.contains(pdf_path):
+            return os.path.join(UploadStore.sidecar_dir(pdf_path), "index")
+        return os.path.join(DOC_INDEX_DIR, file_sha256(pdf_path))
+
+    def get(self, pdf_path: str) -> DocumentIndex:
+        """
+        Get the index of a PDF, loading or building it if needed.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            The document index
+        """
+        digest = file_sha256(pdf_path)
+        with self._lock:
+            index = self._indexes.get(digest)
+            if index is not None:
+                self._indexes.move_to_end(digest)
+                return index
+
+        index_dir = self.index_dir(pdf_path)
+        index_path = os.path.join(index_dir, "index.json")
+        index = DocumentIndex.load(index_path)
+        if index is None or index.sha256 != digest:
+            os.makedirs(index_dir, exist_ok=True)
+            with file_lock(os.path.join(index_dir, "build.lock")):
+                # Another worker may have built the index while we waited
+                index = DocumentIndex.load(index_path)
+                if index is None or index.sha256 != digest:
+                    index = DocumentIndex.build(pdf_path)
+                    index.save(index_path)
+
+        with self._lock:
+            self._indexes[digest] = index
+            while len(self._indexes) > self.MEMORY_ENTRIES:
+                self._indexes.popitem(last=False)
+        # Thumbnails are only served for uploads
+        if upload_store.contains(pdf_path) and not os.path.exists(os.path.join(index_dir, "thumbnails", ".complete")):
+            self._submit(self._build_thumbnails, pdf_path, index_dir, digest)
+        return index
+
+    def _build_thumbnails(self, pdf_path: str, index_dir: str, digest: str) -> None:
+        """
+        Render a document's thumbnails, unless this process is already doing so.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            index_dir: Directory of the document's index
+            digest: Content hash of the PDF
+        """
+        with self._lock:
+            if digest in self._thumbnailing:
+                return
+            self._thumbnailing.add(digest)
+        try:
+            DocumentIndex.build_thumbnails(pdf_path, index_dir)
+        except Exception:
+            # Thumbnails are for display only; the index works without them
+            pass
+        finally:
+            with self._lock:
+                self._thumbnailing.discard(digest)
+
+    def _submit(self, func, *args) -> None:
+        """
+        Run a function on the background build pool.
+        
+        Args:
+            func: The function
+            args: Its arguments
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="doc-index")
+            pool = self._pool
+        pool.submit(func, *args)
+
+    def reset_pool(self) -> None:
+        """
+        Forget the build pool inherited from a parent process, so a forked worker creates its own.
+        """
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thumbnailing = set()
+
+    def schedule(self, pdf_path: str) -> None:
+        """
+        Build a PDF's index in the background, e.g. right after it is uploaded.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        """
+        # Failures surface when the index is first searched
+        self._submit(self.get, pdf_path)
+
+# Shared index store used by the search tool and the upload handlers
+document_index_store = DocumentIndexStore()
+
+@tool
+def search_pdf_pages(pdf_path: str, query: str, top_k: int = DOC_INDEX_TOP_K) -> str:
+    """
+    Find the pages of a PDF most relevant to a query using its full-text index, without a model call.
+    
+    :function: search_pdf_pages
+    :param str pdf_path: Path to the PDF file
+    :param str query: What to look for, e.g. the user's question
+    :param int top_k: Maximum number of pages to return
+    :return: The best matching pages with their 0-based page_number, score and an excerpt
+    """
+    try:
+        index = document_index_store.get(pdf_path)
+        matches = index.search(query, top_k)
+        if not matches:
+            return f"No pages of the PDF ({len(index.pages)} pages) match the query."
+        lines = [f"Most relevant pages of the PDF ({len(index.pages)} pages):"]
+        for page_number, score in matches:
+            lines.append(f"Page {page_number + 1} (page_number {page_number}, score {score:.2f}): "
+                         f"{index.snippet(page_number, query)}")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Error searching PDF: {str(e)}"
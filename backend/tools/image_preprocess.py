@@ -0,0 +1,133 @@
+# backend/tools/image_preprocess.py
+"""
+Preparation of images before they are sent to the vision model.
+"""
+import io
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict
+from backend.config import IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY, IMAGE_CACHE_MAX_MB
+from backend.metrics import timed, IMAGE_PREPROCESS_SECONDS
+from backend.utils.helpers import file_sha256
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+class ImagePreprocessor:
+    """
+    Decode, orient, downscale and re-encode images for the vision model.
+    
+    The model downsamples its input to a fixed resolution anyway, so larger
+    images only cost encoding and upload time. Prepared images are kept in a
+    size-bounded in-memory LRU keyed by the file's content hash.
+    """
+    def __init__(self, max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_JPEG_QUALITY,
+                 max_mb: int = IMAGE_CACHE_MAX_MB):
+        """
+        Initialize the preprocessor.
+        
+        Args:
+            max_side: Maximum width and height of a prepared image in pixels
+            quality: JPEG quality used when re-encoding
+            max_mb: Maximum total size of cached prepared images in megabytes
+        """
+        self.max_side = max_side
+        self.quality = quality
+        self.max_bytes = max_mb * 1024 * 1024
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Describe the preparation settings, for keys of results derived from prepared images.
+        
+        Returns:
+            The settings as a short string
+        """
+        return f"max{self.max_side}_q{self.quality}"
+
+    def encode(self, image: "Image.Image") -> bytes:
+        """
+        Orient, downscale and re-encode a decoded image.
+        
+        Args:
+            image: The decoded image
+        
+        Returns:
+            The prepared image as JPEG bytes
+        """
+        from PIL import Image, ImageOps
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # Flatten transparency onto white, as JPEG has no alpha channel
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def prepare(self, file_path: str) -> bytes:
+        """
+        Get the prepared form of an image file, preparing it on first use.
+        
+        Args:
+            file_path: Path to the image file
+        
+        Returns:
+            The prepared image as JPEG bytes
+        """
+        key = f"{file_sha256(file_path)}_{self.fingerprint}"
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # PIL is imported on first use to keep startup fast
+        from PIL import Image
+        with timed(IMAGE_PREPROCESS_SECONDS):
+            with Image.open(file_path) as image:
+                image.draft("RGB", (self.max_side, self.max_side))
+                data = self.encode(image)
+
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses and hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+# Preprocessor shared by the vision tools
+image_preprocessor = ImagePreprocessor()
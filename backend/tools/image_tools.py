@@ -2,9 +2,22 @@
 """
 Tools for image analysis and processing.
 """
-from PIL import Image
-import ollama
+from backend.config import (
+    VISION_MODEL, VISION_CACHE_BACKEND, VISION_CACHE_TTL,
+    VISION_CACHE_MAX_ENTRIES, VISION_CACHE_PATH
+)
+from backend.events import emit_event
+from backend.llm.gateway import model_gateway
+from backend.metrics import metrics_registry, cache_collector
 from backend.tools.registry import tool
+from backend.tools.image_preprocess import image_preprocessor
+from backend.utils.cache import ResultCache, create_cache
+from backend.utils.helpers import file_sha256
+
+# Vision results keyed by image content hash, model name and instruction
+vision_cache = create_cache(VISION_CACHE_BACKEND, VISION_CACHE_TTL, VISION_CACHE_MAX_ENTRIES, VISION_CACHE_PATH)
+metrics_registry.add_collector(cache_collector("vision_cache", vision_cache))
+metrics_registry.add_collector(cache_collector("image_preprocess_cache", image_preprocessor))
 
 @tool
 def analyze_image(file_path: str, instruction: str = "Please describe this image in detail.") -> str:
@@ -17,58 +30,24 @@ def analyze_image(file_path: str, instruction: str = "Please describe this image
     :return: Detailed description of the image
     """
     try:
-        result = ollama.generate(
-            model='llava:34b',
-            prompt=instruction,
-            images=[file_path],
-            stream=False
-        )['response']
+        call_key = ResultCache.make_key(file_sha256(file_path), image_preprocessor.fingerprint, VISION_MODEL, instruction)
+        if vision_cache is not None:
+            cached = vision_cache.get(call_key)
+            if cached is not None:
+                emit_event("token", source="analyze_image", text=cached)
+                return cached
+        
+        # Send a downscaled, re-encoded copy rather than the original upload
+        image = image_preprocessor.prepare(file_path)
+        result = model_gateway.call(
+            VISION_MODEL, call_key,
+            lambda: model_gateway.generate(VISION_MODEL, instruction, images=[image], source="analyze_image"),
+            source="analyze_image"
+        )
+        
+        if vision_cache is not None:
+            vision_cache.set(call_key, result)
         
-        # Resize and display image (if in notebook environment)
-        try:
-            img = Image.open(file_path, mode='r')
-            img = img.resize([int(i/1.2) for i in img.size])
-            display(img)
-        except (NameError, ImportError):
-            # display() not available in non-notebook environment
-            pass
-            
         return result
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
-
-# backend/tools/pdf_tools.py
-"""
-Tools for PDF analysis and processing.
-"""
-import os
-import tempfile
-from pdf2image import convert_from_path
-from backend.tools.registry import tool
-from backend.tools.image_tools import analyze_image
-
-@tool
-def analyze_pdf_page(pdf_path: str, page_number: int = 0, instruction: str = "Please describe this image in detail.") -> str:
-    """
-    Extract and analyze a specific page from a PDF document.
-    
-    :function: analyze_pdf_page
-    :param str pdf_path: Path to the PDF file
-    :param int page_number: Page number to analyze (0-based index)
-    :param str instruction: Custom instruction for image analysis
-    :return: Analysis result of the specified PDF page
-    """
-    try:
-        # Convert PDF page to image
-        with tempfile.TemporaryDirectory() as temp_dir:
-            pages = convert_from_path(pdf_path)
-            if page_number >= len(pages):
-                return f"Error: Page number {page_number} is out of range. PDF has {len(pages)} pages."
-            
-            temp_image_path = os.path.join(temp_dir, f'page_{page_number}.png')
-            pages[page_number].save(temp_image_path, 'PNG')
-            
-            # Use the existing analyze_image tool
-            return analyze_image(temp_image_path, instruction)
-    except Exception as e:
-        return f"Error analyzing PDF: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,134 @@
+# backend/tools/page_cache.py
+"""
+Content-addressed on-disk cache for rendered PDF page images.
+"""
+import os
+import time
+import zlib
+import tempfile
+from backend.config import PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB, PDF_RENDER_DPI
+from backend.tools.pdf_render import render_pdf_page
+from backend.utils.helpers import file_sha256, file_lock
+
+class PageRenderCache:
+    """
+    Cache of rendered PDF pages keyed by file content hash, page number and DPI.
+    
+    Entries are PNG files written with an atomic rename and guarded by file
+    locks, so several gunicorn workers can share one cache directory. The
+    cache is bounded in size and evicts least recently used pages; a hit
+    refreshes the file's modification time.
+    """
+    # Entries used this recently are never evicted, so a path handed out by
+    # get_or_render() stays valid while the caller reads it
+    EVICTION_GRACE_SECONDS = 60
+    # Renders are serialized through a fixed pool of striped lock files
+    LOCK_STRIPES = 64
+
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR, max_mb: int = PAGE_CACHE_MAX_MB):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir: Directory holding the cached page images
+            max_mb: Maximum total size of cached images in megabytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+
+    def get_path(self, pdf_path: str, page_number: int, dpi: int = PDF_RENDER_DPI) -> str:
+        """
+        Get the cache location of a rendered page.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            page_number: Page number (0-based index)
+            dpi: Rendering resolution
+            
+        Returns:
+            Path where the page image is (or would be) cached
+        """
+        digest = file_sha256(pdf_path)
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}_p{page_number}_d{dpi}.png")
+
+    def get_or_render(self, pdf_path: str, page_number: int, dpi: int = PDF_RENDER_DPI) -> str:
+        """
+        Get a rendered page image, rasterizing it only on a cache miss.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            page_number: Page number to render (0-based index)
+            dpi: Rendering resolution
+            
+        Returns:
+            Path to the cached PNG file
+        """
+        cached_path = self.get_path(pdf_path, page_number, dpi)
+        if self._touch(cached_path):
+            return cached_path
+        
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        stripe = zlib.crc32(cached_path.encode()) % self.LOCK_STRIPES
+        with file_lock(os.path.join(self.cache_dir, ".locks", f"{stripe}.lock")):
+            # Another worker may have rendered the page while we waited
+            if self._touch(cached_path):
+                return cached_path
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(cached_path)) as temp_dir:
+                rendered_path = render_pdf_page(pdf_path, page_number, temp_dir, dpi)
+                os.replace(rendered_path, cached_path)
+        
+        self.evict()
+        return cached_path
+
+    def evict(self) -> None:
+        """
+        Remove least recently used pages until the cache fits its size limit.
+        
+        Only one process evicts at a time; others skip eviction while it runs.
+        """
+        with file_lock(os.path.join(self.cache_dir, ".locks", "evict.lock"), blocking=False) as acquired:
+            if not acquired:
+                return
+            entries = []
+            total_size = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith(".png"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total_size += stat.st_size
+            
+            cutoff = time.time() - self.EVICTION_GRACE_SECONDS
+            for mtime, size, path in sorted(entries):
+                if total_size <= self.max_bytes or mtime > cutoff:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """
+        Mark a cached page as recently used.
+        
+        Args:
+            path: Path to the cached page image
+            
+        Returns:
+            True if the page is cached, False otherwise
+        """
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+# Shared cache instance used by the PDF tools
+page_render_cache = PageRenderCache()
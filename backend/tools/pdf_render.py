@@ -0,0 +1,137 @@
+# backend/tools/pdf_render.py
+"""
+Page-targeted PDF rasterization and text extraction helpers.
+
+pdf2image (and with it PIL) is imported by the functions that use it, so
+importing this module stays cheap.
+"""
+import os
+import subprocess
+from typing import List
+from backend.config import PDF_RENDER_DPI
+from backend.metrics import timed, PDF_RENDER_SECONDS, PDF_TEXT_SECONDS
+
+# Limit for a single poppler utility run
+POPPLER_TIMEOUT = 120
+
+def get_pdf_page_count(pdf_path: str) -> int:
+    """
+    Get the number of pages in a PDF without rendering it.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        The number of pages in the document
+    """
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def render_pdf_page(pdf_path: str, page_number: int, output_dir: str, dpi: int = PDF_RENDER_DPI) -> str:
+    """
+    Rasterize a single PDF page to a PNG file.
+    
+    Only the requested page is rendered, and poppler writes it straight to
+    disk, so the document is never held in memory as PIL images.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number to render (0-based index)
+        output_dir: Directory to write the PNG file into
+        dpi: Rendering resolution
+        
+    Returns:
+        Path to the rendered PNG file
+    """
+    from pdf2image import convert_from_path
+    with timed(PDF_RENDER_SECONDS):
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=page_number + 1,
+            last_page=page_number + 1,
+            output_folder=output_dir,
+            fmt='png',
+            single_file=True,
+            output_file=f'page_{page_number}',
+            paths_only=True
+        )
+    return paths[0] if paths else os.path.join(output_dir, f'page_{page_number}.png')
+
+def read_text_layer(pdf_path: str, first_page: int, last_page: int) -> List[str]:
+    """
+    Extract the text layer of a range of PDF pages with poppler's pdftotext.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        first_page: First page to extract (0-based index)
+        last_page: Last page to extract, inclusive (0-based index)
+        
+    Returns:
+        The text of each page, in page order
+    """
+    with timed(PDF_TEXT_SECONDS):
+        output = subprocess.run(
+            ["pdftotext", "-f", str(first_page + 1), "-l", str(last_page + 1), "-layout", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, check=True, timeout=POPPLER_TIMEOUT
+        ).stdout.decode("utf-8", errors="replace")
+    # pdftotext ends every page with a form feed
+    pages = output.split("\f")
+    return (pages + [""] * (last_page - first_page + 1))[:last_page - first_page + 1]
+
+def count_pdf_figures(pdf_path: str, first_page: int, last_page: int, min_pixels: int) -> List[int]:
+    """
+    Count the embedded images of at least a given size on a range of PDF pages.
+    
+    Uses poppler's pdfimages listing, which reads image headers without
+    decoding the images.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        first_page: First page to inspect (0-based index)
+        last_page: Last page to inspect, inclusive (0-based index)
+        min_pixels: Smallest image area (width * height) counted, to skip logos and rules
+        
+    Returns:
+        The number of such images on each page, in page order
+    """
+    with timed(PDF_TEXT_SECONDS):
+        output = subprocess.run(
+            ["pdfimages", "-list", "-f", str(first_page + 1), "-l", str(last_page + 1), pdf_path],
+            capture_output=True, check=True, timeout=POPPLER_TIMEOUT
+        ).stdout.decode("utf-8", errors="replace")
+    
+    counts = [0] * (last_page - first_page + 1)
+    # Two header lines, then "page num type width height ..." rows
+    for line in output.splitlines()[2:]:
+        fields = line.split()
+        if len(fields) < 5 or fields[2] != "image":
+            continue
+        page_number = int(fields[0]) - 1
+        if first_page <= page_number <= last_page and int(fields[3]) * int(fields[4]) >= min_pixels:
+            counts[page_number - first_page] += 1
+    return counts
+
+def render_pdf_thumbnails(pdf_path: str, output_dir: str, width: int) -> List[str]:
+    """
+    Rasterize every page of a PDF to a small JPEG thumbnail.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        output_dir: Directory to write the thumbnails into
+        width: Thumbnail width in pixels (the height keeps the page's aspect ratio)
+        
+    Returns:
+        Paths to the thumbnails, in page order
+    """
+    from pdf2image import convert_from_path
+    with timed(PDF_RENDER_SECONDS):
+        paths = convert_from_path(
+            pdf_path,
+            size=(width, None),
+            output_folder=output_dir,
+            fmt='jpeg',
+            output_file='thumb',
+            paths_only=True
+        )
+    return sorted(paths)
@@ -0,0 +1,108 @@
+# backend/tools/pdf_text.py
+"""
+Text-layer fast path for PDF pages.
+"""
+import json
+import hashlib
+from typing import List, TypedDict
+from backend.config import (
+    CHAT_MODEL, PDF_TEXT_MIN_CHARS, PDF_FIGURE_MIN_PIXELS, PDF_TEXT_PROMPT_CHARS,
+    PDF_TEXT_CACHE_BACKEND, PDF_TEXT_CACHE_MAX_ENTRIES, PDF_TEXT_CACHE_PATH, VISION_CACHE_TTL
+)
+from backend.events import emit_event
+from backend.llm.gateway import model_gateway
+from backend.metrics import metrics_registry, cache_collector
+from backend.tools.pdf_render import read_text_layer, count_pdf_figures
+from backend.utils.cache import ResultCache, create_cache
+from backend.utils.helpers import file_sha256
+
+# Extracted page text keyed by PDF content hash and page number, and answers
+# from page text keyed by text hash, model name and instruction
+pdf_text_cache = create_cache(PDF_TEXT_CACHE_BACKEND, VISION_CACHE_TTL, PDF_TEXT_CACHE_MAX_ENTRIES, PDF_TEXT_CACHE_PATH)
+metrics_registry.add_collector(cache_collector("pdf_text_cache", pdf_text_cache))
+
+TEXT_PROMPT = """Below is the text of page {page} of a PDF document, extracted from its text layer.
+
+{text}
+
+Using only this page, respond to the following instruction: {instruction}"""
+
+class PageText(TypedDict):
+    """
+    Type definition for the extracted text layer of one PDF page.
+    
+    needs_vision is set for pages that look scanned (too little text) or
+    that hold figures, which only the vision model can read.
+    """
+    text: str
+    figures: int
+    needs_vision: bool
+
+def get_pages_text(pdf_path: str, first_page: int, last_page: int) -> List[PageText]:
+    """
+    Get the text layer of a range of PDF pages, extracting uncached pages in one pass.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        first_page: First page (0-based index)
+        last_page: Last page, inclusive (0-based index)
+    
+    Returns:
+        The extracted text of each page, in page order
+    """
+    digest = file_sha256(pdf_path)
+    keys = [ResultCache.make_key("pdf_text", digest, page_number) for page_number in range(first_page, last_page + 1)]
+    pages: List[PageText] = [None] * len(keys)
+    if pdf_text_cache is not None:
+        for i, key in enumerate(keys):
+            cached = pdf_text_cache.get(key)
+            if cached is not None:
+                pages[i] = json.loads(cached)
+
+    missing = [i for i, page in enumerate(pages) if page is None]
+    if missing:
+        start, end = first_page + missing[0], first_page + missing[-1]
+        texts = read_text_layer(pdf_path, start, end)
+        figures = count_pdf_figures(pdf_path, start, end, PDF_FIGURE_MIN_PIXELS)
+        for i in missing:
+            text = texts[first_page + i - start].strip()
+            page = PageText(
+                text=text,
+                figures=figures[first_page + i - start],
+                needs_vision=len(text) < PDF_TEXT_MIN_CHARS or figures[first_page + i - start] > 0
+            )
+            pages[i] = page
+            if pdf_text_cache is not None:
+                pdf_text_cache.set(keys[i], json.dumps(page))
+    return pages
+
+def answer_from_text(text: str, page_number: int, instruction: str) -> str:
+    """
+    Respond to an instruction about a page from its text with the chat model.
+    
+    Args:
+        text: The page text
+        page_number: The page number (0-based index)
+        instruction: The instruction for the page
+    
+    Returns:
+        The model's response text
+    """
+    text = text[:PDF_TEXT_PROMPT_CHARS]
+    call_key = ResultCache.make_key(hashlib.sha256(text.encode()).hexdigest(), page_number, CHAT_MODEL, instruction)
+    if pdf_text_cache is not None:
+        cached = pdf_text_cache.get(call_key)
+        if cached is not None:
+            emit_event("token", source="analyze_pdf_page", text=cached)
+            return cached
+
+    prompt = TEXT_PROMPT.format(page=page_number + 1, text=text, instruction=instruction)
+    result = model_gateway.call(
+        CHAT_MODEL, call_key,
+        lambda: model_gateway.generate(CHAT_MODEL, prompt, source="analyze_pdf_page"),
+        source="analyze_pdf_page"
+    )
+
+    if pdf_text_cache is not None:
+        pdf_text_cache.set(call_key, result)
+    return result
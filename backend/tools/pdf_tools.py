@@ -2,17 +2,159 @@
 """
 Tools for PDF analysis and processing.
 """
-import os
-import tempfile
-from pdf2image import convert_from_path
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+from backend.config import PDF_RENDER_WORKERS, PDF_MAX_PAGES_PER_CALL, PDF_TEXT_MODE
+from backend.metrics import collect_timings, record_duration, PDF_RENDER_SECONDS
 from backend.tools.registry import tool
 from backend.tools.image_tools import analyze_image
+from backend.tools.pdf_render import get_pdf_page_count
+from backend.tools.page_cache import page_render_cache
+from backend.tools.pdf_text import get_pages_text, answer_from_text
+
+# Process pool for rendering pages in parallel, created on first use
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def _render_page(pdf_path: str, page_number: int) -> Tuple[str, List[float]]:
+    """
+    Render a page through the shared page cache (runs in a pool process).
+    
+    Metrics recorded in a pool process never reach the parent's /metrics,
+    so the render durations are returned for the parent to record.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number to render (0-based index)
+        
+    Returns:
+        Tuple of (path to the cached page image, render durations in seconds;
+        empty on a cache hit)
+    """
+    with collect_timings() as timings:
+        image_path = page_render_cache.get_or_render(pdf_path, page_number)
+    stage = PDF_RENDER_SECONDS.name.replace("_duration_seconds", "")
+    return image_path, [timing["seconds"] for timing in timings if timing["stage"] == stage]
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool used to render PDF pages, creating it on first use.
+    
+    Workers are spawned rather than forked so the pool is safe to create from
+    a multi-threaded web worker.
+    
+    Returns:
+        The shared process pool
+    """
+    global _render_pool
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                _render_pool = ProcessPoolExecutor(
+                    max_workers=PDF_RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _render_pool
+
+def _reset_render_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Discard a broken render pool so the next call creates a fresh one.
+    
+    Args:
+        pool: The pool that failed
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False)
+
+def reset_render_pool() -> None:
+    """
+    Forget the render pool inherited from a parent process, so a forked worker creates its own.
+    
+    The inherited pool belongs to the parent and is not shut down.
+    """
+    global _render_pool
+    _render_pool = None
+
+def _page_range(page_count: int, first_page: int, last_page: int) -> tuple:
+    """
+    Resolve a requested page range against the document, capped at PDF_MAX_PAGES_PER_CALL pages.
+    
+    Args:
+        page_count: Number of pages in the document
+        first_page: First page requested (0-based index)
+        last_page: Last page requested, inclusive (0-based index, -1 for the last page)
+        
+    Returns:
+        Tuple of (first_page, last_page), or None if the range is out of range
+    """
+    if last_page < 0 or last_page >= page_count:
+        last_page = page_count - 1
+    if first_page < 0 or first_page > last_page:
+        return None
+    return first_page, min(last_page, first_page + PDF_MAX_PAGES_PER_CALL - 1)
+
+def _text_pages(pdf_path: str, first_page: int, last_page: int) -> list:
+    """
+    Get the text layer of pages for the text fast path, if it is enabled.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        first_page: First page (0-based index)
+        last_page: Last page, inclusive (0-based index)
+        
+    Returns:
+        The PageText of each page, or None for pages that need the vision model
+    """
+    count = last_page - first_page + 1
+    if PDF_TEXT_MODE != "auto":
+        return [None] * count
+    try:
+        pages = get_pages_text(pdf_path, first_page, last_page)
+    except Exception:
+        # No usable text layer (or poppler utilities); use vision for every page
+        return [None] * count
+    return [None if page["needs_vision"] else page for page in pages]
+
+@tool
+def extract_pdf_text(pdf_path: str, first_page: int = 0, last_page: int = -1) -> str:
+    """
+    Extract the text layer of PDF pages without a model call; empty for scanned pages.
+    
+    :function: extract_pdf_text
+    :param str pdf_path: Path to the PDF file
+    :param int first_page: First page to extract (0-based index)
+    :param int last_page: Last page to extract, inclusive (0-based index, -1 for the last page)
+    :return: The text of each page, in page order
+    """
+    try:
+        page_count = get_pdf_page_count(pdf_path)
+        page_range = _page_range(page_count, first_page, last_page)
+        if page_range is None:
+            return f"Error: Page range {first_page}-{last_page} is out of range. PDF has {page_count} pages."
+        first_page, last_page = page_range
+        
+        pages = get_pages_text(pdf_path, first_page, last_page)
+        results = [f"Page {first_page + i + 1}:\n{page['text']}" for i, page in enumerate(pages)]
+        if last_page < page_count - 1:
+            results.append(f"(Extracted pages {first_page + 1}-{last_page + 1} of {page_count}.)")
+        return "\n\n".join(results)
+    except Exception as e:
+        return f"Error extracting PDF text: {str(e)}"
 
 @tool
 def analyze_pdf_page(pdf_path: str, page_number: int = 0, instruction: str = "Please describe this image in detail.") -> str:
     """
     Extract and analyze a specific page from a PDF document.
     
+    Text pages are answered from their text layer by the chat model; scanned
+    pages and pages with figures are rendered for the vision model.
+    
     :function: analyze_pdf_page
     :param str pdf_path: Path to the PDF file
     :param int page_number: Page number to analyze (0-based index)
@@ -20,16 +162,75 @@ def analyze_pdf_page(pdf_path: str, page_number: int = 0, instruction: str = "Pl
     :return: Analysis result of the specified PDF page
     """
     try:
-        # Convert PDF page to image
-        with tempfile.TemporaryDirectory() as temp_dir:
-            pages = convert_from_path(pdf_path)
-            if page_number >= len(pages):
-                return f"Error: Page number {page_number} is out of range. PDF has {len(pages)} pages."
-            
-            temp_image_path = os.path.join(temp_dir, f'page_{page_number}.png')
-            pages[page_number].save(temp_image_path, 'PNG')
-            
-            # Use the existing analyze_image tool
-            return analyze_image(temp_image_path, instruction)
+        page_count = get_pdf_page_count(pdf_path)
+        if page_number < 0 or page_number >= page_count:
+            return f"Error: Page number {page_number} is out of range. PDF has {page_count} pages."
+        
+        page = _text_pages(pdf_path, page_number, page_number)[0]
+        if page is not None:
+            return answer_from_text(page["text"], page_number, instruction)
+        
+        # Render only the requested page, reusing a cached render when available
+        image_path = page_render_cache.get_or_render(pdf_path, page_number)
+        
+        # Use the existing analyze_image tool
+        return analyze_image(image_path, instruction)
+    except Exception as e:
+        return f"Error analyzing PDF: {str(e)}"
+
+@tool
+def analyze_pdf_pages(pdf_path: str, first_page: int = 0, last_page: int = -1, instruction: str = "Please describe this image in detail.") -> str:
+    """
+    Analyze a range of pages from a PDF document, e.g. to summarize a whole report.
+    
+    As with analyze_pdf_page, only scanned pages and pages with figures are
+    rendered for the vision model.
+    
+    :function: analyze_pdf_pages
+    :param str pdf_path: Path to the PDF file
+    :param int first_page: First page to analyze (0-based index)
+    :param int last_page: Last page to analyze, inclusive (0-based index, -1 for the last page)
+    :param str instruction: Custom instruction applied to each page
+    :return: Analysis result of each page, in page order
+    """
+    try:
+        page_count = get_pdf_page_count(pdf_path)
+        page_range = _page_range(page_count, first_page, last_page)
+        if page_range is None:
+            return f"Error: Page range {first_page}-{last_page} is out of range. PDF has {page_count} pages."
+        first_page, last_page = page_range
+        text_pages = _text_pages(pdf_path, first_page, last_page)
+        
+        # Render the pages that need vision in the pool; the vision model works
+        # on each page as soon as it is ready while the following pages are still rendering
+        pool = get_render_pool()
+        renders = [
+            (page_number, page, pool.submit(_render_page, pdf_path, page_number) if page is None else None)
+            for page_number, page in zip(range(first_page, last_page + 1), text_pages)
+        ]
+        
+        results = []
+        for page_number, page, render in renders:
+            try:
+                if page is not None:
+                    result = answer_from_text(page["text"], page_number, instruction)
+                    results.append(f"Page {page_number + 1}: {result}")
+                    continue
+                try:
+                    image_path, durations = render.result()
+                    for seconds in durations:
+                        record_duration(PDF_RENDER_SECONDS, seconds)
+                except BrokenProcessPool:
+                    # A worker died; render in this thread and replace the pool
+                    _reset_render_pool(pool)
+                    image_path = page_render_cache.get_or_render(pdf_path, page_number)
+                result = analyze_image(image_path, instruction)
+            except Exception as e:
+                result = f"Error rendering page: {str(e)}"
+            results.append(f"Page {page_number + 1}: {result}")
+        
+        if last_page < page_count - 1:
+            results.append(f"(Analyzed pages {first_page + 1}-{last_page + 1} of {page_count}.)")
+        return "\n\n".join(results)
     except Exception as e:
-        return f"Error analyzing PDF: {str(e)}"
\ No newline at end of file
+        return f"Error analyzing PDF: {str(e)}"
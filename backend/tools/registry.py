@@ -1,69 +1,406 @@
 """
 Tool registry for registering and managing available tools.
+
+Each tool is compiled into a catalog entry when it is registered: a short
+description, a JSON schema derived from the function signature and the
+defaults needed to call it positionally. Prompt descriptions and call schemas
+are built from the catalog once per set of tool names and reused.
+
+Tool modules are declared with ToolCatalog.add_module() and imported when the
+catalog is first used, so importing the backend does not load them. Tool
+modules keep their heavy dependencies (PIL, pdf2image, ollama) out of module
+scope, so those load on the first tool call.
 """
+import importlib
 import inspect
 import json
-from typing import Dict, List, Any, Callable
+import threading
+import typing
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
 
-# Tool registry to hold information about tools
-tool_registry: Dict[str, Callable] = {}
-tool_info_registry: List[Dict[str, Any]] = []
+# JSON schema types for the annotations used by tool signatures
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object"
+}
 
-def tool(func: Callable) -> Callable:
+class ToolArgumentError(ValueError):
+    """
+    Raised when the arguments of a tool call do not match the tool's schema.
+    """
+
+def _json_type(annotation: Any) -> Optional[str]:
     """
-    Decorator to register tools in the tool registry.
+    Map a parameter annotation to a JSON schema type.
     
     Args:
-        func: The function to register as a tool
-        
+        annotation: The resolved annotation (Optional[X] maps like X)
+    
     Returns:
-        The original function
+        The JSON schema type, or None if the parameter is unconstrained
+    """
+    if typing.get_origin(annotation) is typing.Union:
+        members = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(members) == 1:
+            annotation = members[0]
+    annotation = typing.get_origin(annotation) or annotation
+    return _JSON_TYPES.get(annotation)
+
+def _param_docs(docstring: str) -> Dict[str, str]:
+    """
+    Read the ":param <type> <name>: <description>" lines of a tool docstring.
+    
+    Args:
+        docstring: The tool's docstring
+    
+    Returns:
+        Mapping of parameter names to their descriptions
+    """
+    docs = {}
+    for line in docstring.splitlines():
+        line = line.strip()
+        if line.startswith(":param ") and ":" in line[7:]:
+            declaration, description = line[7:].split(":", 1)
+            docs[declaration.split()[-1]] = description.strip()
+    return docs
+
+def compile_tool(func: Callable) -> Dict[str, Any]:
+    """
+    Build the catalog entry for a tool function.
+    
+    Args:
+        func: The tool function
+    
+    Returns:
+        Dictionary with the tool's name, short description, JSON schema of
+        its parameters, parameter order and defaults
     """
     signature = inspect.signature(func)
-    docstring = func.__doc__ or ""
-    params = [
-        {"name": param.name, "type": str(param.annotation)}
-        for param in signature.parameters.values()
-    ]
-    tool_info = {
+    hints = typing.get_type_hints(func)
+    docstring = inspect.cleandoc(func.__doc__ or "")
+    param_docs = _param_docs(docstring)
+
+    properties = {}
+    required = []
+    defaults = {}
+    for param in signature.parameters.values():
+        schema = {}
+        json_type = _json_type(hints.get(param.name))
+        if json_type:
+            schema["type"] = json_type
+        if param.name in param_docs:
+            schema["description"] = param_docs[param.name]
+        if param.default is inspect.Parameter.empty:
+            required.append(param.name)
+        else:
+            defaults[param.name] = param.default
+            schema["default"] = param.default
+        properties[param.name] = schema
+
+    return {
         "name": func.__name__,
-        "description": docstring,
-        "parameters": params
+        "description": docstring.split("\n\n")[0].replace("\n", " "),
+        "parameters": {
+            "type": "object",
+            "properties": properties,
+            "required": required
+        },
+        "param_names": list(properties),
+        "defaults": defaults
     }
-    tool_registry[func.__name__] = func
-    tool_info_registry.append(tool_info)
-    return func
 
-def get_tools_list() -> str:
+def _coerce(value: Any, json_type: Optional[str], name: str) -> Any:
     """
-    Get a JSON string representation of all registered tools.
+    Convert an argument value produced by the model to the parameter's type.
+    
+    Args:
+        value: The argument value
+        json_type: The JSON schema type of the parameter
+        name: The parameter name, for error messages
     
     Returns:
-        JSON string with tool names and descriptions
+        The converted value
+    
+    Raises:
+        ToolArgumentError: If the value cannot be converted
     """
-    return json.dumps([
-        {
-            "name": tool["name"],
-            "description": tool["description"]
-        }
-        for tool in tool_info_registry
-    ])
-
-def execute_tool(tool_name: str, args: list) -> str:
+    if json_type is None:
+        return value
+    if json_type == "integer":
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str):
+            try:
+                return int(value.strip())
+            except ValueError:
+                pass
+    elif json_type == "number":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value.strip())
+            except ValueError:
+                pass
+    elif json_type == "string":
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+    elif json_type == "boolean":
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+    elif json_type == "array" and isinstance(value, list):
+        return value
+    elif json_type == "object" and isinstance(value, dict):
+        return value
+    raise ToolArgumentError(f"Argument {name} must be of type {json_type}, got {value!r}.")
+
+class ToolCatalog:
     """
-    Execute a registered tool by name with the given arguments.
+    Compiled descriptions and schemas of the registered tools.
     
-    Args:
-        tool_name: The name of the tool to execute
-        args: The arguments to pass to the tool
+    Views are keyed by a tuple of tool names (None for all tools), so each
+    agent's prompt text and output schema are built once per process.
+    """
+    def __init__(self):
+        """
+        Initialize an empty catalog.
+        """
+        self.functions: Dict[str, Callable] = {}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._views: Dict[Tuple[str, Optional[Tuple[str, ...]]], Any] = {}
+        # Declared tool modules not imported yet; imports are serialized by their
+        # own lock, as @tool functions take the catalog lock while a module loads
+        self._modules: List[str] = []
+        self._load_lock = threading.RLock()
+        # Reentrant, as views may be built from other views
+        self._lock = threading.RLock()
+
+    def register(self, func: Callable) -> Dict[str, Any]:
+        """
+        Compile and add a tool function to the catalog.
         
-    Returns:
-        The result of the tool execution
+        Args:
+            func: The tool function
         
-    Raises:
-        ValueError: If the tool is not found in the registry
+        Returns:
+            The tool's catalog entry
+        """
+        entry = compile_tool(func)
+        with self._lock:
+            self.functions[entry["name"]] = func
+            self.entries[entry["name"]] = entry
+            self._views.clear()
+        return entry
+
+    def add_module(self, module_name: str) -> None:
+        """
+        Declare a module whose @tool functions join the catalog when it is first used.
+        
+        Args:
+            module_name: The dotted module name
+        """
+        with self._lock:
+            self._modules.append(module_name)
+            self._views.clear()
+
+    def load(self) -> None:
+        """
+        Import the declared tool modules that have not been imported yet.
+        """
+        if not self._modules:
+            return
+        with self._load_lock:
+            # Modules stay pending until imported, so other threads wait here for a complete catalog
+            while self._modules:
+                importlib.import_module(self._modules[0])
+                self._modules.pop(0)
+
+    def get(self, tool_name: str) -> Optional[Callable]:
+        """
+        Look up a tool function, loading the declared tool modules if needed.
+        
+        Args:
+            tool_name: The name of the tool
+        
+        Returns:
+            The tool function, or None if there is no such tool
+        """
+        self.load()
+        return self.functions.get(tool_name)
+
+    def _view(self, kind: str, names: Optional[Sequence[str]], build: Callable) -> Any:
+        """
+        Return a cached view of the catalog, building it on first use.
+        
+        Args:
+            kind: The kind of view
+            names: The tool names in the view (None for all tools)
+            build: Function building the view from the selected entries
+        
+        Returns:
+            The view
+        """
+        self.load()
+        key = (kind, tuple(names) if names is not None else None)
+        view = self._views.get(key)
+        if view is None:
+            with self._lock:
+                entries = [self.entries[name] for name in (names if names is not None else self.entries)
+                           if name in self.entries]
+                view = build(entries)
+                self._views[key] = view
+        return view
+
+    def describe(self, names: Optional[Sequence[str]] = None) -> str:
+        """
+        Get the compact JSON description of tools for agent prompts.
+        
+        Args:
+            names: The tool names to include (None for all tools)
+        
+        Returns:
+            JSON string with each tool's name, short description and arguments in call order
+        """
+        def build(entries: List[Dict[str, Any]]) -> str:
+            tools = []
+            for entry in entries:
+                args = []
+                for name, schema in entry["parameters"]["properties"].items():
+                    arg = f"{name}: {schema.get('type', 'any')}"
+                    if "default" in schema:
+                        arg += f" = {json.dumps(schema['default'])}"
+                    args.append(arg)
+                tools.append({"name": entry["name"], "description": entry["description"], "args": args})
+            return json.dumps(tools, separators=(",", ":"))
+        return self._view("describe", names, build)
+
+    def call_schema(self, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Get the JSON schema of a tool call, used to constrain model output.
+        
+        A call is {"function": <name>, "args": [<positional arguments>]}; the
+        schema pins the argument types of each tool in order.
+        
+        Args:
+            names: The tool names the model may call (None for all tools)
+        
+        Returns:
+            The JSON schema
+        """
+        def build(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+            calls = []
+            for entry in entries:
+                properties = entry["parameters"]["properties"]
+                items = [{"type": schema["type"]} if "type" in schema else {}
+                         for schema in properties.values()]
+                calls.append({
+                    "type": "object",
+                    "properties": {
+                        "function": {"const": entry["name"]},
+                        "args": {
+                            "type": "array",
+                            "prefixItems": items,
+                            "minItems": len(entry["parameters"]["required"]),
+                            "maxItems": len(items)
+                        }
+                    },
+                    "required": ["function", "args"]
+                })
+            return calls[0] if len(calls) == 1 else {"anyOf": calls}
+        return self._view("call_schema", names, build)
+
+    def plan_schema(self, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Get the JSON schema of a tool call plan: one call, or several independent calls.
+        
+        Several calls are given as {"calls": [<call>, ...]} and run concurrently.
+        
+        Args:
+            names: The tool names the model may call (None for all tools)
+        
+        Returns:
+            The JSON schema
+        """
+        def build(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+            call = self.call_schema(names)
+            return {
+                "anyOf": [
+                    call,
+                    {
+                        "type": "object",
+                        "properties": {"calls": {"type": "array", "items": call, "minItems": 1}},
+                        "required": ["calls"]
+                    }
+                ]
+            }
+        return self._view("plan_schema", names, build)
+
+    def validate_args(self, tool_name: str, args: Any) -> List[Any]:
+        """
+        Check and convert tool call arguments against the tool's schema.
+        
+        Args:
+            tool_name: The name of the tool
+            args: Positional arguments as a list, or keyword arguments as a dict
+        
+        Returns:
+            The converted positional arguments
+        
+        Raises:
+            ValueError: If the tool is not found in the registry
+            ToolArgumentError: If the arguments do not match the schema
+        """
+        self.load()
+        if tool_name not in self.entries:
+            raise ValueError(f"Tool {tool_name} not found in registry.")
+        entry = self.entries[tool_name]
+        names = entry["param_names"]
+        properties = entry["parameters"]["properties"]
+
+        if isinstance(args, dict):
+            unknown = [name for name in args if name not in properties]
+            if unknown:
+                raise ToolArgumentError(f"Unknown arguments for {tool_name}: {', '.join(unknown)}.")
+            provided = [i for i, name in enumerate(names) if name in args]
+            count = provided[-1] + 1 if provided else 0
+            values = [args[name] if name in args else entry["defaults"].get(name, inspect.Parameter.empty)
+                      for name in names[:count]]
+        elif isinstance(args, list):
+            if len(args) > len(names):
+                raise ToolArgumentError(f"{tool_name} takes at most {len(names)} arguments, got {len(args)}.")
+            values = list(args)
+        else:
+            raise ToolArgumentError(f"Arguments for {tool_name} must be a list or an object.")
+
+        missing = [name for i, name in enumerate(names)
+                   if name in entry["parameters"]["required"] and (i >= len(values) or values[i] is inspect.Parameter.empty)]
+        if missing:
+            raise ToolArgumentError(f"Missing arguments for {tool_name}: {', '.join(missing)}.")
+
+        return [_coerce(value, properties[name].get("type"), name) for name, value in zip(names, values)]
+
+# Catalog of all registered tools
+tool_catalog = ToolCatalog()
+
+def tool(func: Callable) -> Callable:
     """
-    if tool_name not in tool_registry:
-        raise ValueError(f"Tool {tool_name} not found in registry.")
+    Decorator to register tools in the tool catalog.
+    
+    Args:
+        func: The function to register as a tool
     
-    return tool_registry[tool_name](*args)
\ No newline at end of file
+    Returns:
+        The original function
+    """
+    tool_catalog.register(func)
+    return func
@@ -0,0 +1,320 @@
+# backend/uploads.py
+"""
+Content-addressed storage for uploaded files.
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, TypedDict
+from backend.config import UPLOAD_DIR, UPLOAD_MAX_MB, UPLOAD_TTL, UPLOAD_SWEEP_INTERVAL
+from backend.utils.helpers import remember_file_sha256, file_lock
+
+def _dir_size(path: str) -> int:
+    """
+    Get the total size of the files in a directory tree.
+    
+    Args:
+        path: The directory (missing directories have size 0)
+        
+    Returns:
+        The total size in bytes
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+class UploadQuotaError(Exception):
+    """
+    Raised when an upload does not fit in the store's disk quota.
+    """
+    pass
+
+class StoredFile(TypedDict):
+    """
+    Type definition for a file held by the upload store.
+    """
+    path: str
+    sha256: str
+    size: int
+    filename: str
+
+class UploadStore:
+    """
+    Store of uploaded files named by the SHA-256 of their content.
+    
+    Files are hashed while they are streamed to disk, so an upload is read
+    once, and a file uploaded again is not stored twice. The store keeps
+    within a disk quota by evicting least recently used files, and a
+    background thread removes files unused for longer than the TTL. A file's
+    path is stable for its content, so it can serve as a cache key.
+    """
+    CHUNK_SIZE = 1024 * 1024
+    # Files used this recently are never evicted to make room, so a path
+    # handed to a running request stays valid
+    EVICTION_GRACE_SECONDS = 300
+    # Suffix of the directory holding data derived from a stored file
+    SIDECAR_SUFFIX = ".sidecar"
+
+    def __init__(self, root: str = UPLOAD_DIR, max_mb: int = UPLOAD_MAX_MB,
+                 ttl_seconds: float = UPLOAD_TTL, sweep_interval: float = UPLOAD_SWEEP_INTERVAL):
+        """
+        Initialize the store.
+        
+        Args:
+            root: Directory holding the stored files
+            max_mb: Maximum total size of stored files in megabytes
+            ttl_seconds: How long a file is kept after its last use
+            sweep_interval: Seconds between background sweeps for expired files
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.ttl = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid: Optional[int] = None
+        self._sweeper_lock = threading.Lock()
+
+    def get_path(self, digest: str, extension: str) -> str:
+        """
+        Get the location of a stored file.
+        
+        Args:
+            digest: The SHA-256 hex digest of the file content
+            extension: The file extension, including the dot
+        
+        Returns:
+            Path where the file is (or would be) stored
+        """
+        return os.path.join(self.root, digest[:2], f"{digest}{extension}")
+
+    def save(self, stream: BinaryIO, filename: str) -> StoredFile:
+        """
+        Stream an upload into the store, hashing it on the way.
+        
+        Args:
+            stream: Readable binary stream with the file content
+            filename: The uploaded file name, used for its extension
+        
+        Returns:
+            The stored file
+        
+        Raises:
+            UploadQuotaError: If the file does not fit in the disk quota
+        """
+        self.start_sweeper()
+        extension = os.path.splitext(filename)[1].lower()
+        temp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        sha = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp_file:
+            for chunk in iter(lambda: stream.read(self.CHUNK_SIZE), b''):
+                sha.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        path = self.get_path(digest, extension)
+
+        try:
+            if not self.touch(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with file_lock(os.path.join(self.root, ".locks", "store.lock")):
+                    # Another worker may have stored the same file while we waited
+                    if not self.touch(path):
+                        self._make_room(size)
+                        os.replace(temp_file.name, path)
+                        remember_file_sha256(path, digest)
+        finally:
+            if os.path.exists(temp_file.name):
+                os.remove(temp_file.name)
+
+        return StoredFile(path=path, sha256=digest, size=size, filename=filename)
+
+    def contains(self, path: Optional[str]) -> bool:
+        """
+        Check whether a path is a location in the store, whether or not the file exists.
+        
+        Args:
+            path: Path to the file
+        
+        Returns:
+            True if the path lies in the store, False otherwise
+        """
+        return bool(path) and os.path.dirname(os.path.dirname(os.path.abspath(path))) == self.root
+
+    def touch(self, path: Optional[str]) -> bool:
+        """
+        Mark a stored file as recently used.
+        
+        Paths outside the store are ignored.
+        
+        Args:
+            path: Path to the file
+        
+        Returns:
+            True if the file is in the store, False otherwise
+        """
+        if not self.contains(path):
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        # The file name is its content hash, so it never needs re-reading
+        remember_file_sha256(path, os.path.splitext(os.path.basename(path))[0])
+        return True
+
+    @staticmethod
+    def sidecar_dir(path: str) -> str:
+        """
+        Get the directory for data derived from a stored file, such as a document index.
+        
+        Sidecar directories count towards the quota and are removed with their file.
+        
+        Args:
+            path: Path to the stored file
+        
+        Returns:
+            Path of the file's sidecar directory
+        """
+        return path + UploadStore.SIDECAR_SUFFIX
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        """
+        List the stored files; each file's size includes its sidecar directory.
+        
+        Returns:
+            Tuple of ((mtime, size, path) entries, total size in bytes)
+        """
+        entries = []
+        total_size = 0
+        for root, dirs, files in os.walk(self.root):
+            # Sidecar directories are measured with their file
+            dirs[:] = [name for name in dirs if not name.startswith(".") and not name.endswith(self.SIDECAR_SUFFIX)]
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                size = stat.st_size + _dir_size(self.sidecar_dir(path))
+                entries.append((stat.st_mtime, size, path))
+                total_size += size
+        return entries, total_size
+
+    def _remove(self, path: str) -> None:
+        """
+        Remove a stored file and its sidecar directory.
+        
+        Args:
+            path: Path to the stored file
+        """
+        shutil.rmtree(self.sidecar_dir(path), ignore_errors=True)
+        os.remove(path)
+
+    def _make_room(self, size: int) -> None:
+        """
+        Evict least recently used files until a new file of the given size fits.
+        
+        Must be called with the store lock held.
+        
+        Args:
+            size: Size of the new file in bytes
+        
+        Raises:
+            UploadQuotaError: If not enough files can be evicted
+        """
+        entries, total_size = self._scan()
+        cutoff = time.time() - self.EVICTION_GRACE_SECONDS
+        for mtime, entry_size, path in sorted(entries):
+            if total_size + size <= self.max_bytes or mtime > cutoff:
+                break
+            try:
+                self._remove(path)
+                total_size -= entry_size
+            except FileNotFoundError:
+                pass
+        if total_size + size > self.max_bytes:
+            raise UploadQuotaError("Upload storage is full, please retry later")
+
+    def sweep(self) -> int:
+        """
+        Remove files unused for longer than the TTL and abandoned partial uploads.
+        
+        Only one process sweeps at a time; others skip the sweep while it runs.
+        
+        Returns:
+            The number of files removed
+        """
+        removed = 0
+        with file_lock(os.path.join(self.root, ".locks", "store.lock"), blocking=False) as acquired:
+            if not acquired:
+                return removed
+            cutoff = time.time() - self.ttl
+            entries, _ = self._scan()
+            temp_dir = os.path.join(self.root, ".tmp")
+            if os.path.isdir(temp_dir):
+                for name in os.listdir(temp_dir):
+                    path = os.path.join(temp_dir, name)
+                    try:
+                        entries.append((os.stat(path).st_mtime, 0, path))
+                    except FileNotFoundError:
+                        pass
+            for mtime, _, path in entries:
+                if mtime < cutoff:
+                    try:
+                        self._remove(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+            # Sidecars left behind by files removed outside the store
+            for root, dirs, _ in os.walk(self.root):
+                for name in dirs:
+                    if name.endswith(self.SIDECAR_SUFFIX) and not os.path.exists(os.path.join(root, name[:-len(self.SIDECAR_SUFFIX)])):
+                        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                dirs[:] = [name for name in dirs if not name.startswith(".") and not name.endswith(self.SIDECAR_SUFFIX)]
+        return removed
+
+    def start_sweeper(self) -> None:
+        """
+        Start the background sweep thread in this process, if not already running.
+        """
+        if self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            threading.Thread(target=self._sweep_loop, name="upload-sweeper", daemon=True).start()
+
+    def _sweep_loop(self) -> None:
+        """
+        Sweep the store periodically.
+        """
+        while True:
+            try:
+                self.sweep()
+            except OSError:
+                pass
+            time.sleep(self.sweep_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the store's disk usage.
+        
+        Returns:
+            Dictionary with the number of files, their total size and the quota in bytes
+        """
+        entries, total_size = self._scan()
+        return {"files": len(entries), "bytes": total_size, "max_bytes": self.max_bytes}
+
+# Store shared by all request handlers
+upload_store = UploadStore()
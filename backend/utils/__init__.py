@@ -2,4 +2,4 @@
 """
 Utility functions for the multimodal analysis system.
 """
-from backend.utils.helpers import ToolState, clip_history
\ No newline at end of file
+from backend.utils.helpers import ToolState, StateEvent, EventLog, render_history, file_sha256, remember_file_sha256, file_lock
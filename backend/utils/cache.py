@@ -0,0 +1,275 @@
+# backend/utils/cache.py
+"""
+Result caches with TTL and size-based eviction and pluggable storage backends.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class CacheBackend(ABC):
+    """
+    Abstract storage backend for ResultCache.
+    Values must be JSON-serializable.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """
+        Look up an entry.
+        
+        Args:
+            key: The cache key
+            
+        Returns:
+            A (expires_at, value) tuple, or None if the key is not stored
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        """
+        Store an entry, evicting old entries if the backend is full.
+        
+        Args:
+            key: The cache key
+            value: The value to store
+            expires_at: Unix time after which the entry is stale
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Remove an entry if present.
+        
+        Args:
+            key: The cache key
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU backend. Entries are not shared between worker processes.
+    """
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the backend.
+        
+        Args:
+            max_entries: Maximum number of entries kept
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Local SQLite backend. Entries persist across restarts and are shared by
+    all worker processes on the same host.
+    """
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        Initialize the backend, creating the database if needed.
+        
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of entries kept
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._pid = os.getpid()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection to the database.
+        
+        A forked worker process opens its own connections rather than using
+        those inherited from the parent.
+        
+        Returns:
+            The SQLite connection
+        """
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        conn = self._connect()
+        row = conn.execute("SELECT expires_at, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, time.time())
+            )
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache")
+
+class ResultCache:
+    """
+    Cache of computed results with a time-to-live and hit/miss counters.
+    """
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 3600):
+        """
+        Initialize the cache.
+        
+        Args:
+            backend: Storage backend for the entries
+            ttl_seconds: How long an entry stays valid
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Build a cache key from JSON-serializable parts.
+        
+        Args:
+            parts: The values identifying the result
+            
+        Returns:
+            A SHA-256 hex digest of the parts
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached result and count the hit or miss.
+        
+        Args:
+            key: The cache key
+            
+        Returns:
+            The cached value, or None if it is missing or expired
+        """
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] < time.time():
+            self.backend.delete(key)
+            entry = None
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry[1] if entry is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a result.
+        
+        Args:
+            key: The cache key
+            value: The JSON-serializable value to store
+        """
+        self.backend.set(key, value, time.time() + self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the hit/miss counters.
+        
+        Returns:
+            Dictionary with hits, misses and hit_rate
+        """
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+def create_cache(backend: str, ttl_seconds: float, max_entries: int, sqlite_path: str) -> Optional[ResultCache]:
+    """
+    Build a ResultCache from configuration values.
+    
+    Args:
+        backend: "memory", "sqlite" or "none"
+        ttl_seconds: How long an entry stays valid
+        max_entries: Maximum number of entries kept
+        sqlite_path: Database path used by the "sqlite" backend
+        
+    Returns:
+        The configured cache, or None if caching is disabled
+        
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return ResultCache(MemoryCacheBackend(max_entries), ttl_seconds)
+    if backend == "sqlite":
+        return ResultCache(SQLiteCacheBackend(sqlite_path, max_entries), ttl_seconds)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -2,101 +2,203 @@
 """
 Helper functions and type definitions for the multimodal analysis system.
 """
-from typing import TypedDict, Optional
+import os
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple, TypedDict, Optional
+from backend.config import STATE_MAX_EVENTS, HISTORY_MAX_CHARS, TOOL_RESULT_PROMPT_CHARS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Content hashes keyed by (path, size, mtime), so unchanged files are hashed once
+_file_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_file_hash_lock = threading.Lock()
+
+class StateEvent(TypedDict):
+    """
+    Type definition for one entry of a request's event log.
+    
+    kind is one of "agent_output", "tool_call", "tool_result" or "error";
+    source is the agent class or tool name that produced the entry.
+    """
+    kind: str
+    source: str
+    content: str
+
+class EventLog:
+    """
+    Append-only ring buffer of the events produced while processing a request.
+    
+    Appending never copies earlier entries; once full, the oldest entries are
+    dropped.
+    """
+    def __init__(self, max_events: int = STATE_MAX_EVENTS):
+        """
+        Initialize an empty log.
+        
+        Args:
+            max_events: Maximum number of entries kept
+        """
+        self._events = deque(maxlen=max_events)
+
+    def append(self, kind: str, source: str, content: str) -> None:
+        """
+        Add an entry to the log.
+        
+        Args:
+            kind: The entry type
+            source: The agent or tool that produced it
+            content: The entry text
+        """
+        self._events.append(StateEvent(kind=kind, source=source, content=content))
+
+    def of_kind(self, kind: str) -> List[StateEvent]:
+        """
+        Get all entries of a type, oldest first.
+        
+        Args:
+            kind: The entry type
+            
+        Returns:
+            The matching entries
+        """
+        return [event for event in self._events if event["kind"] == kind]
+
+    def __iter__(self) -> Iterator[StateEvent]:
+        return iter(self._events)
+
+    def __len__(self) -> int:
+        return len(self._events)
 
 class ToolState(TypedDict):
     """
     Type definition for the state passed between agents and tools.
     """
-    history: str
+    question: str
+    events: EventLog
+    final_answer: str
     use_tool: bool
     tool_exec: str
-    tools_list: str
     image_path: Optional[str]
     pdf_path: Optional[str]
+    route: str
+    context: str
 
-def clip_history(history: str, max_chars: int = 8000) -> str:
+def format_event(event: StateEvent, max_chars: int = TOOL_RESULT_PROMPT_CHARS) -> str:
     """
-    Clip the conversation history to the specified maximum number of characters.
+    Render one event log entry as a line of prompt history.
     
     Args:
-        history: The conversation history text
-        max_chars: Maximum number of characters to keep
+        event: The entry to render
+        max_chars: Maximum length of the entry's content
         
     Returns:
-        The clipped history string
+        The rendered line
     """
-    if len(history) > max_chars:
-        return history[-max_chars:]
-    return history
+    content = event["content"]
+    if len(content) > max_chars:
+        content = content[:max_chars] + f" ... [{len(content) - max_chars} more characters]"
+    if event["kind"] == "tool_result":
+        return f"Executed {event['source']} with result: {content}"
+    if event["kind"] == "tool_call":
+        return f"Calling {event['source']} with args: {content}"
+    return content
 
-# backend/tools/registry.py
-"""
-Tool registry for registering and managing available tools.
-"""
-import inspect
-import json
-from typing import Dict, List, Any, Callable
-
-# Tool registry to hold information about tools
-tool_registry: Dict[str, Callable] = {}
-tool_info_registry: List[Dict[str, Any]] = []
-
-def tool(func: Callable) -> Callable:
+def render_history(state: ToolState, max_chars: int = HISTORY_MAX_CHARS) -> str:
     """
-    Decorator to register tools in the tool registry.
+    Render the question and the event log as history text for prompts.
+    
+    The question is always included; events are added newest first until
+    the character budget is used, and long tool results are truncated so
+    they cannot crowd out the rest of the context.
     
     Args:
-        func: The function to register as a tool
+        state: The current tool state
+        max_chars: Maximum length of the rendered history
         
     Returns:
-        The original function
-    """
-    signature = inspect.signature(func)
-    docstring = func.__doc__ or ""
-    params = [
-        {"name": param.name, "type": param.annotation}
-        for param in signature.parameters.values()
-    ]
-    tool_info = {
-        "name": func.__name__,
-        "description": docstring,
-        "parameters": params
-    }
-    tool_registry[func.__name__] = func
-    tool_info_registry.append(tool_info)
-    return func
+        The history text
+    """
+    budget = max_chars - len(state["question"])
+    lines: List[str] = []
+    for event in reversed(list(state["events"])):
+        line = format_event(event)
+        if len(line) + 1 > budget:
+            break
+        lines.append(line)
+        budget -= len(line) + 1
+    return "\n".join([state["question"]] + lines[::-1])
 
-def get_tools_list() -> str:
+def file_sha256(path: str) -> str:
     """
-    Get a JSON string representation of all registered tools.
+    Compute the SHA-256 hex digest of a file's content.
     
+    Results are memoized on path, size and modification time, so repeated
+    lookups for an unchanged file do not re-read it.
+    
+    Args:
+        path: Path to the file
+        
     Returns:
-        JSON string with tool names and descriptions
-    """
-    return json.dumps([
-        {
-            "name": tool["name"],
-            "description": tool["description"]
-        }
-        for tool in tool_info_registry
-    ])
+        The hex digest of the file content
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hash_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _file_hash_lock:
+            if len(_file_hash_cache) >= 4096:
+                _file_hash_cache.clear()
+            _file_hash_cache[key] = digest
+    return digest
 
-def execute_tool(tool_name: str, args: list) -> str:
+def remember_file_sha256(path: str, digest: str) -> None:
     """
-    Execute a registered tool by name with the given arguments.
+    Record a file's content hash computed elsewhere, e.g. while it was written.
     
     Args:
-        tool_name: The name of the tool to execute
-        args: The arguments to pass to the tool
-        
-    Returns:
-        The result of the tool execution
-        
-    Raises:
-        ValueError: If the tool is not found in the registry
+        path: Path to the file
+        digest: The hex digest of the file content
+    """
+    stat = os.stat(path)
+    with _file_hash_lock:
+        if len(_file_hash_cache) >= 4096:
+            _file_hash_cache.clear()
+        _file_hash_cache[(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)] = digest
+
+@contextmanager
+def file_lock(lock_path: str, blocking: bool = True):
     """
-    if tool_name not in tool_registry:
-        raise ValueError(f"Tool {tool_name} not found in registry.")
+    Hold an exclusive inter-process lock on a lock file.
     
-    return tool_registry[tool_name](*args)
\ No newline at end of file
+    Args:
+        lock_path: Path of the lock file
+        blocking: Whether to wait for the lock
+        
+    Yields:
+        True if the lock was acquired, False otherwise
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
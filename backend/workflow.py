@@ -1,21 +1,154 @@
 """
 Workflow setup and graph definition for the multimodal analysis system.
 """
-from typing import Literal
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Literal, Optional, Tuple
+import contextvars
 import json
-from langgraph.graph import StateGraph, END
-
-from backend.utils.helpers import ToolState
+import threading
+import time
+from backend.config import TOOL_WORKERS, TOOL_TIMEOUT, TOOL_TIMEOUTS
+from backend.utils.helpers import ToolState, render_history
+from backend.events import emit_event
+from backend.router import fast_router
+from backend.metrics import timed, GRAPH_NODE_SECONDS, TOOL_CALL_SECONDS, WORKFLOW_SETUP_SECONDS
 from backend.agent.chat_agent import ChatAgent
 from backend.agent.tool_agent import ToolAgent
 from backend.agent.image_agent import ImageAnalysisAgent
 from backend.agent.pdf_agent import PDFAnalysisAgent
-from backend.tools.registry import tool_registry
+from backend.tools.registry import tool_catalog, ToolArgumentError
+
+# Compiled graph shared by all requests, see get_workflow()
+_compiled_workflow = None
+_workflow_lock = threading.Lock()
+
+def _tool_error(state: ToolState, message: str) -> ToolState:
+    """
+    Record a failed tool execution as the answer and reset the tool selection.
+    
+    Args:
+        state: The current tool state
+        message: The error message
+        
+    Returns:
+        The updated tool state
+    """
+    state["events"].append("error", "tool", message)
+    state["final_answer"] = message
+    state["use_tool"] = False
+    state["tool_exec"] = ""
+    return state
+
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """
+    Parse a "tool=seconds,tool=seconds" timeout specification.
+    
+    Args:
+        spec: The specification string
+        
+    Returns:
+        Dictionary mapping tool names to timeouts in seconds
+    """
+    timeouts = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, seconds = item.rsplit("=", 1)
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+_tool_timeouts = parse_timeouts(TOOL_TIMEOUTS)
+
+def _parse_calls(tool_exec: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse a tool call plan: a single call, a list of calls or {"calls": [...]}.
+    
+    Args:
+        tool_exec: The JSON tool call plan
+        
+    Returns:
+        The list of calls, or None if the plan is malformed
+        
+    Raises:
+        json.JSONDecodeError: If tool_exec is not valid JSON
+    """
+    choice = json.loads(tool_exec)
+    if isinstance(choice, dict) and "calls" in choice:
+        calls = choice["calls"]
+    elif isinstance(choice, list):
+        calls = choice
+    else:
+        calls = [choice]
+    
+    if not isinstance(calls, list) or not calls:
+        return None
+    if not all(isinstance(call, dict) and "function" in call for call in calls):
+        return None
+    return calls
+
+def _run_tool(tool_name: str, args: List[Any]) -> str:
+    """
+    Run one tool call.
+    
+    Args:
+        tool_name: The name of the tool
+        args: The validated tool arguments
+        
+    Returns:
+        The tool result, or an error message if the tool raised
+    """
+    try:
+        with timed(TOOL_CALL_SECONDS, tool=tool_name):
+            return str(tool_catalog.get(tool_name)(*args))
+    except Exception as e:
+        return f"Error executing tool: {str(e)}"
+
+def _run_concurrently(calls: List[Tuple[str, List[Any]]]) -> List[str]:
+    """
+    Run the independent calls of one plan concurrently, each within its tool's timeout.
+    
+    The calls run on threads of their own, at most TOOL_WORKERS at a time, and
+    a call's timeout counts from when it starts. A call that times out is not
+    stopped; it finishes in the background and its result is dropped.
+    
+    Args:
+        calls: (tool_name, validated args) tuples
+        
+    Returns:
+        The results in call order
+    """
+    started: Dict[int, float] = {}
+    start_events = [threading.Event() for _ in calls]
+    
+    def run(index: int, tool_name: str, args: List[Any]) -> str:
+        started[index] = time.monotonic()
+        start_events[index].set()
+        return _run_tool(tool_name, args)
+    
+    executor = ThreadPoolExecutor(max_workers=min(len(calls), TOOL_WORKERS), thread_name_prefix="tool")
+    try:
+        # Tools inherit the request's context (event sink, timing collection)
+        futures = [executor.submit(contextvars.copy_context().run, run, index, tool_name, args)
+                   for index, (tool_name, args) in enumerate(calls)]
+        results = []
+        for index, ((tool_name, _), future) in enumerate(zip(calls, futures)):
+            timeout = _tool_timeouts.get(tool_name, TOOL_TIMEOUT)
+            start_events[index].wait()
+            try:
+                results.append(future.result(timeout=max(0.0, started[index] + timeout - time.monotonic())))
+            except FutureTimeoutError:
+                results.append(f"Error: Tool {tool_name} timed out after {timeout:g} seconds.")
+        return results
+    finally:
+        executor.shutdown(wait=False)
 
 # Define the function for executing tools based on agent output
 def ToolExecutor(state: ToolState) -> ToolState:
     """
-    Execute the selected tool based on the tool_exec field in the state.
+    Execute the selected tools based on the tool_exec field in the state.
+    
+    tool_exec holds one call or a list of independent calls. A single call
+    runs on the request thread; several run concurrently, each within its
+    tool's timeout (see _run_concurrently). Results are recorded in call order.
     
     Args:
         state: The current tool state
@@ -24,45 +157,72 @@ def ToolExecutor(state: ToolState) -> ToolState:
         The updated tool state after tool execution
         
     Raises:
-        ValueError: If no tool_exec data is available or if the tool is not found
+        ValueError: If no tool_exec data is available
     """
     if not state["tool_exec"]:
         raise ValueError("No tool_exec data available to execute.")
     
     try:
-        choice = json.loads(state["tool_exec"])
-        
-        if not isinstance(choice, dict) or "function" not in choice:
-            state["history"] += "\nError: Invalid tool execution format."
-            state["use_tool"] = False
-            state["tool_exec"] = ""
-            return state
-            
-        tool_name = choice["function"]
-        args = choice.get("args", [])
-        
-        if tool_name not in tool_registry:
-            state["history"] += f"\nError: Tool {tool_name} not found in registry."
-            state["use_tool"] = False
-            state["tool_exec"] = ""
-            return state
-        
-        result = tool_registry[tool_name](*args)
-        state["history"] += f"\nExecuted {tool_name} with result: {result}"
-        state["history"] = state["history"][-8000:] if len(state["history"]) > 8000 else state["history"]
-        state["use_tool"] = False
-        state["tool_exec"] = ""
-        return state
+        calls = _parse_calls(state["tool_exec"])
     except json.JSONDecodeError:
-        state["history"] += "\nError: Invalid JSON format in tool_exec."
-        state["use_tool"] = False
-        state["tool_exec"] = ""
-        return state
-    except Exception as e:
-        state["history"] += f"\nError executing tool: {str(e)}"
-        state["use_tool"] = False
-        state["tool_exec"] = ""
-        return state
+        return _tool_error(state, "Error: Invalid JSON format in tool_exec.")
+    if calls is None:
+        return _tool_error(state, "Error: Invalid tool execution format.")
+    
+    # Validate every call before running any of them
+    prepared = []
+    for call in calls:
+        tool_name = call["function"]
+        if tool_catalog.get(tool_name) is None:
+            prepared.append((tool_name, None, f"Error: Tool {tool_name} not found in registry."))
+            continue
+        try:
+            prepared.append((tool_name, tool_catalog.validate_args(tool_name, call.get("args", [])), None))
+        except ToolArgumentError as e:
+            prepared.append((tool_name, None, f"Error: Invalid arguments for {tool_name}. {e}"))
+    
+    if len(prepared) == 1 and prepared[0][2] is not None:
+        return _tool_error(state, prepared[0][2])
+    
+    runnable = [(tool_name, args) for tool_name, args, error in prepared if error is None]
+    for tool_name, args in runnable:
+        state["events"].append("tool_call", tool_name, json.dumps(args))
+    if len(runnable) == 1:
+        results = iter([_run_tool(*runnable[0])])
+    else:
+        results = iter(_run_concurrently(runnable))
+    
+    answers = []
+    for tool_name, args, error in prepared:
+        if error is None:
+            result = next(results)
+            state["events"].append("tool_result", tool_name, result)
+        else:
+            result = error
+            state["events"].append("error", tool_name, error)
+        answers.append((tool_name, result))
+    
+    if len(answers) == 1:
+        state["final_answer"] = answers[0][1]
+    else:
+        state["final_answer"] = "\n\n".join(f"Result of {tool_name}:\n{result}" for tool_name, result in answers)
+    state["use_tool"] = False
+    state["tool_exec"] = ""
+    return state
+
+# Define the router function
+def router(state: ToolState) -> ToolState:
+    """
+    Pick the entry node with the fast pre-router.
+    
+    Args:
+        state: The current tool state
+        
+    Returns:
+        The updated tool state with the chosen route
+    """
+    state["route"] = fast_router.route(state)
+    return state
 
 # Define the image_agent function
 def image_agent(state: ToolState) -> ToolState:
@@ -116,6 +276,25 @@ def tool_agent(state: ToolState) -> ToolState:
     """
     return ToolAgent(state).execute()
 
+def _node(name: str, func):
+    """
+    Wrap a graph node so it emits start and end events and records its duration.
+    
+    Args:
+        name: The node name in the graph
+        func: The node function
+        
+    Returns:
+        The wrapped node function
+    """
+    def run(state: ToolState) -> ToolState:
+        emit_event("node_start", node=name)
+        with timed(GRAPH_NODE_SECONDS, node=name):
+            state = func(state)
+        emit_event("node_end", node=name)
+        return state
+    return run
+
 # Workflow Setup
 def setup_workflow():
     """
@@ -124,16 +303,31 @@ def setup_workflow():
     Returns:
         The compiled workflow
     """
+    # langgraph is imported here rather than at startup, as it is slow to import
+    from langgraph.graph import StateGraph, END
+    
     workflow = StateGraph(ToolState)
     
     # Add agents
-    workflow.add_node("chat_agent", chat_agent)
-    workflow.add_node("tool_agent", tool_agent)
-    workflow.add_node("tool", ToolExecutor)
-    workflow.add_node("image_agent", image_agent)
-    workflow.add_node("pdf_agent", pdf_agent)
+    workflow.add_node("chat_agent", _node("chat_agent", chat_agent))
+    workflow.add_node("tool_agent", _node("tool_agent", tool_agent))
+    workflow.add_node("tool", _node("tool", ToolExecutor))
+    workflow.add_node("image_agent", _node("image_agent", image_agent))
+    workflow.add_node("pdf_agent", _node("pdf_agent", pdf_agent))
+    workflow.add_node("router", _node("router", router))
 
-    workflow.set_entry_point("chat_agent")
+    # Unambiguous requests skip the chat agent (see backend.router)
+    workflow.set_entry_point("router")
+    workflow.add_conditional_edges(
+        "router",
+        lambda state: state["route"],
+        {
+            "chat_agent": "chat_agent",
+            "image_agent": "image_agent",
+            "pdf_agent": "pdf_agent",
+            "tool": "tool"
+        }
+    )
 
     def check_agent_type(state: ToolState) -> Literal["pdf", "image", "tool", "none"]:
         """
@@ -149,7 +343,12 @@ def setup_workflow():
             return "tool"
             
         # Check for file paths and keywords in the query
-        history = state.get("history", "").lower()
+        history = render_history(state).lower()
+        
+        # Both files mentioned: the tool agent can plan one call for each
+        if state.get("pdf_path") and state.get("image_path") and ("pdf" in history or "document" in history) \
+                and any(word in history for word in ["image", "picture", "photo", "chart"]):
+            return "tool"
         
         # First priority: Check if PDF file is uploaded and mentioned
         if state.get("pdf_path") and (".pdf" in history or "pdf" in history or "document" in history):
@@ -175,6 +374,47 @@ def setup_workflow():
     workflow.add_edge('pdf_agent', 'tool')
     workflow.add_edge('image_agent', 'tool')
     workflow.add_edge('tool_agent', 'tool')
-    workflow.add_edge('tool', END)
+    def after_tool(state: ToolState) -> Literal["pdf_agent", "end"]:
+        """
+        Let the PDF agent pick pages after a page search, once per request.
+        
+        Args:
+            state: The current tool state
+            
+        Returns:
+            "pdf_agent" after the first page search, otherwise "end"
+        """
+        events = list(state["events"])
+        searches = [event for event in events if event["kind"] == "tool_result" and event["source"] == "search_pdf_pages"]
+        if state.get("pdf_path") and len(searches) == 1 and events[-1] is searches[0]:
+            return "pdf_agent"
+        return "end"
 
-    return workflow.compile()
\ No newline at end of file
+    workflow.add_conditional_edges(
+        "tool",
+        after_tool,
+        {
+            "pdf_agent": "pdf_agent",
+            "end": END
+        }
+    )
+
+    return workflow.compile()
+
+def get_workflow():
+    """
+    Get the process-wide compiled workflow, compiling it on first use.
+    
+    The compiled graph holds no per-request state, so a single instance is
+    shared by all requests and worker threads.
+    
+    Returns:
+        The compiled workflow
+    """
+    global _compiled_workflow
+    if _compiled_workflow is None:
+        with _workflow_lock:
+            if _compiled_workflow is None:
+                with timed(WORKFLOW_SETUP_SECONDS):
+                    _compiled_workflow = setup_workflow()
+    return _compiled_workflow
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# benchmarks/bench_load.py
+"""
+Load benchmark of process_question or the /process endpoint against a fake Ollama server.
+
+Starts benchmarks/fake_ollama.py in a subprocess (unless --ollama-url is
+given), generates fixture files and drives each scenario, then a mixed
+workload, at the configured concurrency. Reports p50/p95/p99 latency,
+requests per second, errors and peak RSS of this process per scenario.
+
+Usage:
+    python benchmarks/bench_load.py --requests 40 --concurrency 4
+    python benchmarks/bench_load.py --target endpoint --scenarios chat,image --json results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+SCENARIO_NAMES = ("chat", "image", "pdf_page", "pdf_large")
+MIXED_WEIGHTS = {"chat": 4, "image": 3, "pdf_page": 2, "pdf_large": 1}
+
+def free_port() -> int:
+    """
+    Find a free local TCP port.
+    
+    Returns:
+        The port number
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_fake_ollama(args) -> tuple:
+    """
+    Start the fake Ollama server in a subprocess and wait until it accepts connections.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Tuple of (process, base URL)
+    """
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(current_dir, "benchmarks", "fake_ollama.py"),
+        "--port", str(port),
+        "--latency", args.latency,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--response-tokens", str(args.response_tokens),
+        "--swap-penalty", str(args.swap_penalty)
+    ], stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake Ollama server did not start")
+
+def make_fixtures(directory: str, large_pages: int) -> dict:
+    """
+    Generate the image and PDF files used by the scenarios.
+    
+    Args:
+        directory: Directory to write the files into
+        large_pages: Number of pages of the large PDF
+        
+    Returns:
+        Dictionary with image, pdf_page and pdf_large paths
+    """
+    from PIL import Image, ImageDraw
+    
+    def page(number: int, size=(827, 1169)):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for line in range(40):
+            draw.text((60, 60 + line * 26), f"Page {number} line {line}: quarterly revenue and cost summary", fill="black")
+        draw.rectangle((60, 900, 760, 1100), outline="black")
+        return image
+    
+    image_path = os.path.join(directory, "chart.png")
+    # Noise compresses badly, like a large photo upload
+    Image.frombytes("RGB", (2400, 1800), random.Random(0).randbytes(2400 * 1800 * 3)).save(image_path)
+    
+    pdf_page_path = os.path.join(directory, "single.pdf")
+    page(1).save(pdf_page_path)
+    
+    pdf_large_path = os.path.join(directory, "report.pdf")
+    pages = [page(i + 1) for i in range(large_pages)]
+    pages[0].save(pdf_large_path, save_all=True, append_images=pages[1:])
+    
+    return {"image": image_path, "pdf_page": pdf_page_path, "pdf_large": pdf_large_path}
+
+def scenario_requests(fixtures: dict) -> dict:
+    """
+    Define the (question, image_path, pdf_path) request of each scenario.
+    
+    Args:
+        fixtures: Paths returned by make_fixtures
+        
+    Returns:
+        Dictionary mapping scenario names to requests
+    """
+    return {
+        "chat": ("Hello! What kinds of questions can you answer?", None, None),
+        "image": ("Describe this image in detail", fixtures["image"], None),
+        "pdf_page": ("What is on page 1 of this document?", None, fixtures["pdf_page"]),
+        "pdf_large": ("Summarize this report", None, fixtures["pdf_large"])
+    }
+
+class RssSampler:
+    """
+    Samples this process's resident set size in the background to find its peak.
+    """
+    def __init__(self, interval: float = 0.05):
+        """
+        Initialize the sampler.
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_kb() -> int:
+        """
+        Read the current resident set size.
+        
+        Returns:
+            RSS in kilobytes (peak RSS so far where /proc is unavailable)
+        """
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+def make_runner(target: str):
+    """
+    Build the function that sends one request to the benchmarked target.
+    
+    Args:
+        target: "api" for process_question, "endpoint" for the /process route
+        
+    Returns:
+        Function taking (question, image_path, pdf_path) and returning the response text
+    """
+    if target == "api":
+        from backend.main import process_question
+        
+        def run_api(question, image_path, pdf_path):
+            return process_question(question, image_path, pdf_path)["final_answer"]
+        return run_api
+    
+    from frontend.app import app
+    local = threading.local()
+    
+    def run_endpoint(question, image_path, pdf_path):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        data = {"query": question}
+        files = []
+        for field, path in (("image", image_path), ("pdf", pdf_path)):
+            if path:
+                handle = open(path, "rb")
+                files.append(handle)
+                data[field] = (handle, os.path.basename(path))
+        try:
+            response = client.post("/process", data=data, content_type="multipart/form-data")
+        finally:
+            for handle in files:
+                handle.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.get_json()["response"]
+    return run_endpoint
+
+def percentile(ordered: list, fraction: float) -> float:
+    """
+    Get a percentile of sorted values (nearest rank).
+    
+    Args:
+        ordered: Values in ascending order
+        fraction: Percentile as a fraction, e.g. 0.95
+        
+    Returns:
+        The percentile value
+    """
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_scenario(name: str, requests: list, runner, concurrency: int) -> dict:
+    """
+    Drive a list of requests at the given concurrency and summarize the results.
+    
+    Args:
+        name: Scenario name
+        requests: List of (question, image_path, pdf_path) tuples
+        runner: Function sending one request
+        concurrency: Number of requests in flight
+        
+    Returns:
+        Summary dictionary for the report
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    
+    def one(request):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            response = runner(*request)
+            failed = response.startswith("Error")
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+    
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, requests))
+        wall = time.perf_counter() - start
+    
+    ordered = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(requests),
+        "errors": errors,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "rps": len(requests) / wall if wall else 0.0,
+        "peak_rss_mb": rss.peak_kb / 1024
+    }
+
+def main():
+    """
+    Parse command line arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Load benchmark with a fake Ollama server')
+    parser.add_argument('--target', choices=('api', 'endpoint'), default='api',
+                        help='Benchmark process_question directly or the /process route')
+    parser.add_argument('--scenarios', default=','.join(SCENARIO_NAMES) + ',mixed',
+                        help='Comma-separated scenarios: chat, image, pdf_page, pdf_large, mixed')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight')
+    parser.add_argument('--large-pages', type=int, default=30, help='Pages in the large PDF')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the mixed workload')
+    parser.add_argument('--ollama-url', help='Use a running (fake) Ollama server instead of starting one')
+    parser.add_argument('--latency', default='gemma2:27b=0.2,llava:34b=0.6', help='Fake server time to first token per model')
+    parser.add_argument('--tokens-per-second', type=float, default=200.0, help='Fake server generation speed')
+    parser.add_argument('--response-tokens', type=int, default=64, help='Fake server free-text response length')
+    parser.add_argument('--swap-penalty', type=float, default=0.0, help='Fake server model swap delay')
+    parser.add_argument('--disable-caches', action='store_true', help='Disable the response, vision result and PDF text caches')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+    
+    server = None
+    ollama_url = args.ollama_url
+    if not ollama_url:
+        server, ollama_url = start_fake_ollama(args)
+    
+    work_dir = tempfile.mkdtemp(prefix="bench_load_")
+    # Configure the backend before it is imported; it reads settings at import time
+    os.environ["OLLAMA_HOST"] = ollama_url
+    os.environ["TEMP_DIR"] = work_dir
+    os.environ["UPLOAD_DIR"] = os.path.join(work_dir, "uploads")
+    if args.disable_caches:
+        os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+        os.environ["VISION_CACHE_BACKEND"] = "none"
+        os.environ["PDF_TEXT_CACHE_BACKEND"] = "none"
+    
+    try:
+        fixtures = make_fixtures(work_dir, args.large_pages)
+        requests_by_scenario = scenario_requests(fixtures)
+        
+        from backend.main import warm_up
+        warm_up()
+        runner = make_runner(args.target)
+        
+        results = []
+        rng = random.Random(args.seed)
+        for name in args.scenarios.split(","):
+            name = name.strip()
+            if name == "mixed":
+                names = list(MIXED_WEIGHTS)
+                picks = rng.choices(names, weights=[MIXED_WEIGHTS[n] for n in names], k=args.requests)
+                requests = [requests_by_scenario[n] for n in picks]
+            elif name in requests_by_scenario:
+                requests = [requests_by_scenario[name]] * args.requests
+            else:
+                parser.error(f"Unknown scenario: {name}")
+            results.append(run_scenario(name, requests, runner, args.concurrency))
+        
+        print(f"{'scenario':<10} {'reqs':>5} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>7} {'peak RSS MB':>12}")
+        for result in results:
+            print(f"{result['scenario']:<10} {result['requests']:>5} {result['errors']:>6} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                  f"{result['rps']:>7.2f} {result['peak_rss_mb']:>12.1f}")
+        
+        if args.json:
+            with open(args.json, "w") as output:
+                json.dump({"target": args.target, "concurrency": args.concurrency, "results": results}, output, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# benchmarks/bench_runtime.py
+"""
+Measure the per-request setup overhead of the workflow and agent chains.
+
+The "cold" path reproduces what every request used to pay: compiling the
+StateGraph and building a PromptTemplate and ChatOllama client per agent call.
+The "warm" path uses the shared runtime (get_workflow() and the cached agent
+chains). No Ollama server is needed since no model is invoked.
+
+Usage:
+    python benchmarks/bench_runtime.py --iterations 200
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+current_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from langchain_ollama import ChatOllama
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from backend.main import warm_up
+from backend.workflow import setup_workflow, get_workflow
+from backend.agent.chat_agent import ChatAgent
+from backend.agent.tool_agent import ToolAgent
+from backend.agent.image_agent import ImageAnalysisAgent
+from backend.agent.pdf_agent import PDFAnalysisAgent
+
+# A typical tool request runs two agents (chat agent + one specialist agent)
+REQUEST_AGENTS = (ChatAgent, PDFAnalysisAgent)
+
+def cold_request() -> None:
+    """
+    Pay the setup cost the way each request did before the shared runtime.
+    """
+    setup_workflow()
+    for agent_class in REQUEST_AGENTS:
+        prompt = PromptTemplate.from_template(agent_class().get_prompt_template())
+        llm = ChatOllama(model=agent_class.model_name, format="json", temperature=0)
+        prompt | llm | StrOutputParser()
+
+def warm_request() -> None:
+    """
+    Pay the setup cost with the shared, precompiled runtime.
+    """
+    get_workflow()
+    for agent_class in REQUEST_AGENTS:
+        agent_class().get_chain()
+
+def measure(func, iterations: int) -> list:
+    """
+    Time repeated calls of a function.
+    
+    Args:
+        func: The function to time
+        iterations: Number of calls
+        
+    Returns:
+        List of per-call durations in milliseconds
+    """
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(name: str, timings: list) -> None:
+    """
+    Print summary statistics for a list of timings.
+    
+    Args:
+        name: Label for the measured path
+        timings: Per-call durations in milliseconds
+    """
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) > 1 else ordered[0]
+    print(f"{name:<6} mean={statistics.mean(timings):9.3f} ms  "
+          f"p50={statistics.median(timings):9.3f} ms  p95={p95:9.3f} ms")
+
+def main():
+    """
+    Parse command line arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark per-request workflow setup overhead')
+    parser.add_argument('--iterations', type=int, default=100, help='Number of simulated requests per path')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    warm_up()
+    print(f"warm_up() took {(time.perf_counter() - start) * 1000:.3f} ms (once per process)")
+
+    report("cold", measure(cold_request, args.iterations))
+    report("warm", measure(warm_request, args.iterations))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# benchmarks/bench_startup.py
+"""
+Measure the cold-start time of the backend entry points.
+
+Each target is imported in fresh interpreters run with `python -X importtime`.
+The benchmark reports the wall time of the whole process, the import time of
+the target and the top-level packages that account for most of it. With
+--warm-up it also times backend.main.warm_up(), which loads the deferred
+langgraph and langchain imports. No Ollama server is needed.
+
+The benchmark fails if importing a target loads a tool module: tool modules
+register lazily and must load on first use (see backend/tools/__init__.py).
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --targets backend.main,frontend.app --warm-up --json startup.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from collections import Counter
+
+current_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+DEFAULT_TARGETS = ("backend.tools", "backend.main", "backend.batch", "frontend.app")
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+# Written to stderr once the target is imported; later imports belong to the warm-up
+IMPORTED_MARKER = "bench_startup: imported"
+# Modules of backend.tools that may load with the backend
+EAGER_TOOL_MODULES = ("backend.tools", "backend.tools.registry")
+
+def run_once(target: str, warm_up: bool) -> dict:
+    """
+    Import a target in a fresh interpreter and parse its import timings.
+    
+    Args:
+        target: The module to import
+        warm_up: Whether to also call backend.main.warm_up()
+    
+    Returns:
+        Dictionary with the process wall time, the target's cumulative import
+        time, the warm-up time (or None) and the self time per top-level package,
+        all in milliseconds, and the tool modules the import loaded
+    """
+    code = (
+        "import time, sys\n"
+        f"import {target}\n"
+        f"sys.stderr.write({IMPORTED_MARKER!r} + '\\n')\n"
+        "if {warm_up}:\n"
+        "    import backend.main\n"
+        "    start = time.perf_counter()\n"
+        "    backend.main.warm_up()\n"
+        "    print(f'warm_up {{(time.perf_counter() - start) * 1000}}')\n"
+    ).format(warm_up=warm_up)
+    env = dict(os.environ, PYTHONPATH=current_dir + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=current_dir, env=env, capture_output=True, text=True, check=True
+    )
+    wall = (time.perf_counter() - start) * 1000
+
+    import_ms = 0.0
+    packages: Counter = Counter()
+    tool_modules = set()
+    imported = False
+    for line in completed.stderr.splitlines():
+        if line == IMPORTED_MARKER:
+            imported = True
+            continue
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == target:
+            import_ms = int(cumulative_us) / 1000
+        if not imported and name.startswith("backend.tools") and name not in EAGER_TOOL_MODULES:
+            tool_modules.add(name)
+
+    warm_up_ms = None
+    for line in completed.stdout.splitlines():
+        if line.startswith("warm_up "):
+            warm_up_ms = float(line.split()[1])
+    return {"wall_ms": wall, "import_ms": import_ms, "warm_up_ms": warm_up_ms, "packages": packages,
+            "tool_modules": tool_modules}
+
+def measure(target: str, runs: int, warm_up: bool, top: int) -> dict:
+    """
+    Import a target repeatedly and summarize the timings.
+    
+    Args:
+        target: The module to import
+        runs: Number of fresh interpreters
+        warm_up: Whether to also time backend.main.warm_up()
+        top: Number of heaviest packages to report
+    
+    Returns:
+        Dictionary with median and minimum timings in milliseconds, the
+        heaviest packages by median self time and the tool modules the import loaded
+    """
+    samples = [run_once(target, warm_up) for _ in range(runs)]
+    packages = Counter()
+    for name in set().union(*(sample["packages"] for sample in samples)):
+        packages[name] = statistics.median(sample["packages"].get(name, 0.0) for sample in samples)
+
+    result = {
+        "target": target,
+        "runs": runs,
+        "wall_ms": statistics.median(sample["wall_ms"] for sample in samples),
+        "wall_min_ms": min(sample["wall_ms"] for sample in samples),
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "top_packages": [[name, round(ms, 1)] for name, ms in packages.most_common(top)],
+        "tool_modules": sorted(set().union(*(sample["tool_modules"] for sample in samples)))
+    }
+    if warm_up:
+        result["warm_up_ms"] = statistics.median(sample["warm_up_ms"] for sample in samples)
+    return result
+
+def report(result: dict) -> None:
+    """
+    Print the summary of one target.
+    
+    Args:
+        result: The summary returned by measure()
+    """
+    line = (f"{result['target']:<16} wall={result['wall_ms']:8.1f} ms (min {result['wall_min_ms']:.1f})  "
+            f"import={result['import_ms']:8.1f} ms")
+    if "warm_up_ms" in result:
+        line += f"  warm_up={result['warm_up_ms']:8.1f} ms"
+    print(line)
+    print("    " + ", ".join(f"{name} {ms:.1f}" for name, ms in result["top_packages"]))
+    if result["tool_modules"]:
+        print("    imports tool modules: " + ", ".join(result["tool_modules"]))
+
+def main():
+    """
+    Parse command line arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the cold-start import time of the backend')
+    parser.add_argument('--targets', default=','.join(DEFAULT_TARGETS), help='Comma-separated modules to import')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per target')
+    parser.add_argument('--warm-up', action='store_true', help='Also time backend.main.warm_up() after the import')
+    parser.add_argument('--top', type=int, default=8, help='Heaviest top-level packages to list per target')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for target in args.targets.split(','):
+        result = measure(target.strip(), args.runs, args.warm_up, args.top)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"python": sys.version.split()[0], "results": results}, output, indent=2)
+    
+    eager = [result["target"] for result in results if result["tool_modules"]]
+    if eager:
+        sys.exit(f"Tool modules are imported eagerly by: {', '.join(eager)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# benchmarks/fake_ollama.py
+"""
+Local stand-in for the Ollama server, for benchmarks without GPUs or models.
+
+Serves the /api/generate and /api/chat calls made by ollama.generate and
+ChatOllama, streaming NDJSON or returning a single JSON object. Responses are
+shaped like the agents expect (JSON tool calls or scenarios for the chat model,
+free text for the vision model), and timing is controlled by a per-model
+time-to-first-token, a token rate and an optional model swap penalty that
+simulates loading a different model onto the GPU.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11435 --latency gemma2:27b=0.5,llava:34b=1.5
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_PATTERN = re.compile(r"(/[^\s\"'\\\\]+\.(?:png|jpe?g|gif|pdf))", re.IGNORECASE)
+FILLER = ("The page shows a structured layout with a title, several paragraphs of body text, "
+          "a table of figures and a short summary of the key findings at the bottom. ").split()
+
+class FakeOllamaConfig:
+    """
+    Timing settings of the fake server.
+    """
+    def __init__(self, latency: dict, default_latency: float, tokens_per_second: float,
+                 response_tokens: int, swap_penalty: float):
+        """
+        Initialize the settings.
+        
+        Args:
+            latency: Time to first token per model name, in seconds
+            default_latency: Time to first token for other models
+            tokens_per_second: Generation speed
+            response_tokens: Number of tokens in free-text responses
+            swap_penalty: Extra delay when a call uses a different model than the previous call
+        """
+        self.latency = latency
+        self.default_latency = default_latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.swap_penalty = swap_penalty
+        self.loaded_model = None
+        self.lock = threading.Lock()
+
+    def first_token_delay(self, model: str) -> float:
+        """
+        Get the delay before the first token, including a model swap if needed.
+        
+        Args:
+            model: The requested model
+            
+        Returns:
+            The delay in seconds
+        """
+        delay = self.latency.get(model, self.default_latency)
+        with self.lock:
+            if self.loaded_model is not None and self.loaded_model != model:
+                delay += self.swap_penalty
+            self.loaded_model = model
+        return delay
+
+def agent_reply(prompt: str) -> str:
+    """
+    Produce the JSON an agent prompt asks for.
+    
+    Args:
+        prompt: The full prompt text
+        
+    Returns:
+        A JSON string
+    """
+    paths = PATH_PATTERN.findall(prompt)
+    pdf_path = next((p for p in paths if p.lower().endswith(".pdf")), None)
+    image_path = next((p for p in paths if not p.lower().endswith(".pdf")), None)
+    
+    if "Image Analysis Agent" in prompt:
+        return json.dumps({"function": "analyze_image", "args": [image_path or "image.png", "Describe the image"]})
+    if "PDF Analysis Agent" in prompt:
+        return json.dumps({"function": "analyze_pdf_page", "args": [pdf_path or "document.pdf", 0, "Describe the page"]})
+    if "Image path:" in prompt and (image_path or pdf_path):
+        if pdf_path:
+            return json.dumps({"function": "analyze_pdf_page", "args": [pdf_path, 0, "Describe the page"]})
+        return json.dumps({"function": "analyze_image", "args": [image_path, "Describe the image"]})
+    return json.dumps({"scenario": " ".join(FILLER[:24]), "use_tool": False})
+
+def tokenize(text: str, json_mode: bool) -> list:
+    """
+    Split a response into streamed tokens.
+    
+    Args:
+        text: The response text
+        json_mode: Whether the text is JSON (split into 4-character pieces)
+        
+    Returns:
+        The list of tokens
+    """
+    if json_mode:
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+    return [word + " " for word in text.split()]
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler implementing the subset of the Ollama API used by the app.
+    """
+    protocol_version = "HTTP/1.1"
+    config: FakeOllamaConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name} for name in self.config.latency]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            self._respond(request, chat=False)
+        elif self.path == "/api/chat":
+            self._respond(request, chat=True)
+        else:
+            self.send_error(404)
+
+    def _respond(self, request: dict, chat: bool) -> None:
+        """
+        Generate and send a (possibly streamed) response.
+        
+        Args:
+            request: The decoded request body
+            chat: True for /api/chat, False for /api/generate
+        """
+        model = request.get("model", "")
+        json_mode = bool(request.get("format"))
+        if chat:
+            prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        else:
+            prompt = request.get("prompt") or ""
+        
+        if json_mode:
+            text = agent_reply(prompt)
+        else:
+            words = (FILLER * (self.config.response_tokens // len(FILLER) + 1))[:self.config.response_tokens]
+            text = " ".join(words)
+        tokens = tokenize(text, json_mode)
+        prompt_tokens = max(1, len(prompt) // 4) + 576 * len(request.get("images") or [])
+        
+        time.sleep(self.config.first_token_delay(model))
+        token_delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(token_delay)
+                self._write_chunk(self._message(model, token, chat, done=False))
+            self._write_chunk(self._message(model, "", chat, done=True,
+                                            prompt_tokens=prompt_tokens, eval_tokens=len(tokens)))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(token_delay * len(tokens))
+            self._send_json(self._message(model, text, chat, done=True,
+                                          prompt_tokens=prompt_tokens, eval_tokens=len(tokens)))
+
+    @staticmethod
+    def _message(model: str, text: str, chat: bool, done: bool,
+                 prompt_tokens: int = 0, eval_tokens: int = 0) -> dict:
+        """
+        Build one response object in the Ollama wire format.
+        
+        Returns:
+            The response dictionary
+        """
+        message = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if chat:
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        if done:
+            message.update({"done_reason": "stop", "prompt_eval_count": prompt_tokens, "eval_count": eval_tokens})
+        return message
+
+    def _write_chunk(self, data: dict) -> None:
+        """
+        Send one NDJSON line as an HTTP chunk.
+        
+        Args:
+            data: The object to send
+        """
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, data: dict) -> None:
+        """
+        Send a complete JSON response.
+        
+        Args:
+            data: The object to send
+        """
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def parse_latency(spec: str) -> dict:
+    """
+    Parse a "model=seconds,model=seconds" latency specification.
+    
+    Args:
+        spec: The specification string
+        
+    Returns:
+        Dictionary mapping model names to seconds
+    """
+    latency = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, seconds = item.rsplit("=", 1)
+            latency[model.strip()] = float(seconds)
+    return latency
+
+def make_server(host: str, port: int, config: FakeOllamaConfig) -> ThreadingHTTPServer:
+    """
+    Create a fake Ollama server.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 for any free port)
+        config: Timing settings
+        
+    Returns:
+        The server, ready for serve_forever()
+    """
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    """
+    Parse command line arguments and run the fake server.
+    """
+    parser = argparse.ArgumentParser(description='Run a fake Ollama server for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to bind')
+    parser.add_argument('--port', type=int, default=11435, help='Port to bind')
+    parser.add_argument('--latency', default='gemma2:27b=0.5,llava:34b=1.5',
+                        help='Time to first token per model, e.g. gemma2:27b=0.5,llava:34b=1.5')
+    parser.add_argument('--default-latency', type=float, default=0.5, help='Time to first token for other models')
+    parser.add_argument('--tokens-per-second', type=float, default=40.0, help='Generation speed')
+    parser.add_argument('--response-tokens', type=int, default=64, help='Tokens in free-text responses')
+    parser.add_argument('--swap-penalty', type=float, default=0.0,
+                        help='Extra delay when a call uses a different model than the previous one')
+    args = parser.parse_args()
+    
+    config = FakeOllamaConfig(parse_latency(args.latency), args.default_latency,
+                              args.tokens_per_second, args.response_tokens, args.swap_penalty)
+    server = make_server(args.host, args.port, config)
+    print(f"Fake Ollama listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,11 @@
 Flask application for the multimodal analysis frontend.
 """
 import os
+import re
 import sys
 import uuid
 import json
+import threading
 
 # Add parent directory to path more safely
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,22 +14,27 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 # Import the backend processing function
-from backend.main import process_question
-from flask import Flask, render_template, request, jsonify, session
+from backend.main import process_question, stream_question, response_cache
+from backend.utils.helpers import render_history
+from backend.jobs import job_manager, QueueFullError
+from backend.batch import load_items, run_batch
+from backend.config import JOB_MAX_WAIT, BATCH_MAX_ITEMS
+from backend.router import fast_router
+from backend.sessions import session_store
+from backend.uploads import upload_store, UploadQuotaError
+from backend.llm.gateway import model_gateway
+from backend.agent.output import output_parser
+from backend.metrics import metrics_registry, collect_timings, timed, RESPONSE_EXTRACT_SECONDS
+from flask import Flask, Response, abort, render_template, request, jsonify, send_file, session, url_for, stream_with_context
 from werkzeug.utils import secure_filename
 
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = 'multimodal_analysis_secret_key'
 
-# Configure upload folders
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+# Configure uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
 def allowed_file(filename):
@@ -42,6 +49,19 @@ def allowed_file(filename):
     """
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.errorhandler(UploadQuotaError)
+def upload_quota_exceeded(error):
+    """
+    Reject uploads while the upload store is full.
+    
+    Args:
+        error: The quota error
+        
+    Returns:
+        507 JSON response
+    """
+    return jsonify({'status': 'error', 'message': str(error)}), 507
+
 @app.route('/')
 def index():
     """
@@ -56,102 +76,319 @@ def index():
     
     return render_template('index.html')
 
-def extract_final_response(history):
+def get_session_id():
     """
-    Extract the final response from the history, handling JSON objects properly.
+    Get the current session ID, creating one for clients that skipped the index page.
     
-    Args:
-        history: The full conversation history
-        
     Returns:
-        The processed final response
+        The session ID
+    """
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    return session['session_id']
+
+def use_response_cache():
     """
-    if not history:
-        return 'No response available'
+    Check whether the client allows answers from the response cache.
     
-    # Split history into lines and find the last meaningful content
-    lines = history.split('\n')
+    Clients force a fresh answer with "Cache-Control: no-cache" or "X-Cache-Bypass: 1".
     
-    # Go through lines in reverse to find the last non-JSON or processed result
-    for line in reversed(lines):
-        line = line.strip()
-        if line and line.startswith('Executed'):
-            # Found an execution result
-            parts = line.split('with result: ')
-            if len(parts) > 1:
-                return parts[1]
+    Returns:
+        False if the client asked to bypass the cache, True otherwise
+    """
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return False
+    return request.headers.get('X-Cache-Bypass', '').lower() not in ('1', 'true')
+
+def save_uploaded_files():
+    """
+    Store the image and PDF files uploaded with the current request.
+    
+    Returns:
+        Tuple of (image_path, pdf_path); each is None if no valid file was uploaded
         
-        # Try to detect if it's a JSON output from an agent
-        if line.startswith('{') and line.endswith('}'):
-            try:
-                # Parse the JSON
-                data = json.loads(line)
-                # If it's an agent response with a scenario field, return that
-                if 'scenario' in data:
-                    return data['scenario']
-                # If it has a function field, this is a tool execution record
-                elif 'function' in data:
-                    continue
-            except json.JSONDecodeError:
-                # Not valid JSON, might be legitimate text response
-                pass
-    
-    # If no specific response format was found, return the last line
-    for line in reversed(lines):
-        if line.strip() and not line.strip().startswith('{'):
-            return line.strip()
-            
-    # Fallback
-    return lines[-1] if lines else 'No response available'
+    Raises:
+        UploadQuotaError: If the upload store is full
+    """
+    paths = []
+    for field in ('image', 'pdf'):
+        uploaded = request.files.get(field)
+        if uploaded and uploaded.filename != '' and allowed_file(uploaded.filename):
+            # Identical files share one content-addressed copy
+            stored = upload_store.save(uploaded.stream, secure_filename(uploaded.filename))
+            paths.append(stored['path'])
+            if field == 'pdf':
+                # Index the pages while the question is being routed
+                from backend.tools.doc_index import document_index_store
+                document_index_store.schedule(stored['path'])
+        else:
+            paths.append(None)
+    
+    return tuple(paths)
+
+def build_response(result):
+    """
+    Build the JSON payload returned to the client for a processed question.
+    
+    Args:
+        result: The tool state returned by process_question
+        
+    Returns:
+        Dictionary with the final response and the rendered history
+    """
+    if not result:
+        return {'response': 'Error processing request', 'history': ''}
+    
+    with timed(RESPONSE_EXTRACT_SECONDS):
+        return {
+            'response': result.get('final_answer') or 'No response available',
+            'history': render_history(result)
+        }
 
 @app.route('/process', methods=['POST'])
 def process():
     """
     Process the user's query and files.
     
+    Pass timings=1 (query string or form field) to include a per-stage
+    timing breakdown in the response.
+    
     Returns:
         JSON response with the processing result
     """
     # Get the user's query
     query = request.form.get('query', '')
+    image_path, pdf_path = save_uploaded_files()
+    
+    # Process the query, recording where the time goes
+    with collect_timings() as timings:
+        result = process_question(query, image_path, pdf_path, session_id=get_session_id(),
+                                  use_cache=use_response_cache())
+        payload = build_response(result)
+    
+    if request.values.get('timings') in ('1', 'true'):
+        payload['timings'] = timings
+    
+    response = jsonify(payload)
+    response.headers['X-Response-Cache'] = 'hit' if result.get('cached') else 'miss'
+    return response
+
+@app.route('/process/stream', methods=['POST'])
+def process_stream():
+    """
+    Process the user's query and files, streaming progress as server-sent events.
+    
+    Takes the same form fields as /process. Emits "node_start"/"node_end"
+    events for graph node transitions, "token" events for model output and
+    a final "result" event with the same payload /process returns.
+    
+    Returns:
+        A text/event-stream response
+    """
+    query = request.form.get('query', '')
+    image_path, pdf_path = save_uploaded_files()
+    session_id = get_session_id()
+    use_cache = use_response_cache()
+    
+    def generate():
+        events = stream_question(query, image_path, pdf_path, session_id=session_id, use_cache=use_cache)
+        try:
+            for event in events:
+                name = event.pop('event')
+                if name == 'result':
+                    event = build_response(event['result'])
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.close()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/batch', methods=['POST'])
+def process_batch():
+    """
+    Answer many questions about many files in one request.
+    
+    Takes an "items" form field with one JSON object per line ({"id": ...,
+    "question": ..., "image": ..., "pdf": ...}, where image and pdf name
+    files uploaded in the "files" field) and an optional "query" field used
+    for items without a question. Results are streamed as JSON lines in
+    completion order.
+    
+    Returns:
+        An application/x-ndjson response, or 400 if the items are invalid
+    """
+    try:
+        items = load_items(request.form.get('items', '').splitlines(), request.form.get('query', ''))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if not items or len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'status': 'error', 'message': f'A batch must have 1 to {BATCH_MAX_ITEMS} items'}), 400
+    
+    # Identical files share one content-addressed copy and are prepared once
+    stored = {}
+    for uploaded in request.files.getlist('files'):
+        if uploaded.filename and allowed_file(uploaded.filename):
+            stored[uploaded.filename] = upload_store.save(uploaded.stream, secure_filename(uploaded.filename))['path']
+    # Results report the uploaded names rather than store paths
+    names = [{field: item.get(field) for field in ('image', 'pdf')} for item in items]
+    for item in items:
+        for field in ('image', 'pdf'):
+            if item.get(field):
+                if item[field] not in stored:
+                    return jsonify({'status': 'error', 'message': f'File not uploaded: {item[field]}'}), 400
+                item[field] = stored[item[field]]
+    
+    cancel_event = threading.Event()
+    
+    def generate():
+        try:
+            for result in run_batch(items, cancel_event=cancel_event):
+                result.update(names[result['index']])
+                yield json.dumps(result) + '\n'
+        finally:
+            # run_batch cancels its running items when closed early; this also
+            # covers a client that goes away before the first result
+            cancel_event.set()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def job_payload(job):
+    """
+    Build the JSON payload describing a background job.
+    
+    Args:
+        job: The job to describe
+        
+    Returns:
+        Dictionary with the job status, plus the response once it has succeeded
+    """
+    payload = job.to_dict()
+    payload['status_url'] = url_for('job_status', job_id=job.id)
+    if job.status == 'succeeded':
+        payload.update(build_response(job.result))
+    return payload
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue the user's query and files for background processing.
+    
+    Accepts the same form fields as /process and returns immediately.
+    
+    Returns:
+        202 response with the job ID, or 429 if the job queue is full
+    """
+    query = request.form.get('query', '')
+    image_path, pdf_path = save_uploaded_files()
+    
+    try:
+        job = job_manager.submit(process_question, query, image_path, pdf_path, session_id=get_session_id(),
+                                 use_cache=use_response_cache())
+    except QueueFullError:
+        response = jsonify({'status': 'error', 'message': 'Too many queued requests, please retry later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = '5'
+        return response
+    
+    return jsonify(job_payload(job)), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Get the status and, once finished, the result of a background job.
+    
+    Pass ?wait=<seconds> to long-poll until the job finishes or the wait expires.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        JSON response with the job status, or 404 if the job is unknown
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
     
-    # Initialize file paths
-    image_path = None
-    pdf_path = None
-    
-    # Process image file if uploaded
-    if 'image' in request.files:
-        image_file = request.files['image']
-        if image_file and image_file.filename != '' and allowed_file(image_file.filename):
-            filename = secure_filename(image_file.filename)
-            # Add session ID to filename to prevent collisions
-            unique_filename = f"{session['session_id']}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            image_file.save(file_path)
-            image_path = file_path
-    
-    # Process PDF file if uploaded
-    if 'pdf' in request.files:
-        pdf_file = request.files['pdf']
-        if pdf_file and pdf_file.filename != '' and allowed_file(pdf_file.filename):
-            filename = secure_filename(pdf_file.filename)
-            # Add session ID to filename to prevent collisions
-            unique_filename = f"{session['session_id']}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            pdf_file.save(file_path)
-            pdf_path = file_path
-    
-    # Process the query
-    result = process_question(query, image_path, pdf_path)
-    
-    # Extract a meaningful response using our helper function
-    response = extract_final_response(result.get('history', '')) if result else 'Error processing request'
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT)
+    if wait > 0:
+        job.done_event.wait(wait)
     
+    return jsonify(job_payload(job))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel a queued or running background job.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        JSON response with the job status, or 404 if the job is unknown
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    
+    return jsonify(job_payload(job))
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Report routing and cache statistics for this worker process.
+    
+    Returns:
+        JSON response with fast-router path counts, model scheduler state, agent output repair counts, cache counters and upload store usage
+    """
+    # Tool modules are imported on first use rather than with the app
+    from backend.tools.image_tools import vision_cache
+    from backend.tools.image_preprocess import image_preprocessor
     return jsonify({
-        'response': response,
-        'history': result.get('history', '') if result else ''
+        'router': fast_router.stats(),
+        'model_scheduler': model_gateway.scheduler.stats(),
+        'agent_output': output_parser.stats(),
+        'vision_cache': vision_cache.stats() if vision_cache is not None else None,
+        'image_preprocess_cache': image_preprocessor.stats(),
+        'uploads': upload_store.stats(),
+        'response_cache': response_cache.stats() if response_cache is not None else None
     })
 
+@app.route('/documents/<digest>/pages/<int:page_number>/thumbnail', methods=['GET'])
+def page_thumbnail(digest, page_number):
+    """
+    Serve the thumbnail of an uploaded PDF page from the document index.
+    
+    Args:
+        digest: SHA-256 of the uploaded PDF
+        page_number: Page number (0-based index)
+        
+    Returns:
+        The JPEG thumbnail, or 404 if it does not exist
+    """
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        abort(404)
+    from backend.tools.doc_index import document_index_store
+    thumbnail = os.path.join(
+        document_index_store.index_dir(upload_store.get_path(digest, '.pdf')),
+        'thumbnails', f'p{page_number}.jpg'
+    )
+    if not os.path.isfile(thumbnail):
+        abort(404)
+    return send_file(thumbnail, mimetype='image/jpeg')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Expose latency and usage metrics of this worker process for Prometheus.
+    
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/clear', methods=['POST'])
 def clear_session():
     """
@@ -160,7 +397,9 @@ def clear_session():
     Returns:
         JSON response confirming the session was cleared
     """
-    # Generate a new session ID
+    # Forget the conversation and generate a new session ID
+    if 'session_id' in session:
+        session_store.clear(session['session_id'])
     session['session_id'] = str(uuid.uuid4())
     
     return jsonify({
@@ -68,23 +68,43 @@ document.addEventListener('DOMContentLoaded', function() {
             lastMessage.querySelector('.message-content').innerHTML += fileInfo;
         }
         
-        // Show loading indicator
-        addMessage('assistant', '<div class="loading"></div>', false);
+        // Show loading indicator with a live progress area
+        addMessage('assistant', '<div class="loading"></div><div class="stream-status"></div><div class="stream-output"></div>', false);
+        const pendingMessage = chatHistory.lastElementChild;
+        const streamStatus = pendingMessage.querySelector('.stream-status');
+        const streamOutput = pendingMessage.querySelector('.stream-output');
         
         // Prepare form data
         const formData = new FormData(queryForm);
         
         try {
-            // Send request to server
-            const response = await fetch('/process', {
+            // Send request to the streaming endpoint
+            const response = await fetch('/process/stream', {
                 method: 'POST',
                 body: formData
             });
+            if (!response.ok || !response.body) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
             
-            const data = await response.json();
+            let data = null;
+            await readEventStream(response, function(event, payload) {
+                if (event === 'node_start') {
+                    streamStatus.textContent = `Running ${payload.node.replace('_', ' ')}...`;
+                } else if (event === 'token' && payload.source === 'analyze_image') {
+                    // Agent tokens are JSON tool calls; only show the analysis text
+                    streamOutput.textContent += payload.text;
+                    chatHistory.scrollTop = chatHistory.scrollHeight;
+                } else if (event === 'result') {
+                    data = payload;
+                }
+            });
+            if (!data) {
+                throw new Error('Stream ended without a result');
+            }
             
             // Remove loading indicator
-            chatHistory.removeChild(chatHistory.lastElementChild);
+            chatHistory.removeChild(pendingMessage);
             
             // Add assistant response
             addMessage('assistant', data.response);
@@ -96,13 +116,40 @@ document.addEventListener('DOMContentLoaded', function() {
             console.error('Error:', error);
             
             // Remove loading indicator
-            chatHistory.removeChild(chatHistory.lastElementChild);
+            chatHistory.removeChild(pendingMessage);
             
             // Add error message
             addMessage('system', 'An error occurred while processing your request. Please try again.');
         }
     });
     
+    // Read a server-sent event stream, calling onEvent(event, data) for each event
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(function(line) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+    
     // Clear conversation
     clearBtn.addEventListener('click', async function() {
         // Clear chat history
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Main application entry point for the Multimodal Analysis System.
-This script runs the frontend Flask application.
+This script runs the frontend Flask application (with Flask's development
+server, or with gunicorn for production), or answers a batch of questions
+from the command line.
 """
 import os
 import sys
@@ -12,26 +14,181 @@ current_dir = os.path.abspath(os.path.dirname(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-# Import the Flask app using an absolute import to avoid conflicts
-from frontend.app import app as flask_app
+from backend.config import (
+    BATCH_WORKERS, SERVER_WORKERS, SERVER_WORKER_CLASS, SERVER_THREADS, SERVER_TIMEOUT,
+    SERVER_GRACEFUL_TIMEOUT, SERVER_MAX_REQUESTS
+)
 
-def main():
-    """
-    Parse command line arguments and start the application.
+def develop(args):
     """
-    parser = argparse.ArgumentParser(description='Run the Multimodal Analysis System')
-    parser.add_argument('--host', default='127.0.0.1', help='Host to run the server on')
-    parser.add_argument('--port', type=int, default=5000, help='Port to run the server on')
-    parser.add_argument('--debug', action='store_true', help='Run in debug mode')
+    Start the web application with Flask's development server.
     
-    args = parser.parse_args()
+    Args:
+        args: Parsed command line arguments
+    """
+    # Import the Flask app using an absolute import to avoid conflicts
+    from frontend.app import app as flask_app
+    from backend.main import warm_up
     
     # Create required directories
     os.makedirs('uploads', exist_ok=True)
     os.makedirs('temp', exist_ok=True)
     
+    # Compile the workflow and agent chains before accepting requests
+    if not args.no_warmup:
+        warm_up()
+    
     # Run the Flask application
     flask_app.run(host=args.host, port=args.port, debug=args.debug)
 
+def serve(args):
+    """
+    Start the web application with gunicorn.
+    
+    The app, the compiled workflow and the agent chains are loaded once in
+    the master process; workers are forked from it and share that memory
+    copy-on-write. SIGHUP replaces the workers gracefully (with the
+    preloaded code), SIGTERM shuts down after running requests finish.
+    
+    Args:
+        args: Parsed command line arguments
+    """
+    if args.workers > 1:
+        print(f'Warning: running {args.workers} worker processes. Jobs and sessions are kept in the memory '
+              'of the worker that created them, so job polling and follow-up questions can reach a worker '
+              'that does not know them, and model concurrency limits apply per worker. Use --workers 1 '
+              'with more --threads unless requests are routed to workers by client.', file=sys.stderr)
+    if args.worker_class == 'gevent':
+        # Patch the standard library before anything creates threads or sockets
+        from gevent import monkey
+        monkey.patch_all()
+    
+    import gc
+    from gunicorn.app.base import BaseApplication
+    from frontend.app import app as flask_app
+    from backend.main import warm_up, reset_after_fork
+    
+    os.makedirs('uploads', exist_ok=True)
+    os.makedirs('temp', exist_ok=True)
+    
+    if not args.no_warmup:
+        warm_up()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in workers
+    gc.freeze()
+    
+    def post_fork(server, worker):
+        reset_after_fork()
+    
+    class Application(BaseApplication):
+        """
+        Gunicorn application serving the preloaded Flask app.
+        """
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return flask_app
+    
+    Application({
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'worker_class': args.worker_class,
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': True,
+        'pidfile': args.pid,
+        'accesslog': '-',
+        'post_fork': post_fork
+    }).run()
+
+def batch(args):
+    """
+    Answer the questions of a JSON lines file and write the results as JSON lines.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        Exit status: 0 if every item succeeded, 1 otherwise
+    """
+    from backend.batch import load_items, run_batch, write_jsonl
+    
+    os.makedirs('temp', exist_ok=True)
+    
+    source = sys.stdin if args.items == '-' else open(args.items, encoding='utf-8')
+    with source:
+        items = load_items(source, args.question)
+    
+    failed = 0
+    
+    def count_failures(results):
+        nonlocal failed
+        for result in results:
+            failed += result['status'] != 'ok'
+            yield result
+    
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    with target:
+        written = write_jsonl(count_failures(run_batch(items, workers=args.workers)), target)
+    
+    print(f'{written} results, {failed} failed', file=sys.stderr)
+    return 1 if failed else 0
+
+def main():
+    """
+    Parse command line arguments and start the application or run a batch.
+    """
+    # Options shared by the development and production servers. They may be
+    # given before or after "serve"; the subcommand's copies have no defaults,
+    # so they do not overwrite values given before it
+    def server_options(defaults: bool) -> argparse.ArgumentParser:
+        options = argparse.ArgumentParser(add_help=False)
+        options.add_argument('--host', default='127.0.0.1' if defaults else argparse.SUPPRESS,
+                             help='Host to run the server on')
+        options.add_argument('--port', type=int, default=5000 if defaults else argparse.SUPPRESS,
+                             help='Port to run the server on')
+        options.add_argument('--no-warmup', action='store_true', default=False if defaults else argparse.SUPPRESS,
+                             help='Skip building the workflow and agent chains at startup')
+        return options
+    
+    parser = argparse.ArgumentParser(description='Run the Multimodal Analysis System', parents=[server_options(True)])
+    parser.add_argument('--debug', action='store_true', help='Run in debug mode')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', parents=[server_options(False)], help='Run the production server with gunicorn')
+    serve_parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='Worker processes (jobs and sessions are per process, so keep 1 unless clients stick to a worker)')
+    serve_parser.add_argument('--worker-class', choices=('gthread', 'gevent'), default=SERVER_WORKER_CLASS,
+                              help='Threads or gevent greenlets for concurrent requests in a worker')
+    serve_parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='Threads per gthread worker')
+    serve_parser.add_argument('--timeout', type=int, default=SERVER_TIMEOUT, help='Seconds before a silent worker is restarted')
+    serve_parser.add_argument('--graceful-timeout', type=int, default=SERVER_GRACEFUL_TIMEOUT,
+                              help='Seconds workers get to finish requests on reload or shutdown')
+    serve_parser.add_argument('--max-requests', type=int, default=SERVER_MAX_REQUESTS,
+                              help='Requests after which a worker is replaced (0 for never)')
+    serve_parser.add_argument('--pid', default=None, help='File to write the master process ID to, for sending signals')
+    
+    batch_parser = subparsers.add_parser('batch', help='Answer the questions of a JSON lines file')
+    batch_parser.add_argument('items', help='JSON lines file with one {"id", "question", "image", "pdf"} object per line, or - for stdin')
+    batch_parser.add_argument('-o', '--output', default='-', help='File to write the JSON lines results to (default: stdout)')
+    batch_parser.add_argument('--question', default='', help='Question for items that do not give one')
+    batch_parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help='Items processed concurrently')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'batch':
+        sys.exit(batch(args))
+    if args.command == 'serve':
+        serve(args)
+    else:
+        develop(args)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,124 @@
+# tests/test_agent_output.py
+"""
+Tests of the repair and validation of agent JSON output.
+"""
+import json
+import unittest
+from unittest import mock
+from backend.agent import output
+from backend.agent.output import AgentOutputError, OutputParser, repair_json, validate_json
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scenario": {"type": "string"},
+        "use_tool": {"type": "boolean"},
+        "pages": {"type": "array", "items": {"type": "integer"}, "maxItems": 3}
+    },
+    "required": ["scenario", "use_tool"]
+}
+
+def repaired(text: str):
+    """
+    Repair and parse model output.
+    
+    Args:
+        text: The model output
+    
+    Returns:
+        The parsed value
+    """
+    return json.loads(repair_json(text))
+
+class RepairJsonTest(unittest.TestCase):
+    def test_fenced_output_with_prose(self):
+        text = 'Sure, here it is:\n```json\n{"scenario": "hi", "use_tool": false}\n```\nAnything else?'
+        self.assertEqual(repaired(text), {"scenario": "hi", "use_tool": False})
+
+    def test_trailing_commas(self):
+        self.assertEqual(repaired('{"pages": [1, 2,], "use_tool": true,}'), {"pages": [1, 2], "use_tool": True})
+
+    def test_single_quotes_and_python_literals(self):
+        self.assertEqual(repaired("{'scenario': 'it\\'s', use_tool: True, 'x': None}"),
+                         {"scenario": "it's", "use_tool": True, "x": None})
+        self.assertEqual(repaired("{'scenario': 'it's here'}"), {"scenario": "it's here"})
+
+    def test_unescaped_quotes_in_strings(self):
+        self.assertEqual(repaired('{"scenario": "he said "hi" to me", "use_tool": false}'),
+                         {"scenario": 'he said "hi" to me', "use_tool": False})
+
+    def test_invalid_escapes_are_kept_as_text(self):
+        self.assertEqual(repaired('{"scenario": "\\d+ and \\n"}'), {"scenario": "\\d+ and \n"})
+
+    def test_truncated_output(self):
+        self.assertEqual(repaired('{"scenario": "cut off here'), {"scenario": "cut off here"})
+        self.assertEqual(repaired('{"pages": [1, 2'), {"pages": [1, 2]})
+        self.assertEqual(repaired('{"scenario": "x", "use_tool":'), {"scenario": "x", "use_tool": None})
+
+    def test_raw_newlines_and_mismatched_brackets(self):
+        self.assertEqual(repaired('{"scenario": "two\nlines", "pages": [1}'), {"scenario": "two\nlines", "pages": [1]})
+
+class ValidateJsonTest(unittest.TestCase):
+    def test_valid_value(self):
+        self.assertEqual(validate_json({"scenario": "x", "use_tool": False, "pages": [1]}, SCHEMA), [])
+
+    def test_schema_mismatches(self):
+        errors = validate_json({"scenario": 1, "pages": [1, "2", 3, 4]}, SCHEMA)
+        self.assertIn("$ is missing use_tool", errors)
+        self.assertIn("$.scenario must be of type string, got 1", errors)
+        self.assertIn('$.pages[1] must be of type integer, got "2"', errors)
+        self.assertIn("$.pages takes at most 3 items", errors)
+
+    def test_any_of_reports_closest_alternative(self):
+        schema = {"anyOf": [
+            {"type": "object", "properties": {"function": {"const": "a"}}, "required": ["function"]},
+            {"type": "object", "properties": {"calls": {"type": "array", "minItems": 1}}, "required": ["calls"]}
+        ]}
+        self.assertEqual(validate_json({"calls": [1]}, schema), [])
+        self.assertEqual(validate_json({"calls": []}, schema), ["$.calls needs at least 1 items"])
+
+class OutputParserTest(unittest.TestCase):
+    VALID = '{"scenario": "x", "use_tool": false}'
+
+    def test_valid_output_in_every_mode(self):
+        for mode in ("reprompt", "repair", "off"):
+            parser = OutputParser(mode=mode)
+            self.assertEqual(parser.parse(self.VALID, SCHEMA, "model"), ({"scenario": "x", "use_tool": False}, False))
+            self.assertEqual(parser.counts["valid"], 1)
+
+    def test_repair_mode(self):
+        parser = OutputParser(mode="repair")
+        value, changed = parser.parse("{'scenario': 'x', 'use_tool': False,}", SCHEMA, "model")
+        self.assertEqual((value, changed), ({"scenario": "x", "use_tool": False}, True))
+        with self.assertRaises(AgentOutputError):
+            parser.parse('{"scenario": "x"}', SCHEMA, "model")
+        self.assertEqual((parser.counts["repaired"], parser.counts["failed"]), (1, 1))
+        self.assertEqual(parser.stats()["repair_rate"], 0.5)
+
+    def test_off_mode_accepts_valid_json_only(self):
+        parser = OutputParser(mode="off")
+        with self.assertRaises(AgentOutputError):
+            parser.parse("{'scenario': 'x', 'use_tool': False}", SCHEMA, "model")
+        # Schema mismatches are not checked
+        self.assertEqual(parser.parse('{"scenario": 1}', SCHEMA, "model"), ({"scenario": 1}, False))
+
+    def test_reprompt_mode_asks_the_model_once(self):
+        parser = OutputParser(mode="reprompt")
+        with mock.patch.object(output.model_gateway, "call", return_value=self.VALID) as call:
+            value, changed = parser.parse('{"scenario": "x"}', SCHEMA, "model", source="chat_agent")
+        self.assertEqual((value, changed), ({"scenario": "x", "use_tool": False}, True))
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(parser.counts["reprompted"], 1)
+
+    def test_reprompt_mode_fails_when_correction_fails(self):
+        parser = OutputParser(mode="reprompt")
+        with mock.patch.object(output.model_gateway, "call", return_value='{"scenario": "x"}'):
+            with self.assertRaises(AgentOutputError):
+                parser.parse('{"scenario": "x"}', SCHEMA, "model")
+        with mock.patch.object(output.model_gateway, "call", side_effect=TimeoutError("busy")):
+            with self.assertRaisesRegex(AgentOutputError, "correction failed"):
+                parser.parse("not json", SCHEMA, "model")
+        self.assertEqual(parser.counts["failed"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# tests/test_model_scheduler.py
+"""
+Tests of the model-grouped scheduling of model calls.
+"""
+import time
+import threading
+import unittest
+from backend.llm.gateway import ModelScheduler
+
+def run_mixed_load(scheduler: ModelScheduler, callers: int, calls: int, seconds: float) -> str:
+    """
+    Run callers for two models concurrently, each making calls one after another.
+    
+    Args:
+        scheduler: The scheduler under test
+        callers: Callers per model
+        calls: Calls per caller
+        seconds: Duration of each call
+    
+    Returns:
+        The models of the calls in the order they started
+    """
+    order = []
+    lock = threading.Lock()
+
+    def caller(model: str) -> None:
+        for _ in range(calls):
+            if not scheduler.acquire(model, 30):
+                raise AssertionError(f"{model} call timed out")
+            with lock:
+                order.append(model)
+            time.sleep(seconds)
+            scheduler.release(model)
+
+    threads = [threading.Thread(target=caller, args=(model,)) for model in "AB" for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return "".join(order)
+
+class ModelSchedulerTest(unittest.TestCase):
+    def test_mixed_load_runs_in_bursts(self):
+        # Calls queued while the other model drains have waited longer than
+        # max_wait, which must not make every swap-in serve a single call
+        scheduler = ModelScheduler({}, 2, grouped=True, max_wait=0.005, burst_calls=8)
+        order = run_mixed_load(scheduler, callers=6, calls=4, seconds=0.02)
+        self.assertEqual(len(order), 48)
+        # A swapped-in model runs all six queued calls before handing over
+        self.assertIn("B" * 6, order)
+        self.assertLess(scheduler.switches, len(order) // 2)
+        self.assertEqual(scheduler.switches, 1 + sum(a != b for a, b in zip(order, order[1:])))
+
+    def test_waiting_model_is_swapped_in_after_max_wait(self):
+        scheduler = ModelScheduler({}, 1, grouped=True, max_wait=0.05, burst_calls=1000)
+        stop = threading.Event()
+
+        def busy() -> None:
+            while not stop.is_set():
+                scheduler.acquire("A", 30)
+                time.sleep(0.01)
+                scheduler.release("A")
+
+        threads = [threading.Thread(target=busy) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.05)
+            start = time.monotonic()
+            self.assertTrue(scheduler.acquire("B", 5))
+            waited = time.monotonic() - start
+            switches = scheduler.switches
+            scheduler.release("B")
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.assertLess(waited, 1)
+        self.assertEqual(switches, 2)
+
+    def test_ungrouped_models_run_independently(self):
+        scheduler = ModelScheduler({}, 2, grouped=False)
+        self.assertTrue(scheduler.acquire("A", 1))
+        self.assertTrue(scheduler.acquire("B", 1))
+        self.assertTrue(scheduler.acquire("A", 1))
+        self.assertFalse(scheduler.acquire("A", 0.01))
+        self.assertEqual(scheduler.switches, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+# tests/test_router.py
+"""
+Tests of the rule-based fast router.
+"""
+import json
+import unittest
+from backend.router import FastRouter
+
+def decide(question: str, image_path: str = None, pdf_path: str = None):
+    """
+    Route a question in tool mode.
+    
+    Args:
+        question: The question
+        image_path: Optional uploaded image
+        pdf_path: Optional uploaded PDF
+    
+    Returns:
+        Tuple of (route, planned tool calls or None)
+    """
+    state = {"question": question, "image_path": image_path, "pdf_path": pdf_path}
+    route = FastRouter("tool").route(state)
+    return route, json.loads(state["tool_exec"]) if state.get("tool_exec") else None
+
+class FastRouterTest(unittest.TestCase):
+    def test_unrelated_questions_go_to_chat_agent(self):
+        # Session uploads stay attached to questions about other things
+        self.assertEqual(decide("is it raining in Paris?", image_path="a.png")[0], "chat_agent")
+        self.assertEqual(decide("tell me a joke about it", pdf_path="a.pdf")[0], "chat_agent")
+        self.assertEqual(decide("analyze this", pdf_path="a.pdf")[0], "chat_agent")
+        self.assertEqual(decide("summarize the news", pdf_path="a.pdf")[0], "chat_agent")
+
+    def test_file_nouns_and_page_references_take_fast_path(self):
+        self.assertEqual(decide("describe the chart", image_path="a.png")[1]["function"], "analyze_image")
+        self.assertEqual(decide("what is on page 3?", pdf_path="a.pdf")[1]["args"], ["a.pdf", 2, "what is on page 3?"])
+        self.assertEqual(decide("summarize the document", pdf_path="a.pdf")[1]["args"][1:3], [0, -1])
+        self.assertEqual(decide("which pages mention revenue?", pdf_path="a.pdf")[1]["function"], "search_pdf_pages")
+
+if __name__ == "__main__":
+    unittest.main()
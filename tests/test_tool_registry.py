@@ -0,0 +1,71 @@
+# tests/test_tool_registry.py
+"""
+Tests of tool call argument validation in the tool catalog.
+"""
+import unittest
+from backend.tools.registry import ToolCatalog, ToolArgumentError
+
+def sample_tool(path: str, page: int, scale: float = 1.0, verbose: bool = False, note=None) -> str:
+    """
+    Sample tool.
+    
+    :function: sample_tool
+    :param str path: A path
+    :param int page: A page number
+    :param float scale: A scale
+    :param bool verbose: Whether to say more
+    :param note: Anything
+    :return: The arguments
+    """
+    return f"{path}:{page}:{scale}:{verbose}:{note}"
+
+class ValidateArgsTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ToolCatalog()
+        self.catalog.register(sample_tool)
+
+    def validate(self, args):
+        return self.catalog.validate_args("sample_tool", args)
+
+    def test_type_coercion(self):
+        self.assertEqual(self.validate(["a.pdf", "3", "2", "true"]), ["a.pdf", 3, 2.0, True])
+        self.assertEqual(self.validate([7, 3.0, 1, "False"]), ["7", 3, 1.0, False])
+        # Unannotated parameters take any value
+        self.assertEqual(self.validate(["a", 1, 1.0, False, {"x": 1}])[4], {"x": 1})
+
+    def test_invalid_types(self):
+        for args in (["a", "three"], ["a", 2.5], ["a", True], ["a", 1, "big"], ["a", 1, 1.0, "yes"], [None, 1]):
+            with self.assertRaises(ToolArgumentError, msg=args):
+                self.validate(args)
+
+    def test_missing_required_arguments(self):
+        with self.assertRaisesRegex(ToolArgumentError, "Missing arguments for sample_tool: page"):
+            self.validate(["a.pdf"])
+        with self.assertRaisesRegex(ToolArgumentError, "path, page"):
+            self.validate({"scale": 2})
+
+    def test_unknown_and_extra_arguments(self):
+        with self.assertRaisesRegex(ToolArgumentError, "Unknown arguments for sample_tool: pages"):
+            self.validate({"path": "a", "pages": 1})
+        with self.assertRaisesRegex(ToolArgumentError, "at most 5 arguments"):
+            self.validate(["a", 1, 1.0, False, None, "extra"])
+        with self.assertRaises(ToolArgumentError):
+            self.validate("a, 1")
+
+    def test_defaults_fill_gaps_in_keyword_arguments(self):
+        # Positional calls stop at the last given argument; the function supplies the rest
+        self.assertEqual(self.validate({"path": "a", "page": "2"}), ["a", 2])
+        self.assertEqual(self.validate({"page": 2, "verbose": "true", "path": "a"}), ["a", 2, 1.0, True])
+
+    def test_unknown_tool(self):
+        with self.assertRaises(ValueError):
+            self.catalog.validate_args("missing_tool", [])
+
+    def test_schema_from_signature(self):
+        entry = self.catalog.entries["sample_tool"]
+        self.assertEqual(entry["parameters"]["required"], ["path", "page"])
+        self.assertEqual(entry["parameters"]["properties"]["scale"], {"type": "number", "description": "A scale", "default": 1.0})
+        self.assertEqual(self.catalog.call_schema()["properties"]["args"]["minItems"], 2)
+
+if __name__ == "__main__":
+    unittest.main()